@@ -1,14 +1,18 @@
+import json
 import logging
 import os
 import threading
 from datetime import datetime
 
 from feedback_processor import process_feedback_messages
-from flask import Flask, jsonify, render_template
+from flask import (Flask, Response, jsonify, render_template, request,
+                   stream_with_context)
 from flask_cors import CORS
 from logging_config import setup_logging
-from postgres import (create_feedback_table, get_all_feedback_data,
-                      get_feedback_data_by_user, get_user_statistics)
+from postgres import (FEEDBACK_PAGE_SIZE, create_feedback_table,
+                      estimate_feedback_count, get_feedback_page,
+                      get_user_statistics, iter_feedback_export,
+                      parse_feedback_cursor, start_statistics_refresher)
 
 # Configure logging
 setup_logging("admin_service.log")
@@ -24,6 +28,9 @@ try:
 except Exception as e:
     logger.error(f"Failed to initialize database: {e}")
 
+# Statistics pages read a materialized view kept fresh in the background
+start_statistics_refresher()
+
 
 @app.route("/")
 def index():
@@ -48,15 +55,37 @@ def index():
         return render_template("index.html", statistics=default_stats)
 
 
+MAX_FEEDBACK_PAGE_SIZE = 1000
+
+
+def _page_args():
+    """limit, cursor and q query params; raises ValueError when malformed."""
+    limit = int(request.args.get("limit", FEEDBACK_PAGE_SIZE))
+    limit = min(max(limit, 1), MAX_FEEDBACK_PAGE_SIZE)
+    cursor = request.args.get("cursor") or None
+    if cursor:
+        parse_feedback_cursor(cursor)
+    search = (request.args.get("q") or "").strip() or None
+    return limit, cursor, search
+
+
 @app.route("/feedbacks")
 def feedbacks():
-    """Show feedback data."""
+    """Show feedback data, one page at a time."""
     try:
-        feedback_data = get_all_feedback_data()
+        limit, cursor, search = _page_args()
+    except ValueError:
+        return "Invalid page parameters", 400
+    try:
+        feedback_data, next_cursor = get_feedback_page(
+            limit=limit, cursor=cursor, search=search
+        )
         return render_template(
             "feedbacks.html",
             feedback_data=feedback_data,
-            total_count=len(feedback_data),
+            total_count=None if search else estimate_feedback_count(),
+            next_cursor=next_cursor,
+            search=search or "",
         )
     except Exception as e:
         logger.error(f"Error displaying feedback data: {e}")
@@ -65,14 +94,24 @@ def feedbacks():
 
 @app.route("/api/admin")
 def api_admin():
-    """API endpoint to get all admin data as JSON."""
+    """API endpoint to get a page of feedback data as JSON.
+
+    Query params: limit, cursor (next_cursor of the previous page), q.
+    """
+    try:
+        limit, cursor, search = _page_args()
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid page parameters"}), 400
     try:
-        feedback_data = get_all_feedback_data()
+        feedback_data, next_cursor = get_feedback_page(
+            limit=limit, cursor=cursor, search=search
+        )
         return jsonify(
             {
                 "success": True,
                 "count": len(feedback_data),
                 "feedback_data": feedback_data,
+                "next_cursor": next_cursor,
             }
         )
     except Exception as e:
@@ -80,17 +119,40 @@ def api_admin():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/admin/export")
+def api_admin_export():
+    """Stream all feedback (optionally filtered by q) as NDJSON."""
+    search = (request.args.get("q") or "").strip() or None
+
+    def generate():
+        for item in iter_feedback_export(search=search):
+            yield json.dumps(item) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=feedbacks.ndjson"},
+    )
+
+
 @app.route("/api/admin/<user_email>")
 def api_user_admin(user_email):
-    """API endpoint to get admin data for a specific user."""
+    """API endpoint to get a page of admin data for a specific user."""
     try:
-        feedback_data = get_feedback_data_by_user(user_email)
+        limit, cursor, search = _page_args()
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid page parameters"}), 400
+    try:
+        feedback_data, next_cursor = get_feedback_page(
+            limit=limit, cursor=cursor, user_email=user_email, search=search
+        )
         return jsonify(
             {
                 "success": True,
                 "user_email": user_email,
                 "count": len(feedback_data),
                 "feedback_data": feedback_data,
+                "next_cursor": next_cursor,
             }
         )
     except Exception as e:
@@ -1,12 +1,64 @@
 import json
 import logging
+import os
+import time
 
-from kafka_consumer import consume_messages, create_consumer
-from postgres import create_feedback_table, save_feedback_data
+import psycopg2
+from kafka_consumer import consume_batches, create_consumer
+from postgres import create_feedback_table, save_feedback_batch, save_feedback_data
 from dev_utils import get_topics_list, is_dev_environment
 
 logger = logging.getLogger(__name__)
 
+# A batch is written once this many messages arrived or the wait elapsed
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "500"))
+FEEDBACK_BATCH_WAIT_MS = int(os.getenv("FEEDBACK_BATCH_WAIT_MS", "200"))
+
+# Postgres is down or the connection broke, not a problem with the rows
+_DB_UNAVAILABLE = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def _parse_feedback(message):
+    """(user_email, feedback, time) from a feedback message, or None if incomplete."""
+    value = message.value().decode("utf-8")
+    value_dict = json.loads(value)
+
+    admin_info = value_dict.get("value", {})
+    admin_time = admin_info.get("time")
+    user_email = admin_info.get("user_email")
+    admin_text = admin_info.get("feedback")
+
+    if not all([admin_time, user_email, admin_text]):
+        logger.warning("Incomplete feedback data: %s", value_dict)
+        return None
+    return user_email, admin_text, admin_time
+
+
+def _save_batch(feedbacks):
+    """Write a batch in one statement, falling back to row by row.
+
+    The fallback keeps one bad row from dropping the rest of the batch; the
+    rows Postgres rejected are returned. Connection and operational errors
+    are raised instead, so the caller leaves the batch's offsets unmarked.
+    """
+    try:
+        save_feedback_batch(feedbacks)
+        return []
+    except _DB_UNAVAILABLE:
+        raise
+    except Exception as e:
+        logger.error(f"Batch insert of {len(feedbacks)} feedbacks failed: {e}")
+    rejected = []
+    for feedback in feedbacks:
+        try:
+            save_feedback_data(*feedback)
+        except _DB_UNAVAILABLE:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing feedback message: {e}")
+            rejected.append(feedback)
+    return rejected
+
 
 def process_feedback_messages():
     """Main processor to consume feedback messages and write to database."""
@@ -21,44 +73,47 @@ def process_feedback_messages():
     topics = get_topics_list(["feedback"])
     if is_dev_environment():
         logger.info("Running in DEV environment - using _dev topic suffix")
-    consumer = create_consumer(topics)
 
-    try:
-        while True:
-            try:
-                for message in consume_messages(consumer):
+    while True:
+        # A fresh consumer resumes from the last committed offset, so a batch
+        # that failed to save is read again
+        batches = None
+        try:
+            consumer, commits = create_consumer(topics)
+            batches = consume_batches(
+                consumer,
+                max_messages=max(1, FEEDBACK_BATCH_SIZE),
+                max_wait_seconds=FEEDBACK_BATCH_WAIT_MS / 1000,
+                commits=commits,
+            )
+            for batch in batches:
+                feedbacks = []
+                for message in batch:
                     try:
-                        value = message.value().decode("utf-8")
-                        value_dict = json.loads(value)
-
-                        admin_info = value_dict.get("value", {})
-                        admin_time = admin_info.get("time")
-                        user_email = admin_info.get("user_email")
-                        admin_text = admin_info.get("feedback")
-
-                        if not all([admin_time, user_email, admin_text]):
-                            logger.warning(f"Incomplete feedback data: {value_dict}")
-                            continue
-
-                        feedback_id = save_feedback_data(
-                            user_email, admin_text, admin_time
-                        )
-                        consumer.commit(message)
-
+                        feedback = _parse_feedback(message)
                     except Exception as e:
                         logger.error(f"Error processing feedback message: {e}")
                         continue
+                    if feedback:
+                        feedbacks.append(feedback)
 
-            except Exception as e:
-                logger.error(f"Error in feedback processor: {e}")
-                import time
+                rejected = _save_batch(feedbacks)
+                for message in batch:
+                    commits.mark(message)
+                commits.commit(asynchronous=True)
+                logger.debug(
+                    "Saved %d feedbacks from %d messages",
+                    len(feedbacks) - len(rejected),
+                    len(batch),
+                )
 
-                time.sleep(5)
-    finally:
-        try:
-            consumer.close()
         except Exception as e:
-            logger.error(f"Error closing consumer: {e}")
+            logger.error(f"Error in feedback processor: {e}")
+            time.sleep(5)
+        finally:
+            # Commits what was marked and closes the consumer
+            if batches is not None:
+                batches.close()
 
 
 if __name__ == "__main__":
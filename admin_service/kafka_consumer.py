@@ -3,6 +3,7 @@ import logging
 import os
 import time
 
+from commit_manager import OffsetCommitManager
 from confluent_kafka import Consumer, KafkaError, KafkaException
 from logging_config import setup_logging
 from dev_utils import get_kafka_group_id
@@ -12,7 +13,7 @@ logger = logging.getLogger("kafka_consumer")
 
 
 def create_consumer(topics):
-    """Create a Kafka consumer for specified topics."""
+    """Create a Kafka consumer and its offset commit manager for specified topics."""
     if not isinstance(topics, list):
         logger.error("Expected list of topic unicode strings")
         raise TypeError("Expected list of topic unicode strings")
@@ -23,44 +24,52 @@ def create_consumer(topics):
                 "bootstrap.servers": os.getenv("BOOTSTRAP_SERVER"),
                 "group.id": get_kafka_group_id("chater"),
                 "auto.offset.reset": "earliest",
-                "enable.auto.commit": True,
+                "enable.auto.commit": False,
                 "max.poll.interval.ms": 300000,
             }
         )
 
+        commits = OffsetCommitManager(consumer)
+
         def on_assign(consumer, partitions):
             logger.debug(f"Assigned partitions: {partitions}")
 
         def on_revoke(consumer, partitions):
             logger.debug(f"Partitions revoked: {partitions}")
+            commits.on_revoke(consumer, partitions)
 
         consumer.subscribe(topics, on_assign=on_assign, on_revoke=on_revoke)
-        return consumer
+        return consumer, commits
     except KafkaException as e:
         logger.error(f"Failed to create consumer: {str(e)}")
         raise
 
 
-def consume_messages(consumer, expected_user_email=None):
+def _log_consumer_error(msg):
+    """Log a consumer error event; the caller skips the message."""
+    if msg.error().code() == KafkaError._PARTITION_EOF:
+        return
+    elif msg.error().code() == KafkaError.BROKER_NOT_AVAILABLE:
+        logger.error("Broker not available. Retrying in 5 seconds...")
+        time.sleep(5)
+    elif msg.error().code() == KafkaError.INVALID_MSG_SIZE:
+        logger.error(f"Message too large: {msg.error()}")
+    else:
+        logger.error(f"Consumer error: {msg.error()}")
+
+
+def consume_messages(consumer, expected_user_email=None, commits=None):
     """Consume messages from Kafka topics."""
     try:
         while True:
             msg = consumer.poll(1.0)
             if msg is None:
+                if commits is not None:
+                    commits.maybe_commit()
                 continue
             if msg.error():
-                if msg.error().code() == KafkaError._PARTITION_EOF:
-                    continue
-                elif msg.error().code() == KafkaError.BROKER_NOT_AVAILABLE:
-                    logger.error("Broker not available. Retrying in 5 seconds...")
-                    time.sleep(5)
-                    continue
-                elif msg.error().code() == KafkaError.INVALID_MSG_SIZE:
-                    logger.error(f"Message too large: {msg.error()}")
-                    continue
-                else:
-                    logger.error(f"Consumer error: {msg.error()}")
-                    continue
+                _log_consumer_error(msg)
+                continue
 
             try:
                 message_data = json.loads(msg.value())
@@ -82,4 +91,43 @@ def consume_messages(consumer, expected_user_email=None):
         logger.error(f"Unexpected error: {str(e)}")
         raise
     finally:
+        if commits is not None:
+            commits.close()
+        consumer.close()
+
+
+def consume_batches(consumer, max_messages, max_wait_seconds, commits=None):
+    """Consume messages in batches of up to max_messages.
+
+    Each batch is whatever arrived within max_wait_seconds, so a burst is
+    drained max_messages at a time while a quiet topic still flushes
+    promptly. Error events are logged and dropped; empty batches are not
+    yielded.
+    """
+    try:
+        while True:
+            messages = consumer.consume(
+                num_messages=max_messages, timeout=max_wait_seconds
+            )
+            batch = []
+            for msg in messages:
+                if msg.error():
+                    _log_consumer_error(msg)
+                    continue
+                batch.append(msg)
+            if not batch:
+                if commits is not None:
+                    commits.maybe_commit()
+                continue
+            yield batch
+
+    except KafkaException as e:
+        logger.error(f"Error while consuming messages: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise
+    finally:
+        if commits is not None:
+            commits.close()
         consumer.close()
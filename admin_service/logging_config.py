@@ -1,11 +1,27 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from tempfile import gettempdir
-from typing import Optional
+from typing import Any, Optional
 
 DEFAULT_LOG_LEVEL = "WARNING"
 
+# Longest string/bytes value kept in log arguments; 0 disables truncation
+LOG_MAX_VALUE_CHARS = int(os.getenv("LOG_MAX_VALUE_CHARS", "1000"))
+# Hand records to a background thread so disk writes leave the caller's thread
+LOG_ASYNC = os.getenv("LOG_ASYNC", "false").lower() == "true"
+
+REDACTED_KEYS = frozenset(
+    {"photo", "image", "image_base64", "idToken", "token", "password", "secret"}
+)
+_MAX_DEPTH = 4
+_MAX_ITEMS = 50
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
 
 def _parse_log_level(log_level: Optional[str]) -> int:
     """Convert string-based log level to logging numeric level with fallback."""
@@ -60,6 +76,7 @@ def setup_logging(log_file: str) -> None:
     # Prevent duplicate handlers when re-initialising (e.g. in tests)
     for handler in list(root_logger.handlers):
         root_logger.removeHandler(handler)
+    stop_logging()
 
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(formatter)
@@ -67,5 +84,109 @@ def setup_logging(log_file: str) -> None:
     file_handler = logging.FileHandler(log_path)
     file_handler.setFormatter(formatter)
 
-    root_logger.addHandler(stream_handler)
-    root_logger.addHandler(file_handler)
+    truncating_filter = TruncatingFilter()
+    if LOG_ASYNC:
+        queue_handler = _start_listener([stream_handler, file_handler])
+        queue_handler.addFilter(truncating_filter)
+        root_logger.addHandler(queue_handler)
+    else:
+        stream_handler.addFilter(truncating_filter)
+        file_handler.addFilter(truncating_filter)
+        root_logger.addHandler(stream_handler)
+        root_logger.addHandler(file_handler)
+
+
+def _shrink(value: Any, limit: int, depth: int = 0) -> Any:
+    """Copy of value with long strings truncated and sensitive keys redacted."""
+
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value
+        return f"{value[:limit]}...<+{len(value) - limit} chars>"
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) <= limit:
+            return value
+        return f"<{len(value)} bytes>"
+    if depth >= _MAX_DEPTH:
+        return value
+    if isinstance(value, dict):
+        return {
+            key: (
+                "<redacted>"
+                if key in REDACTED_KEYS
+                else _shrink(item, limit, depth + 1)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [_shrink(item, limit, depth + 1) for item in value[:_MAX_ITEMS]]
+        if len(value) > _MAX_ITEMS:
+            items.append(f"...<+{len(value) - _MAX_ITEMS} items>")
+        return items
+    return value
+
+
+class TruncatingFilter(logging.Filter):
+    """Truncates and redacts large log arguments before they are formatted.
+
+    Works on %-style arguments, so call sites should pass payloads as
+    arguments (logger.info("... %s", payload)) rather than f-strings; an
+    already formatted message is only cut to size.
+    """
+
+    def __init__(self, limit: int = LOG_MAX_VALUE_CHARS) -> None:
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or getattr(record, "_shrunk", False):
+            return True
+        if record.args:
+            if isinstance(record.args, dict):
+                record.args = _shrink(record.args, self.limit)
+            else:
+                record.args = tuple(_shrink(arg, self.limit) for arg in record.args)
+        elif isinstance(record.msg, str) and len(record.msg) > self.limit * 4:
+            record.msg = _shrink(record.msg, self.limit * 4)
+        record._shrunk = True
+        return True
+
+
+def _start_listener(handlers) -> logging.Handler:
+    global _listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    return logging.handlers.QueueHandler(log_queue)
+
+
+def _restart_listener_after_fork() -> None:
+    # The listener thread does not survive fork (gunicorn preload_app), so
+    # forked workers get a fresh queue and thread of their own.
+    if _listener is None:
+        return
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root_logger.removeHandler(handler)
+            queue_handler = _start_listener(_listener.handlers)
+            for log_filter in handler.filters:
+                queue_handler.addFilter(log_filter)
+            root_logger.addHandler(queue_handler)
+
+
+def stop_logging() -> None:
+    """Flush and stop the background log writer, if one is running."""
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -1,9 +1,15 @@
+import base64
+import json
 import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -19,285 +25,437 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", 5432),
 }
 
+DB_POOL_MIN = int(os.getenv("ADMIN_DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("ADMIN_DB_POOL_MAX", "10"))
+STATISTICS_REFRESH_SECONDS = int(os.getenv("ADMIN_STATISTICS_REFRESH_SECONDS", "300"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises when exhausted; callers wait for a slot instead
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **DB_CONFIG)
+    return _pool
+
 
 def get_db_connection():
-    """Get database connection."""
+    """Get a pooled database connection; hand it back with release_db_connection()."""
+    _pool_slots.acquire()
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return _get_pool().getconn()
     except psycopg2.Error as e:
+        _pool_slots.release()
         logger.error(f"Error connecting to database: {e}")
         raise
+    except Exception:
+        _pool_slots.release()
+        raise
 
 
-def create_feedback_table():
-    """Create feedbacks table if it doesn't exist."""
+def release_db_connection(conn):
+    """Return a connection to the pool, dropping it if the server closed it."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS feedbacks (
-            id SERIAL PRIMARY KEY,
-            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            user_email VARCHAR(255) NOT NULL,
-            feedback TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-
-        cursor.execute(create_table_query)
-        conn.commit()
+        _get_pool().putconn(conn, close=bool(conn.closed))
+    finally:
+        _pool_slots.release()
 
-        create_index_query = """
-        CREATE INDEX IF NOT EXISTS idx_feedbacks_user_email 
-        ON feedbacks(user_email);
-        """
-        cursor.execute(create_index_query)
-        conn.commit()
 
-    except psycopg2.Error as e:
-        logger.error(f"Error creating feedbacks table: {e}")
-        if conn:
+@contextmanager
+def db_cursor(cursor_factory=None, name=None):
+    """Cursor on a pooled connection; commits on success, rolls back on error.
+
+    A name makes it a server-side cursor that fetches rows in batches.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor(name=name, cursor_factory=cursor_factory) as cursor:
+            yield cursor
+        conn.commit()
+    except Exception:
+        if not conn.closed:
             conn.rollback()
         raise
     finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 
-def save_feedback_data(user_email, feedback_text, feedback_time=None):
-    """Save feedback data to database."""
+def create_feedback_table():
+    """Create feedbacks table if it doesn't exist."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        if feedback_time:
-            try:
-                parsed_time = datetime.fromisoformat(
-                    feedback_time.replace("Z", "+00:00")
+        with db_cursor() as cursor:
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS feedbacks (
+                id SERIAL PRIMARY KEY,
+                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                user_email VARCHAR(255) NOT NULL,
+                feedback TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+            cursor.execute(create_table_query)
+
+            create_index_query = """
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_user_email 
+            ON feedbacks(user_email);
+            """
+            cursor.execute(create_index_query)
+
+            # Keyset pagination needs a created_at on every row
+            cursor.execute("""
+            SELECT is_nullable FROM information_schema.columns
+            WHERE table_name = 'feedbacks' AND column_name = 'created_at';
+            """)
+            if cursor.fetchone()[0] == "YES":
+                cursor.execute("""
+                UPDATE feedbacks SET created_at = COALESCE(date, CURRENT_TIMESTAMP)
+                WHERE created_at IS NULL;
+                """)
+                cursor.execute(
+                    "ALTER TABLE feedbacks ALTER COLUMN created_at SET NOT NULL;"
                 )
-            except ValueError:
-                logger.warning(
-                    f"Invalid timestamp format: {feedback_time}, using current time"
-                )
-                parsed_time = datetime.now()
-        else:
-            parsed_time = datetime.now()
-
-        insert_query = """
-        INSERT INTO feedbacks (date, user_email, feedback)
-        VALUES (%s, %s, %s)
-        RETURNING id;
-        """
-
-        cursor.execute(insert_query, (parsed_time, user_email, feedback_text))
-        feedback_id = cursor.fetchone()[0]
-        conn.commit()
 
-        return feedback_id
+            # Keyset pagination order
+            cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_created_at_id
+            ON feedbacks(created_at DESC, id DESC);
+            """)
+
+            # Full-text search; queries must use the same expression
+            cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_search
+            ON feedbacks USING GIN (to_tsvector('simple', feedback));
+            """)
 
     except psycopg2.Error as e:
-        logger.error(f"Error saving feedback data: {e}")
-        if conn:
-            conn.rollback()
+        logger.error(f"Error creating feedbacks table: {e}")
         raise
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
-def get_all_feedback_data():
-    """Get all feedback data from database."""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = """
-        SELECT id, date, user_email, feedback, created_at
-        FROM feedbacks
-        WHERE user_email != %s
-        ORDER BY date DESC;
-        """
-
-        cursor.execute(query, (TEST_USER_EMAIL,))
-        feedback_records = cursor.fetchall()
-
-        result = []
-        for feedback_record in feedback_records:
-            result.append(
-                {
-                    "id": feedback_record["id"],
-                    "date": (
-                        feedback_record["date"].isoformat()
-                        if feedback_record["date"]
-                        else None
-                    ),
-                    "user_email": feedback_record["user_email"],
-                    "feedback": feedback_record["feedback"],
-                    "created_at": (
-                        feedback_record["created_at"].isoformat()
-                        if feedback_record["created_at"]
-                        else None
-                    ),
-                }
+def _parse_feedback_time(feedback_time):
+    if feedback_time:
+        try:
+            return datetime.fromisoformat(feedback_time.replace("Z", "+00:00"))
+        except ValueError:
+            logger.warning(
+                f"Invalid timestamp format: {feedback_time}, using current time"
             )
+    return datetime.now()
 
-        return result
+
+def save_feedback_data(user_email, feedback_text, feedback_time=None):
+    """Save feedback data to database."""
+    parsed_time = _parse_feedback_time(feedback_time)
+    try:
+        with db_cursor() as cursor:
+            insert_query = """
+            INSERT INTO feedbacks (date, user_email, feedback)
+            VALUES (%s, %s, %s)
+            RETURNING id;
+            """
+            cursor.execute(insert_query, (parsed_time, user_email, feedback_text))
+            return cursor.fetchone()[0]
 
     except psycopg2.Error as e:
-        logger.error(f"Error getting feedback data: {e}")
+        logger.error(f"Error saving feedback data: {e}")
         raise
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
-def get_feedback_data_by_user(user_email):
-    """Get feedback data for a specific user."""
+def save_feedback_batch(feedbacks):
+    """Insert many (user_email, feedback_text, feedback_time) rows at once.
+
+    One multi-row INSERT per page of rows and a single commit for the whole
+    batch. Returns the number of rows written.
+    """
+    rows = [
+        (_parse_feedback_time(feedback_time), user_email, feedback_text)
+        for user_email, feedback_text, feedback_time in feedbacks
+    ]
+    if not rows:
+        return 0
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = """
-        SELECT id, date, user_email, feedback, created_at
-        FROM feedbacks
-        WHERE user_email = %s
-        ORDER BY date DESC;
-        """
-
-        cursor.execute(query, (user_email,))
-        feedback_records = cursor.fetchall()
-
-        result = []
-        for feedback_record in feedback_records:
-            result.append(
-                {
-                    "id": feedback_record["id"],
-                    "date": (
-                        feedback_record["date"].isoformat()
-                        if feedback_record["date"]
-                        else None
-                    ),
-                    "user_email": feedback_record["user_email"],
-                    "feedback": feedback_record["feedback"],
-                    "created_at": (
-                        feedback_record["created_at"].isoformat()
-                        if feedback_record["created_at"]
-                        else None
-                    ),
-                }
+        with db_cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO feedbacks (date, user_email, feedback) VALUES %s",
+                rows,
+                page_size=1000,
             )
-
-        return result
+        return len(rows)
 
     except psycopg2.Error as e:
-        logger.error(f"Error getting feedback data for user {user_email}: {e}")
+        logger.error(f"Error saving feedback batch of {len(rows)}: {e}")
         raise
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
-def get_user_statistics():
-    """Get comprehensive user statistics from food tracking tables."""
+def _feedback_item(feedback_record):
+    return {
+        "id": feedback_record["id"],
+        "date": (
+            feedback_record["date"].isoformat() if feedback_record["date"] else None
+        ),
+        "user_email": feedback_record["user_email"],
+        "feedback": feedback_record["feedback"],
+        "created_at": (
+            feedback_record["created_at"].isoformat()
+            if feedback_record["created_at"]
+            else None
+        ),
+    }
+
+
+FEEDBACK_PAGE_SIZE = int(os.getenv("ADMIN_FEEDBACK_PAGE_SIZE", "100"))
+FEEDBACK_EXPORT_BATCH = 1000
+
+
+def encode_feedback_cursor(record):
+    """Opaque cursor pointing just past a feedback item."""
+    payload = json.dumps({"created_at": record["created_at"], "id": record["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def parse_feedback_cursor(cursor):
+    """(created_at, id) of a cursor; raises ValueError when malformed."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), int(payload["id"])
+    except (KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid feedback cursor: {cursor!r}") from e
+
+
+def _feedback_filters(user_email=None, search=None):
+    """WHERE clause and params shared by the page and export queries."""
+    if user_email:
+        clauses, params = ["user_email = %s"], [user_email]
+    else:
+        clauses, params = ["user_email != %s"], [TEST_USER_EMAIL]
+    if search:
+        clauses.append(
+            "to_tsvector('simple', feedback) @@ websearch_to_tsquery('simple', %s)"
+        )
+        params.append(search)
+    return clauses, params
+
+
+def get_feedback_page(
+    limit=FEEDBACK_PAGE_SIZE, cursor=None, user_email=None, search=None
+):
+    """One page of feedback, newest first, keyset-paginated on (created_at, id).
+
+    Without user_email the test user is excluded. search is a web-style
+    full-text query over the feedback text. Returns (items, next_cursor).
+    """
+    clauses, params = _feedback_filters(user_email, search)
+    if cursor:
+        clauses.append("(created_at, id) < (%s, %s)")
+        params.extend(parse_feedback_cursor(cursor))
+    query = f"""
+    SELECT id, date, user_email, feedback, created_at
+    FROM feedbacks
+    WHERE {" AND ".join(clauses)}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s;
+    """
+    try:
+        with db_cursor(cursor_factory=RealDictCursor) as db:
+            db.execute(query, (*params, limit + 1))
+            records = db.fetchall()
+    except psycopg2.Error as e:
+        logger.error(f"Error getting feedback page: {e}")
+        raise
 
-        cursor.execute("SELECT COUNT(*) FROM public.dishes_day;")
-        total_dishes_scanned = cursor.fetchone()[0] or 0
+    items = [_feedback_item(record) for record in records[:limit]]
+    next_cursor = encode_feedback_cursor(items[-1]) if len(records) > limit else None
+    return items, next_cursor
+
+
+def iter_feedback_export(user_email=None, search=None):
+    """Yield every matching feedback item through a server-side cursor.
+
+    Rows are fetched FEEDBACK_EXPORT_BATCH at a time, so memory stays flat
+    however large the table is. The pooled connection is held until the
+    generator is exhausted or closed.
+    """
+    clauses, params = _feedback_filters(user_email, search)
+    query = f"""
+    SELECT id, date, user_email, feedback, created_at
+    FROM feedbacks
+    WHERE {" AND ".join(clauses)}
+    ORDER BY created_at DESC, id DESC;
+    """
+    with db_cursor(cursor_factory=RealDictCursor, name="feedback_export") as db:
+        db.itersize = FEEDBACK_EXPORT_BATCH
+        db.execute(query, params)
+        for record in db:
+            yield _feedback_item(record)
+
+
+def estimate_feedback_count():
+    """Planner estimate of the feedbacks row count, without a table scan."""
+    try:
+        with db_cursor() as db:
+            db.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = 'feedbacks'::regclass;"
+            )
+            return max(db.fetchone()[0], 0)
+    except psycopg2.Error as e:
+        logger.error(f"Error estimating feedback count: {e}")
+        return 0
+
+
+# One pass over total_for_day, one over dishes_day and one over feedbacks.
+# Served from the admin_user_statistics materialized view, which a background
+# thread refreshes every ADMIN_STATISTICS_REFRESH_SECONDS.
+_USER_STATISTICS_SELECT = """
+    WITH per_user AS (
+        SELECT
+            user_email,
+            COUNT(DISTINCT today::date)
+                FILTER (WHERE today::date >= CURRENT_DATE - 7) AS days_7,
+            COUNT(DISTINCT today::date)
+                FILTER (WHERE today::date >= CURRENT_DATE - 30) AS days_30
+        FROM public.total_for_day
+        GROUP BY user_email
+    ),
+    dishes AS (
+        SELECT COUNT(*) AS total, COUNT(DISTINCT user_email) AS users
+        FROM public.dishes_day
+    )
+    SELECT
+        1 AS id,
+        now() AS refreshed_at,
+        (SELECT COUNT(*) FROM per_user) AS total_users,
+        (SELECT COUNT(*) FROM public."user") AS registered_users,
+        (SELECT COUNT(*) FROM per_user WHERE days_7 > 0) AS active_users_7_days,
+        (SELECT COUNT(*) FROM per_user WHERE days_30 > 0) AS active_users_30_days,
+        ARRAY(
+            SELECT user_email FROM per_user WHERE days_7 >= 7 ORDER BY user_email
+        ) AS constantly_active_7_days_emails,
+        ARRAY(
+            SELECT user_email FROM per_user WHERE days_30 >= 30 ORDER BY user_email
+        ) AS constantly_active_30_days_emails,
+        dishes.total AS total_dishes_scanned,
+        ROUND(dishes.total::numeric / NULLIF(dishes.users, 0), 2)
+            AS avg_dishes_per_user,
+        (
+            SELECT COUNT(*) FROM feedbacks WHERE user_email != %(test_user)s
+        ) AS total_feedback_records
+    FROM dishes
+"""
+_USER_STATISTICS_PARAMS = {"test_user": TEST_USER_EMAIL}
+
+# Arbitrary key so only one process refreshes the view at a time
+_STATISTICS_REFRESH_LOCK = 4711
+
+
+def create_statistics_view():
+    """Create the admin_user_statistics materialized view if it doesn't exist."""
+    with db_cursor() as cursor:
+        # A view created before a column was added is rebuilt
+        cursor.execute(
+            "SELECT attname FROM pg_attribute "
+            "WHERE attrelid = to_regclass('admin_user_statistics') AND attnum > 0;"
+        )
+        columns = {row[0] for row in cursor.fetchall()}
+        if columns and "total_feedback_records" not in columns:
+            cursor.execute("DROP MATERIALIZED VIEW admin_user_statistics;")
+        cursor.execute(
+            "CREATE MATERIALIZED VIEW IF NOT EXISTS admin_user_statistics AS "
+            + _USER_STATISTICS_SELECT,
+            _USER_STATISTICS_PARAMS,
+        )
+        # REFRESH ... CONCURRENTLY needs a unique index
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_user_statistics_id "
+            "ON admin_user_statistics(id);"
+        )
 
-        cursor.execute("SELECT COUNT(DISTINCT user_email) FROM public.total_for_day;")
-        total_users = cursor.fetchone()[0] or 0
 
-        # Registered users from the main user table
-        try:
-            cursor.execute('SELECT COUNT(*) FROM public."user";')
-            registered_users = cursor.fetchone()[0] or 0
-        except Exception:
-            # Fallback if table does not exist in some environments
-            registered_users = 0
-
-        cursor.execute("""
-            SELECT COUNT(DISTINCT user_email) 
-            FROM public.total_for_day 
-            WHERE today::date >= CURRENT_DATE - INTERVAL '7 days';
-        """)
-        active_users_7_days = cursor.fetchone()[0] or 0
-
-        cursor.execute("""
-            SELECT COUNT(DISTINCT user_email) 
-            FROM public.total_for_day 
-            WHERE today::date >= CURRENT_DATE - INTERVAL '30 days';
-        """)
-        active_users_30_days = cursor.fetchone()[0] or 0
-
-        cursor.execute("""
-            SELECT user_email
-            FROM public.total_for_day 
-            WHERE today::date >= CURRENT_DATE - 7
-            GROUP BY user_email
-            HAVING COUNT(DISTINCT today::date) >= 7
-            ORDER BY user_email;
-        """)
-        constantly_active_7_days_emails = cursor.fetchall()
-        constantly_active_7_days = len(constantly_active_7_days_emails)
-        constantly_active_7_days_list = [
-            row[0] for row in constantly_active_7_days_emails
-        ]
-
-        cursor.execute("""
-            SELECT user_email
-            FROM public.total_for_day 
-            WHERE today::date >= CURRENT_DATE - 30
-            GROUP BY user_email
-            HAVING COUNT(DISTINCT today::date) >= 30
-            ORDER BY user_email;
-        """)
-        constantly_active_30_days_emails = cursor.fetchall()
-        constantly_active_30_days = len(constantly_active_30_days_emails)
-        constantly_active_30_days_list = [
-            row[0] for row in constantly_active_30_days_emails
-        ]
+def refresh_user_statistics():
+    """Recompute the statistics view without blocking readers.
 
+    Returns False when another process holds the refresh lock.
+    """
+    with db_cursor() as cursor:
         cursor.execute(
-            "SELECT COUNT(*) FROM feedbacks WHERE user_email != %s;", (TEST_USER_EMAIL,)
+            "SELECT pg_try_advisory_xact_lock(%s);", (_STATISTICS_REFRESH_LOCK,)
         )
-        total_feedback_records = cursor.fetchone()[0] or 0
-
-        cursor.execute("""
-            SELECT ROUND(AVG(dish_count), 2) 
-            FROM (
-                SELECT COUNT(*) as dish_count 
-                FROM public.dishes_day 
-                GROUP BY user_email
-            ) as user_dish_counts;
-        """)
-        avg_dishes_per_user = cursor.fetchone()[0] or 0
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY admin_user_statistics;")
+        return True
+
+
+def _refresh_statistics_loop():
+    view_ready = False
+    while True:
+        try:
+            if not view_ready:
+                create_statistics_view()
+                view_ready = True
+            else:
+                start = time.perf_counter()
+                if refresh_user_statistics():
+                    logger.info(
+                        "Refreshed user statistics in %.2fs",
+                        time.perf_counter() - start,
+                    )
+        except psycopg2.errors.UndefinedTable:
+            # Dropped by a schema migration (eater_init partitioning)
+            logger.warning("User statistics view missing, recreating it")
+            view_ready = False
+        except Exception as e:
+            logger.error(f"Error refreshing user statistics: {e}")
+        time.sleep(STATISTICS_REFRESH_SECONDS)
+
+
+def start_statistics_refresher():
+    """Keep admin_user_statistics fresh from a background thread."""
+    thread = threading.Thread(
+        target=_refresh_statistics_loop, name="statistics-refresher", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def get_user_statistics():
+    """Get comprehensive user statistics from food tracking tables."""
+    try:
+        with db_cursor(cursor_factory=RealDictCursor) as cursor:
+            try:
+                cursor.execute("SAVEPOINT statistics_view;")
+                cursor.execute("SELECT * FROM admin_user_statistics;")
+            except psycopg2.errors.UndefinedTable:
+                # View not created yet; compute the same row directly
+                cursor.execute("ROLLBACK TO SAVEPOINT statistics_view;")
+                cursor.execute(_USER_STATISTICS_SELECT, _USER_STATISTICS_PARAMS)
+            row = cursor.fetchone()
+
+        constantly_active_7_days_list = list(row["constantly_active_7_days_emails"])
+        constantly_active_30_days_list = list(row["constantly_active_30_days_emails"])
+        avg_dishes_per_user = row["avg_dishes_per_user"]
 
         statistics = {
-            "total_users": total_users,
-            "registered_users": registered_users,
-            "active_users_7_days": active_users_7_days,
-            "active_users_30_days": active_users_30_days,
-            "constantly_active_7_days": constantly_active_7_days,
+            "total_users": row["total_users"] or 0,
+            "registered_users": row["registered_users"] or 0,
+            "active_users_7_days": row["active_users_7_days"] or 0,
+            "active_users_30_days": row["active_users_30_days"] or 0,
+            "constantly_active_7_days": len(constantly_active_7_days_list),
             "constantly_active_7_days_emails": constantly_active_7_days_list,
-            "constantly_active_30_days": constantly_active_30_days,
+            "constantly_active_30_days": len(constantly_active_30_days_list),
             "constantly_active_30_days_emails": constantly_active_30_days_list,
-            "total_dishes_scanned": total_dishes_scanned,
-            "total_feedback_records": total_feedback_records,
+            "total_dishes_scanned": row["total_dishes_scanned"] or 0,
+            "total_feedback_records": row["total_feedback_records"] or 0,
             "avg_dishes_per_user": (
                 float(avg_dishes_per_user) if avg_dishes_per_user else 0
             ),
+            "refreshed_at": row["refreshed_at"].isoformat(),
         }
 
         return statistics
@@ -316,11 +474,6 @@ def get_user_statistics():
             "total_feedback_records": 0,
             "avg_dishes_per_user": 0,
         }
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 if __name__ == "__main__":
@@ -11,8 +11,11 @@ from google.cloud.dlp_v2.types import (DeidentifyConfig,
                                        ReplaceValueConfig)
 from kafka_consumer import consume_messages
 from kafka_producer import produce_message, setup_producer
+from message_routing import correlation_id
 from logging_config import setup_logging
 from dev_utils import get_topics_list, is_dev_environment
+from profiling import install_signal_handlers
+from prometheus_client import start_http_server
 
 logger = logging.getLogger(__name__)
 
@@ -60,12 +63,12 @@ def process_messages():
         logger.info("Running in DEV environment - using _dev topic suffix")
     logger.info(f"Starting message processing with topics: {topics}")
     while True:
-        for message, consumer in consume_messages(topics):
+        for message, commits in consume_messages(topics):
             try:
-                key = message.key().decode("utf-8") if message.key() else None
                 value = message.value().decode("utf-8")
 
                 value_dict = json.loads(value)
+                key = correlation_id(message, value_dict)
                 actual_value = value_dict["value"]
                 question = actual_value["question"]
                 send_topic = actual_value["send_topic"]
@@ -83,7 +86,7 @@ def process_messages():
                     f"Processed and redacted message: {redacted_message}, send to topic {send_topic}"
                 )
 
-                consumer.commit(message)
+                commits.mark(message)
             except Exception as e:
                 logger.error(f"Failed to process message: {e}")
 
@@ -92,4 +95,9 @@ if __name__ == "__main__":
     setup_logging("dlp.log")
     logger.info("Starting DLP processing script")
     setup_producer()
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        start_http_server(int(metrics_port))
+    # kill -USR1 / -USR2 for a live profile or tracemalloc diff
+    install_signal_handlers()
     process_messages()
@@ -1,8 +1,11 @@
 import logging
 import os
 
+from commit_manager import OffsetCommitManager
 from confluent_kafka import Consumer, KafkaError
+from deadline import shed_if_expired
 from dev_utils import get_kafka_group_id
+from tracing import trace_consumed
 
 logger = logging.getLogger("kafka_consumer")
 
@@ -22,11 +25,21 @@ def consume_messages(topics):
         }
     )
 
-    consumer.subscribe(topics)
+    commits = OffsetCommitManager(consumer)
+    consumer.subscribe(topics, on_revoke=commits.on_revoke)
 
+    try:
+        yield from _poll_messages(consumer, commits)
+    finally:
+        commits.close()
+        consumer.close()
+
+
+def _poll_messages(consumer, commits):
     while True:
         msg = consumer.poll(1.0)
         if msg is None:
+            commits.maybe_commit()
             continue
         if msg.error():
             if msg.error().code() == KafkaError._PARTITION_EOF:
@@ -35,5 +48,11 @@ def consume_messages(topics):
                 logger.error(f"Consumer error: {msg.error()}")
                 continue
 
+        # Drop work nobody is waiting for before calling DLP
+        if shed_if_expired(msg):
+            commits.mark(msg)
+            continue
+        trace_consumed(msg)
+
         logger.info(f"Consumed message: {msg.key()}")
-        yield msg, consumer
+        yield msg, commits
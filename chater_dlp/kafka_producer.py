@@ -3,7 +3,11 @@ import logging
 import os
 
 from confluent_kafka import Producer
+from deadline import propagation_headers
 from dev_utils import get_topic_name
+from message_routing import (PARTITIONER, message_headers,
+                             message_routing_key)
+from tracing import trace_headers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +23,7 @@ def setup_producer():
             "message.max.bytes": 10000000,
             "client.id": "python-producer",
             "acks": "all",
+            "partitioner": PARTITIONER,
         }
         producer = Producer(conf)
         logger.info("Kafka producer initialized")
@@ -47,8 +52,11 @@ def produce_message(topic, message):
 
         producer.produce(
             topic,
-            key=(message["key"]),
+            key=message_routing_key(message),
             value=json.dumps(message),
+            headers=message_headers(
+                message, propagation_headers() + trace_headers(topic)
+            ),
             callback=delivery_report,
         )
         producer.flush()
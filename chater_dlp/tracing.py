@@ -0,0 +1,190 @@
+# Shared module: edit shared/tracing.py and run shared/sync.sh
+import importlib
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import Histogram
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger("tracing")
+
+# Set per service in its Dockerfile
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "unknown_service")
+# console, otlp, or module:factory returning a SpanExporter; unset exports nothing
+TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+
+# W3C trace context of the chater_ui request that started the chain, the
+# topic that request went to, and the hops it took so far
+# ("chater_ui.produce=<epoch ms>;eater.consume=..."), copied onto every message
+# produced while handling it. Hop times come from each pod's clock, so
+# cross-service hops are only as exact as NTP.
+TRACEPARENT_HEADER = "traceparent"
+REQUEST_HEADER = "x-trace-request"
+HOPS_HEADER = "x-trace-hops"
+MAX_HOPS = 32
+
+kafka_trace_hop_seconds = Histogram(
+    "kafka_trace_hop_seconds",
+    "Time between consecutive hops of a traced request",
+    ["request", "from_hop", "to_hop"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+_current = threading.local()
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _header(message, name):
+    for header, value in message.headers() or ():
+        if header == name and value:
+            return value.decode("utf-8") if isinstance(value, bytes) else value
+    return None
+
+
+def parse_hops(value):
+    hops = []
+    for item in (value or "").split(";"):
+        name, _, ms = item.partition("=")
+        try:
+            hops.append((name, int(ms)))
+        except ValueError:
+            continue
+    return hops
+
+
+def format_hops(hops):
+    return ";".join(f"{name}={ms}" for name, ms in hops[-MAX_HOPS:])
+
+
+def _exporter():
+    if TRACES_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    if TRACES_EXPORTER == "otlp":
+        # Endpoint and headers come from the usual OTEL_EXPORTER_OTLP_* variables
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    module_name, _, factory = TRACES_EXPORTER.partition(":")
+    return getattr(importlib.import_module(module_name), factory)()
+
+
+def get_tracer():
+    """OpenTelemetry tracer, or None when no exporter is configured."""
+    global _tracer
+    if otel_trace is None or TRACES_EXPORTER in ("", "none"):
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    provider = TracerProvider(
+                        resource=Resource.create({"service.name": SERVICE_NAME})
+                    )
+                    provider.add_span_processor(BatchSpanProcessor(_exporter()))
+                    _tracer = provider.get_tracer(SERVICE_NAME)
+                except Exception as e:
+                    logger.error(f"Tracing disabled, exporter setup failed: {e}")
+                    _tracer = False
+    return _tracer or None
+
+
+def _parent_context(traceparent):
+    try:
+        _, trace_id, span_id, flags = traceparent.split("-")
+        span_context = otel_trace.SpanContext(
+            trace_id=int(trace_id, 16),
+            span_id=int(span_id, 16),
+            is_remote=True,
+            trace_flags=otel_trace.TraceFlags(int(flags, 16)),
+        )
+    except ValueError:
+        return None
+    return otel_trace.set_span_in_context(otel_trace.NonRecordingSpan(span_context))
+
+
+def _record_hop(trace, previous, hop, span_name, attributes):
+    """Observe the time from the previous hop and export it as a span."""
+    (from_hop, from_ms), (to_hop, to_ms) = previous, hop
+    kafka_trace_hop_seconds.labels(
+        request=trace["request"], from_hop=from_hop, to_hop=to_hop
+    ).observe(max(0, to_ms - from_ms) / 1000.0)
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    parent = _parent_context(trace["traceparent"])
+    if parent is None:
+        return
+    span = tracer.start_span(
+        span_name,
+        context=parent,
+        start_time=from_ms * 1_000_000,
+        attributes=attributes,
+    )
+    span.end(end_time=max(from_ms, to_ms) * 1_000_000)
+
+
+def trace_consumed(message):
+    """Bind the trace of a consumed message to this thread and time its transit."""
+    traceparent = _header(message, TRACEPARENT_HEADER)
+    if not traceparent:
+        _current.trace = None
+        return
+    trace = {
+        "traceparent": traceparent,
+        "request": _header(message, REQUEST_HEADER) or "unknown",
+        "topic": message.topic(),
+    }
+    hops = parse_hops(_header(message, HOPS_HEADER))
+    hop = (f"{SERVICE_NAME}.consume", int(time.time() * 1000))
+    if hops:
+        _record_hop(
+            trace,
+            hops[-1],
+            hop,
+            f"kafka {message.topic()}",
+            {"messaging.destination": message.topic()},
+        )
+    trace["hops"] = hops + [hop]
+    _current.trace = trace
+
+
+def current_trace():
+    """Trace bound to the current thread, for handing work to another one."""
+    return getattr(_current, "trace", None)
+
+
+def bind_trace(trace):
+    _current.trace = trace
+
+
+def trace_headers(topic):
+    """Headers carrying the current trace on to `topic`, if a trace is bound."""
+    trace = current_trace()
+    if trace is None:
+        return []
+    hop = (f"{SERVICE_NAME}.produce", int(time.time() * 1000))
+    _record_hop(
+        trace,
+        trace["hops"][-1],
+        hop,
+        f"{SERVICE_NAME} {trace['topic']}",
+        {"messaging.source": trace["topic"], "messaging.destination": topic},
+    )
+    return [
+        (TRACEPARENT_HEADER, trace["traceparent"].encode()),
+        (REQUEST_HEADER, trace["request"].encode()),
+        (HOPS_HEADER, format_hops(trace["hops"] + [hop]).encode()),
+    ]
@@ -0,0 +1,69 @@
+# Shared module: edit shared/deadline.py and run shared/sync.sh
+import logging
+import threading
+import time
+
+from prometheus_client import Counter
+
+logger = logging.getLogger("deadline")
+
+# Absolute deadline in epoch milliseconds, set by chater_ui on every request
+# and copied onto every message produced while handling it.
+DEADLINE_HEADER = "x-deadline-ms"
+
+kafka_requests_shed_total = Counter(
+    "kafka_requests_shed_total",
+    "Kafka messages dropped because their deadline had already passed",
+    ["topic"],
+)
+
+_current = threading.local()
+
+
+def get_deadline(message):
+    """Return the message deadline as epoch seconds, or None if it has none."""
+    for name, value in message.headers() or ():
+        if name == DEADLINE_HEADER and value:
+            try:
+                return int(value) / 1000.0
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring malformed deadline header: {value!r}")
+                return None
+    return None
+
+
+def shed_if_expired(message):
+    """Drop a message whose deadline passed; otherwise bind its deadline.
+
+    Returns True when the caller should skip the message. The deadline of a
+    live message is kept for the current thread so produce_message() can
+    forward it on the next hop.
+    """
+    deadline = get_deadline(message)
+    if deadline is not None and deadline <= time.time():
+        kafka_requests_shed_total.labels(topic=message.topic()).inc()
+        logger.warning(
+            f"Shedding expired message on topic {message.topic()} "
+            f"({time.time() - deadline:.1f}s past deadline)"
+        )
+        _current.deadline = None
+        return True
+    _current.deadline = deadline
+    return False
+
+
+def current_deadline():
+    """Deadline bound to the current thread, for handing work to another one."""
+    return getattr(_current, "deadline", None)
+
+
+def bind_deadline(deadline):
+    _current.deadline = deadline
+
+
+def propagation_headers():
+    """Headers carrying the deadline of the message being handled, if any."""
+    deadline = current_deadline()
+    if deadline is None:
+        return []
+    return [(DEADLINE_HEADER, str(int(deadline * 1000)).encode())]
@@ -5,8 +5,11 @@ import os
 from dev_utils import get_topics_list, get_topic_name, is_dev_environment
 from kafka_consumer import consume_messages
 from kafka_producer import produce_message
+from message_routing import correlation_id
 from logging_config import setup_logging
 from openai import OpenAI
+from profiling import install_signal_handlers
+from prometheus_client import start_http_server
 
 logger = logging.getLogger(__name__)
 
@@ -98,12 +101,12 @@ def process_messages():
         logger.info("Running in DEV environment - using _dev topic suffix")
     logger.info(f"Starting message processing with topics: {topics}")
     while True:
-        for message, consumer in consume_messages(topics):
+        for message, commits in consume_messages(topics):
             try:
                 topic = message.topic()
-                key = message.key().decode("utf-8") if message.key() else None
                 value = message.value().decode("utf-8")
                 value_dict = json.loads(value)
+                key = correlation_id(message, value_dict)
                 actual_value = value_dict["value"]
 
                 if topic == get_topic_name("gpt-send"):
@@ -152,7 +155,7 @@ def process_messages():
                             "Message on 'eater-send-photo' missing 'prompt' or 'photo'."
                         )
 
-                consumer.commit(message)
+                commits.mark(message)
             except Exception as e:
                 logger.error(f"Failed to process message: {e}")
 
@@ -160,4 +163,9 @@ def process_messages():
 if __name__ == "__main__":
     setup_logging("gpt.log")
     logger.info("Starting GPT processing script")
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        start_http_server(int(metrics_port))
+    # kill -USR1 / -USR2 for a live profile or tracemalloc diff
+    install_signal_handlers()
     process_messages()
@@ -5,10 +5,11 @@ import time
 
 import context
 import jwt
-import redis
-from common import (before_request, chater_clear, generate_session_secret,
-                    get_jwt_secret_key, rate_limit_required, token_required)
-from eater_admin import eater_admin_proxy, eater_admin_request
+from common import (before_request, chater_clear, debug_access_required,
+                    generate_session_secret, get_jwt_secret_key,
+                    rate_limit_required, token_required)
+from eater_admin import (eater_admin_proxy, eater_admin_request,
+                         set_model_tier_request)
 from flask import (Flask, Response, flash, g, jsonify, redirect, render_template,
                    request, send_file, session, url_for)
 from flask_cors import CORS
@@ -16,11 +17,15 @@ from flask_session import Session
 from google_ops import create_google_blueprint, g_login
 from gphoto import gphoto, gphoto_proxy
 from gempt import gempt as gempt_ui
-from kafka_consumer_service import (start_kafka_consumer_service,
+from kafka_consumer_service import (RESPONSE_ROUTER_MODE,
+                                    start_kafka_consumer_service,
                                     stop_kafka_consumer_service)
 from logging_config import setup_logging
 from login import login, logout
 from minio_utils import get_minio_client
+from profiling import (artifact_path, diff_snapshots, list_artifacts, profiler,
+                       stop_tracemalloc, take_snapshot)
+from redis_pool import redis_client
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from chater import chater as chater_ui
@@ -33,6 +38,7 @@ from eater.eater import (alcohol_latest, alcohol_range, delete_food_record,
 from eater.chess import (get_all_chess_data_request, get_chess_stats_request,
                          record_chess_game_request)
 from eater.feedback import submit_feedback_request
+from eater.nutrition import get_nutrition_rollup_request
 from eater.user_mgmt import (add_friend_request, get_friends_request,
                            share_food_request, update_user_nickname,
                            update_user_goal, log_activity, get_activity_summary)
@@ -49,7 +55,6 @@ log_level = os.getenv("LOG_LEVEL", "INFO")
 IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
 URL_PREFIX = "/dev" if IS_DEV else ""
 
-redis_client = redis.StrictRedis(host=os.getenv("REDIS_ENDPOINT"), port=6379, db=0)
 static_url_path = f"{URL_PREFIX}/chater/static" if IS_DEV else "/chater/static"
 app = Flask(__name__, static_url_path=static_url_path)
 
@@ -93,16 +98,20 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 if IS_DEV:
     logger.info("Running in DEV environment - routes will be prefixed with /dev")
 
-# Start the background Kafka consumer service
-logger.info("Starting Kafka Consumer Service...")
-try:
-    start_kafka_consumer_service()
-except Exception as exc:
-    logger.critical("Failed to start Kafka Consumer Service: %s", exc)
-    raise
+# Start the background Kafka consumer service, unless responses are routed by
+# a dedicated process (gunicorn-spawned or sidecar, see response_router.py)
+if RESPONSE_ROUTER_MODE == "thread":
+    logger.info("Starting Kafka Consumer Service...")
+    try:
+        start_kafka_consumer_service()
+    except Exception as exc:
+        logger.critical("Failed to start Kafka Consumer Service: %s", exc)
+        raise
 
-# Register cleanup function for graceful shutdown
-atexit.register(stop_kafka_consumer_service)
+    # Register cleanup function for graceful shutdown
+    atexit.register(stop_kafka_consumer_service)
+else:
+    logger.info("Kafka responses routed by %s response router", RESPONSE_ROUTER_MODE)
 
 
 def dev_route(path):
@@ -374,6 +383,13 @@ def get_alcohol_range_route(user_email):
     return alcohol_range(request=request, user_email=user_email)
 
 
+@app.route(dev_route("/nutrition_rollup"), methods=["POST"])
+@track_eater_operation("nutrition_rollup")
+@token_required
+def get_nutrition_rollup_route(user_email):
+    return get_nutrition_rollup_request(user_email)
+
+
 @app.route(dev_route("/feedback"), methods=["POST"])
 @track_eater_operation("submit_feedback")
 @token_required
@@ -393,6 +409,12 @@ def eater_admin_proxy_route(resource_path):
     return eater_admin_proxy(resource_path)
 
 
+@app.route(dev_route("/eater_admin/model_tier"), methods=["POST"])
+@track_operation("eater_admin_model_tier")
+def eater_admin_model_tier():
+    return set_model_tier_request(session, request.get_json(silent=True))
+
+
 @app.route(dev_route("/set_language"), methods=["POST"])
 @track_eater_operation("set_language")
 @token_required
@@ -493,6 +515,76 @@ def get_all_chess_data_route(user_email):
     return get_all_chess_data_request(user_email)
 
 
+# Live profiling and leak hunting. Each gunicorn worker profiles itself, so a
+# stop may land on another worker; profiles end after ?seconds= anyway and
+# every worker of the pod lists and serves them from PROFILE_DIR.
+@app.route(dev_route("/debug/profile/start"), methods=["POST"])
+@debug_access_required
+def debug_profile_start():
+    if not profiler.start(request.args.get("seconds", type=float)):
+        return jsonify({"message": "Profiler already running", "pid": os.getpid()}), 409
+    return jsonify({"message": "Profiler started", "pid": os.getpid()})
+
+
+@app.route(dev_route("/debug/profile/stop"), methods=["POST"])
+@debug_access_required
+def debug_profile_stop():
+    path = profiler.stop()
+    if path is None:
+        return (
+            jsonify({"message": "No profile in this worker", "pid": os.getpid()}),
+            404,
+        )
+    return send_file(path, mimetype="text/plain", as_attachment=True)
+
+
+@app.route(dev_route("/debug/profiles"), methods=["GET"])
+@debug_access_required
+def debug_profiles():
+    return jsonify(
+        {"pid": os.getpid(), "profiling": profiler.running, "files": list_artifacts()}
+    )
+
+
+@app.route(dev_route("/debug/profiles/<name>"), methods=["GET"])
+@debug_access_required
+def debug_profile_file(name):
+    try:
+        return send_file(artifact_path(name), as_attachment=True)
+    except FileNotFoundError:
+        return jsonify({"message": "Not found"}), 404
+
+
+@app.route(dev_route("/debug/tracemalloc/snapshot"), methods=["POST"])
+@debug_access_required
+def debug_tracemalloc_snapshot():
+    return jsonify(take_snapshot(request.args.get("limit", 25, type=int)))
+
+
+@app.route(dev_route("/debug/tracemalloc/diff"), methods=["GET"])
+@debug_access_required
+def debug_tracemalloc_diff():
+    try:
+        return jsonify(
+            diff_snapshots(
+                request.args.get("first"),
+                request.args.get("second"),
+                request.args.get("limit", 25, type=int),
+            )
+        )
+    except ValueError as e:
+        return jsonify({"message": str(e), "pid": os.getpid()}), 400
+    except FileNotFoundError:
+        return jsonify({"message": "Snapshot not found"}), 404
+
+
+@app.route(dev_route("/debug/tracemalloc/stop"), methods=["POST"])
+@debug_access_required
+def debug_tracemalloc_stop():
+    stop_tracemalloc()
+    return jsonify({"message": "tracemalloc stopped", "pid": os.getpid()})
+
+
 @app.route("/metrics")
 @app.route(dev_route("/metrics"))
 def metrics():
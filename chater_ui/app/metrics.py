@@ -4,10 +4,17 @@ from typing import Callable
 
 from flask import Response, request
 from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter,
-                               Histogram, generate_latest)
+                               Gauge, Histogram, generate_latest, multiprocess)
+from metrics_archive import archive_lock
+from redis_pool import pool_stats
 
 metrics_registry = CollectorRegistry()
 
+# Set by gunicorn.conf.py: every worker (and router process) writes its values
+# to mmap files there, and /metrics aggregates them instead of answering with
+# whichever worker happened to take the scrape.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
 
 http_requests_total = Counter(
     "http_requests_total",
@@ -94,6 +101,76 @@ operation_latency_seconds = Histogram(
 )
 
 
+kafka_responses_shed_total = Counter(
+    "kafka_responses_shed_total",
+    "Kafka responses dropped because the waiting request had already timed out",
+    ["topic"],
+    registry=metrics_registry,
+)
+
+kafka_trace_hop_seconds = Histogram(
+    "kafka_trace_hop_seconds",
+    "Time between consecutive hops of a traced request",
+    ["request", "from_hop", "to_hop"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    registry=metrics_registry,
+)
+
+kafka_produce_seconds = Histogram(
+    "kafka_produce_seconds",
+    "Time to produce and flush a Kafka request, retries included",
+    ["topic", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0),
+    registry=metrics_registry,
+)
+
+kafka_response_wait_seconds = Histogram(
+    "kafka_response_wait_seconds",
+    "Time a request waited for its Kafka response to show up in Redis",
+    ["outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+    registry=metrics_registry,
+)
+
+kafka_response_queue_depth = Gauge(
+    "kafka_response_queue_depth",
+    "Responses waiting in Kafka to be routed to Redis, by topic",
+    ["topic"],
+    registry=metrics_registry,
+    # Partitions are split across routers, so the pod's depth is their sum
+    multiprocess_mode="livesum",
+)
+
+
+"""
+Shared Redis connection pool usage
+"""
+redis_pool_connections = Gauge(
+    "redis_pool_connections",
+    "Connections in the shared Redis pool by state",
+    ["state"],
+    registry=metrics_registry,
+    multiprocess_mode="livesum",
+)
+
+POOL_STATES = ("in_use", "idle", "created", "max")
+
+if not MULTIPROC_DIR:
+    for _state in POOL_STATES:
+        redis_pool_connections.labels(state=_state).set_function(
+            lambda state=_state: pool_stats()[state]
+        )
+
+
+def _refresh_pool_metrics() -> None:
+    """Function gauges are not shared between processes, so write the values."""
+    if not MULTIPROC_DIR:
+        return
+    stats = pool_stats()
+    for state in POOL_STATES:
+        redis_pool_connections.labels(state=state).set(stats[state])
+
+
 def track_operation(
     operation_name: str,
 ) -> Callable[[Callable[..., Response]], Callable[..., Response]]:
@@ -130,7 +207,14 @@ def track_operation(
 
 def metrics_endpoint() -> Response:
     """Return Prometheus metrics in text format."""
-    return Response(generate_latest(metrics_registry), mimetype=CONTENT_TYPE_LATEST)
+    if not MULTIPROC_DIR:
+        return Response(generate_latest(metrics_registry), mimetype=CONTENT_TYPE_LATEST)
+    _refresh_pool_metrics()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    with archive_lock(MULTIPROC_DIR):
+        output = generate_latest(registry)
+    return Response(output, mimetype=CONTENT_TYPE_LATEST)
 
 
 def record_http_metrics(start_time: float, endpoint: str, status: int) -> None:
@@ -143,6 +227,7 @@ def record_http_metrics(start_time: float, endpoint: str, status: int) -> None:
     http_requests_total.labels(
         method=method, endpoint=endpoint, status=str(status)
     ).inc()
+    _refresh_pool_metrics()
 
 
 def track_eater_operation(
@@ -3,15 +3,14 @@ import os
 from datetime import datetime, timezone
 from io import BytesIO
 
-import redis
-from local_models_helper import LocalModelService
+from local_models_helper import get_local_model_service
+from redis_pool import redis_client
 from werkzeug.wrappers import Request
 
 from eater.getter_eater import get_recommendation
 from eater.proto import get_recomendation_pb2
 
 logger = logging.getLogger(__name__)
-redis_client = redis.StrictRedis(host=os.getenv("REDIS_ENDPOINT"), port=6379, db=0)
 
 IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
 KEY_PREFIX = "_dev:" if IS_DEV else ""
@@ -85,14 +84,12 @@ def _generate_and_cache_recommendation_background(user_email: str):
     """
 
     cooldown_key = f"{KEY_PREFIX}recommendation_bg_cooldown:{user_email}"
-    if redis_client.get(cooldown_key):
+    # 5-minute cooldown to save GPT requests and protect against multiple fast triggers
+    if not redis_client.set(cooldown_key, "1", ex=300, nx=True):
         logger.info("Skipping background recommendation for %s due to cooldown", user_email)
         return
-    
-    # 5-minute cooldown to save GPT requests and protect against multiple fast triggers
-    redis_client.setex(cooldown_key, 300, "1")
 
-    local_model_service = LocalModelService()
+    local_model_service = get_local_model_service()
 
     try:
         logger.info(
@@ -0,0 +1,64 @@
+"""Timing and baseline helpers shared by the offline benchmarks.
+
+A baseline is a JSON file of {case: {"median_us": ..., "p95_us": ...}}
+written with --save-baseline; later runs given --baseline fail when a
+case's median is more than --tolerance slower.
+"""
+
+import json
+import math
+import statistics
+import time
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile (q in 0..100) of already sorted samples."""
+    return samples[max(0, math.ceil(q / 100 * len(samples)) - 1)]
+
+
+def measure(fn, iterations, warmup=None):
+    """Per-call latency of fn() in microseconds: median, p95 and mean."""
+    for _ in range(warmup if warmup is not None else max(1, iterations // 10)):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "median_us": round(statistics.median(samples), 2),
+        "p95_us": round(percentile(samples, 95), 2),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "iterations": iterations,
+    }
+
+
+def report(name, result):
+    print(
+        f"{name:32} median {result['median_us']:10.1f} us  "
+        f"p95 {result['p95_us']:10.1f} us"
+    )
+
+
+def compare(results, baseline_path, tolerance):
+    """Cases slower than the baseline by more than tolerance (0.25 = 25%)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = previous["median_us"] * (1 + tolerance)
+        if result["median_us"] > limit:
+            regressions.append(
+                f"{name}: {result['median_us']:.1f} us vs "
+                f"{previous['median_us']:.1f} us in baseline"
+            )
+    return regressions
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,92 @@
+"""Per-message cost of logging a Kafka payload that carries a base64 photo.
+
+Compares the old eager f-string + synchronous FileHandler path with the
+truncating filter, with and without the background queue writer.
+
+Usage: python benchmarks/bench_logging.py [-n 2000] [--photo-kb 2048]
+"""
+
+import argparse
+import base64
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_payload(photo_kb):
+    photo = base64.b64encode(os.urandom(photo_kb * 768)).decode()
+    return {
+        "key": "3f1c2a9e-5d7b-4c1e-9a3f-2b8d6e4f1a0c",
+        "value": {
+            "user_email": "user@example.com",
+            "prompt": "Analyse the food in this photo",
+            "photo": photo,
+            "timestamp": "2026-01-01T12:00:00Z",
+        },
+    }
+
+
+def configure(mode, log_file):
+    os.environ["LOG_LEVEL"] = "INFO"
+    os.environ["LOG_ASYNC"] = "true" if mode == "async" else "false"
+    os.environ["LOG_MAX_VALUE_CHARS"] = "0" if mode == "legacy" else "1000"
+    import logging_config
+
+    logging_config = importlib.reload(logging_config)
+    logging_config.setup_logging(log_file)
+    # The benchmark measures the file write, not the terminal
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(
+            handler, logging.FileHandler
+        ):
+            handler.setStream(open(os.devnull, "w"))
+    listener = logging_config._listener
+    if listener is not None:
+        for handler in listener.handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setStream(open(os.devnull, "w"))
+    return logging_config
+
+
+def run(mode, payload, iterations, log_file):
+    logging_config = configure(mode, log_file)
+    logger = logging.getLogger("bench")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if mode == "legacy":
+            logger.info(f"Consumed message for user user@example.com: {payload}")
+        else:
+            logger.info("Consumed message for user %s: %s", "user@example.com", payload)
+    elapsed = time.perf_counter() - start
+    logging_config.stop_logging()
+    size = os.path.getsize(os.path.join(tempfile.gettempdir(), log_file))
+    print(
+        f"{mode:<8} {elapsed / iterations * 1e6:10.1f}us/msg "
+        f"log size {size / 1024 / 1024:8.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--photo-kb", type=int, default=2048)
+    args = parser.parse_args()
+
+    payload = make_payload(args.photo_kb)
+    for mode in ("legacy", "truncate", "async"):
+        log_file = f"bench_logging_{mode}.log"
+        path = os.path.join(tempfile.gettempdir(), log_file)
+        if os.path.exists(path):
+            os.remove(path)
+        run(mode, payload, args.iterations, log_file)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Offline microbenchmarks for chater_ui's hot helpers, runnable on a laptop.
+
+Covers json_to_plain_text, sanitize_data_for_logging, resize_image followed
+by the MinIO upload, the protobuf assembly in eater_get_today, the Redis
+response round trip (store as the router does, read as a request handler
+does), and the whole eater_get_today request with eater answering through
+the fake broker.
+
+Kafka, Redis and MinIO are the in-process fakes in fakes.py (fakeredis, see
+benchmarks/requirements.txt). Importing common still checks the user table,
+so POSTGRES_* must point at a local Postgres.
+
+Usage: python benchmarks/bench_offline.py [-n 2000] [--only resize]
+           [--save-baseline base.json | --baseline base.json]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+fakes.install()
+
+import baseline  # noqa: E402
+from common import (json_to_plain_text, resize_image,  # noqa: E402
+                    sanitize_data_for_logging)
+from eater import getter_eater  # noqa: E402
+from kafka_codec import loads  # noqa: E402
+from kafka_consumer_service import (get_user_message_response,  # noqa: E402
+                                    kafka_service)
+from minio_utils import put_bytes  # noqa: E402
+from PIL import Image  # noqa: E402
+
+BENCH_USER = "bench-user@example.invalid"
+
+RECOMMENDATION = {
+    "user_email": BENCH_USER,
+    "foods_to_reduce_or_avoid": [
+        {"dish_name": f"Fried dish {i}", "reason": "High in saturated fat"}
+        for i in range(4)
+    ],
+    "healthier_foods": [
+        {"dish_name": f"Grilled dish {i}", "reason": "Lean protein, more fibre"}
+        for i in range(4)
+    ],
+    "general_recommendations": {
+        f"tip_{i}": "Drink water before meals and add vegetables to lunch"
+        for i in range(5)
+    },
+    "age_based_health_advice": "Keep protein intake steady to preserve muscle.",
+    "recommended_dish": {
+        "cuisine": "Mediterranean",
+        "dish": "Chickpea salad",
+        "description": "Chickpeas, cucumber, tomato and olive oil",
+    },
+    "weekly_sugar_summary": "Added sugar averaged 6 tsp a day this week.",
+    "translation_keys": {"healthier_foods": "Healthier Food Options"},
+}
+
+TODAY = {
+    "total_for_day": {
+        "total_calories": 1850,
+        "total_avg_weight": 1400,
+        "contains": {"proteins": 95, "fats": 60, "carbohydrates": 210, "sugar": 40},
+    },
+    "dishes_today": [
+        {
+            "time": 1760000000 + i * 3600,
+            "dish_name": f"Dish {i}",
+            "estimated_avg_calories": 450,
+            "total_avg_weight": 350,
+            "health_rating": 70,
+            "ingredients": ["rice", "chicken", "broccoli", "soy sauce"],
+            "image_id": f"{BENCH_USER}/20260101_12000{i}.jpg",
+        }
+        for i in range(5)
+    ],
+    "latest_weight": {"time": 1760000000, "weight": 78.4},
+}
+
+
+def make_photo(width, height):
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def answer_today_request(message):
+    """Reply to get_today_data like eater, then route it like the consumer."""
+    request = loads(message.value())
+    reply = fakes.FakeMessage(
+        "send_today_data",
+        json.dumps(
+            {
+                "key": request["key"],
+                "value": {
+                    "dishes": TODAY,
+                    "user_email": request["value"]["user_email"],
+                },
+            }
+        ).encode(),
+        key=message.key(),
+        headers=message.headers(),
+    )
+    kafka_service.store_responses_in_redis([kafka_service._decode_response(reply)])
+
+
+def redis_round_trip():
+    message_uuid = str(uuid.uuid4())
+    kafka_service.store_responses_in_redis(
+        [(message_uuid, {"dishes": TODAY, "user_email": BENCH_USER}, BENCH_USER)]
+    )
+    if get_user_message_response(message_uuid, BENCH_USER, timeout=1) is None:
+        raise RuntimeError("Response was not found in Redis")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--photo-size", default="3024x4032", help="WIDTHxHEIGHT")
+    parser.add_argument("--only", help="run only cases whose name starts with this")
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--log-level", default="WARNING",
+        help="INFO includes the service log lines in the timings",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    fenced = "```json\n" + json.dumps(RECOMMENDATION) + "\n```"
+    photo = make_photo(*(int(side) for side in args.photo_size.split("x")))
+    minio = fakes.FakeMinio()
+    canned_kafka = getter_eater.eater_get_today_kafka
+
+    def photo_upload():
+        resized = resize_image(photo, max_size=(1024, 1024))
+        put_bytes(minio, "eater", f"{BENCH_USER}/photo.jpg", resized,
+                  content_type="image/jpeg")
+
+    def today_proto():
+        getter_eater.eater_get_today_kafka = lambda user_email: {"dishes": TODAY}
+        try:
+            body, status, _ = getter_eater.eater_get_today(BENCH_USER)
+        finally:
+            getter_eater.eater_get_today_kafka = canned_kafka
+        if status != 200:
+            raise RuntimeError(f"eater_get_today returned {status}")
+
+    def today_request():
+        body, status, _ = getter_eater.eater_get_today(BENCH_USER)
+        if status != 200:
+            raise RuntimeError(f"eater_get_today returned {status}")
+
+    # name: (callable, iterations); resizing a full photo is ~1000x slower
+    cases = {
+        "json_to_plain_text.dict": (
+            lambda: json_to_plain_text(RECOMMENDATION), args.iterations
+        ),
+        "json_to_plain_text.fenced_str": (
+            lambda: json_to_plain_text(fenced), args.iterations
+        ),
+        "sanitize_data_for_logging": (
+            lambda: sanitize_data_for_logging(RECOMMENDATION), args.iterations
+        ),
+        "resize_image.upload": (photo_upload, max(5, args.iterations // 200)),
+        "eater_get_today.proto": (today_proto, args.iterations),
+        "redis.response_round_trip": (redis_round_trip, args.iterations),
+        "eater_get_today.request": (today_request, args.iterations),
+    }
+
+    fakes.FakeBroker.reset(responder=answer_today_request)
+    results = {}
+    for name, (fn, iterations) in cases.items():
+        if args.only and not name.startswith(args.only):
+            continue
+        results[name] = baseline.measure(fn, iterations)
+        baseline.report(name, results[name])
+
+    if args.save_baseline:
+        baseline.save(results, args.save_baseline)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = baseline.compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
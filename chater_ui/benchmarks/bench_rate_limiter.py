@@ -0,0 +1,90 @@
+"""Per-request overhead of the rate limiter against a live Redis.
+
+Usage: REDIS_ENDPOINT=localhost python benchmarks/bench_rate_limiter.py [-n 5000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from baseline import percentile  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+
+def legacy_check(client, user_email, daily_limit):
+    """The previous GET / INCR / EXPIRE sequence, kept for comparison."""
+    current_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    redis_key = f"bench:rate_limit:{user_email}:{current_date}"
+    current_count = int(client.get(redis_key) or 0)
+    if current_count >= daily_limit:
+        return False
+    client.incr(redis_key)
+    next_day = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    client.expire(
+        redis_key, int((next_day - datetime.now(timezone.utc)).total_seconds())
+    )
+    return True
+
+
+def measure(label, fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    print(
+        f"{label:<28} mean={statistics.mean(samples):8.1f}us "
+        f"p50={percentile(samples, 50):8.1f}us "
+        f"p99={percentile(samples, 99):8.1f}us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    client = redis.StrictRedis(
+        host=os.getenv("REDIS_ENDPOINT", "localhost"), port=6379, db=0
+    )
+    client.ping()
+    huge = args.iterations * 10
+
+    legacy_user = f"bench-{uuid.uuid4()}"
+    measure(
+        "legacy GET/INCR/EXPIRE",
+        lambda: legacy_check(client, legacy_user, huge),
+        args.iterations,
+    )
+
+    limiter = RateLimiter(client, daily_limit=huge, burst_limit=huge)
+    atomic_user = f"bench-{uuid.uuid4()}"
+    measure("lua (allowed)", lambda: limiter.hit(atomic_user), args.iterations)
+
+    rejecting = RateLimiter(client, daily_limit=huge, burst_limit=1)
+    rejected_user = f"bench-{uuid.uuid4()}"
+    rejecting.hit(rejected_user)
+    measure(
+        "token bucket (rejected)",
+        lambda: rejecting.hit(rejected_user),
+        args.iterations,
+    )
+
+    for key in client.scan_iter("*rate_limit:bench-*"):
+        client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""In-process stand-ins for Kafka, Redis and MinIO, so benchmarks run
+without a cluster.
+
+install() registers a fake confluent_kafka module and swaps the shared Redis
+client for fakeredis; it must run before any chater_ui module that imports
+confluent_kafka or redis_pool. Producers append to FakeBroker.produced and
+hand each message to FakeBroker.responder, which lets a benchmark answer a
+request the way eater and the response router would.
+"""
+
+import io
+import os
+import sys
+import types
+
+import fakeredis
+
+
+class FakeBroker:
+    produced = []
+    # Called with every produced FakeMessage
+    responder = None
+
+    @classmethod
+    def reset(cls, responder=None):
+        cls.produced = []
+        cls.responder = responder
+
+
+class FakeMessage:
+    """The confluent_kafka.Message accessors the services use."""
+
+    def __init__(self, topic, value, key=None, headers=None, partition=0, offset=0):
+        self._topic = topic
+        self._value = value
+        self._key = key
+        self._headers = headers
+        self._partition = partition
+        self._offset = offset
+
+    def topic(self):
+        return self._topic
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def headers(self):
+        return self._headers
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def error(self):
+        return None
+
+
+class FakeProducer:
+    def __init__(self, conf=None):
+        self.conf = conf
+        self._pending = []
+
+    def produce(self, topic, value=None, key=None, headers=None, callback=None, **kwargs):
+        message = FakeMessage(topic, value, key, headers)
+        FakeBroker.produced.append(message)
+        if callback is not None:
+            self._pending.append((callback, message))
+        if FakeBroker.responder is not None:
+            FakeBroker.responder(message)
+
+    def poll(self, timeout=None):
+        pending, self._pending = self._pending, []
+        for callback, message in pending:
+            callback(None, message)
+        return len(pending)
+
+    def flush(self, timeout=None):
+        self.poll(0)
+        return 0
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class FakeConsumer:
+    """Never yields messages; benchmarks call the routing methods directly."""
+
+    def __init__(self, conf=None):
+        self.conf = conf
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.topics = topics
+
+    def poll(self, timeout=None):
+        return None
+
+    def consume(self, num_messages=1, timeout=None):
+        return []
+
+    def commit(self, message=None, offsets=None, asynchronous=True):
+        pass
+
+    def close(self):
+        pass
+
+
+class KafkaError:
+    _PARTITION_EOF = -191
+    BROKER_NOT_AVAILABLE = 8
+    INVALID_MSG_SIZE = 4
+
+
+class KafkaException(Exception):
+    pass
+
+
+class TopicPartition:
+    def __init__(self, topic, partition=0, offset=-1001):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+class FakeObject(io.BytesIO):
+    """Response of FakeMinio.get_object()."""
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """The subset of minio.Minio used by minio_utils, kept in a dict."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def make_bucket(self, bucket_name):
+        pass
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None):
+        self.objects[(bucket_name, object_name)] = data.read(length)
+
+    def get_object(self, bucket_name, object_name):
+        return FakeObject(self.objects[(bucket_name, object_name)])
+
+    def remove_object(self, bucket_name, object_name):
+        self.objects.pop((bucket_name, object_name), None)
+
+
+def install():
+    """Route confluent_kafka and the shared Redis client to in-process fakes."""
+    os.environ.setdefault("BOOTSTRAP_SERVER", "fake-kafka:9092")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+    module = types.ModuleType("confluent_kafka")
+    module.Consumer = FakeConsumer
+    module.Producer = FakeProducer
+    module.KafkaError = KafkaError
+    module.KafkaException = KafkaException
+    module.TopicPartition = TopicPartition
+    sys.modules["confluent_kafka"] = module
+
+    # Modules bind redis_pool.redis_client by name at import time
+    import redis_pool
+
+    redis_pool.redis_client = fakeredis.FakeStrictRedis()
+    return redis_pool.redis_client
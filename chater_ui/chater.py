@@ -14,6 +14,8 @@ logger = logging.getLogger(__name__)
 # Dev environment detection
 IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
 
+CHAT_RESPONSE_TIMEOUT = 220
+
 TARGET_CONFIG = {
     "chater": {
         "target": "chater",
@@ -75,6 +77,7 @@ def chater(session, target):
                 "dlp-source",
                 value=message["value"],
                 key=question_uuid,
+                deadline_seconds=CHAT_RESPONSE_TIMEOUT,
             )
         except KafkaDispatchError as kafka_error:
             logger.error(
@@ -128,7 +131,7 @@ def get_messages(message_uuid, topics):
 
     # Get response from Redis using the background consumer service
     try:
-        response = get_message_response(message_uuid, timeout=220)
+        response = get_message_response(message_uuid, timeout=CHAT_RESPONSE_TIMEOUT)
         if response is not None:
             logger.debug("Retrieved response for UUID %s", message_uuid)
             return response
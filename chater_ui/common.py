@@ -5,14 +5,16 @@ import os
 import re
 import secrets
 import string
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from functools import wraps
 
 import jwt
-import redis
 import yaml
-from flask import flash, jsonify, redirect, request, url_for
+from flask import flash, jsonify, redirect, request, session, url_for
 from PIL import Image
+from profiling import DEBUG_TOKEN_HEADER, debug_token_valid
+from rate_limiter import WINDOW_MINUTE, RateLimiter, RateLimitResult
+from redis_pool import redis_client
 from user import get_user_language, update_user_activity
 
 logger = logging.getLogger(__name__)
@@ -23,12 +25,11 @@ SECRET_KEY = _jwt_secret
 
 PROMPT_FILE = "eater/prompt.yaml"
 
-# Redis client for rate limiting
-redis_client = redis.StrictRedis(host=os.getenv("REDIS_ENDPOINT"), port=6379, db=0)
-
 IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
 KEY_PREFIX = "_dev:" if IS_DEV else ""
 
+rate_limiter = RateLimiter.from_env(redis_client)
+
 
 def get_jwt_secret_key():
     """
@@ -104,83 +105,65 @@ def token_required(f):
     return wrapper
 
 
+def debug_access_required(f):
+    """Admin login session or the X-Debug-Token header."""
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if "logged_in" not in session and not debug_token_valid(
+            request.headers.get(DEBUG_TOKEN_HEADER)
+        ):
+            logger.warning("Unauthorized debug endpoint access to %s", request.path)
+            return jsonify({"message": "Forbidden"}), 403
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
 def rate_limit_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         # Get user_email from kwargs (should be set by token_required decorator)
         user_email = kwargs.get("user_email")
-        daily_limit = int(os.getenv("DAILY_REQUEST_LIMIT", "10"))
         if not user_email:
             logger.error("Rate limit check failed: no user_email found")
             return jsonify({"message": "Authentication required"}), 401
 
         # Check rate limit
-        if not check_rate_limit(user_email):
-            logger.warning("Rate limit exceeded for user %s", user_email)
-            return (
-                jsonify(
-                    {
-                        "error": f"Unfortuantly, you have reached your daily limit of {daily_limit} requests. Please try again tomorrow, be mingfull and eat healthy food."
-                    }
-                ),
-                400,
+        result = hit_rate_limit(user_email)
+        if not result.allowed:
+            logger.warning(
+                "Rate limit exceeded for user %s (%s window)", user_email, result.window
             )
+            if result.window == WINDOW_MINUTE:
+                message = f"Too many requests, please slow down. You can send up to {rate_limiter.burst_limit} requests per minute."
+            else:
+                message = f"Unfortuantly, you have reached your daily limit of {rate_limiter.daily_limit} requests. Please try again tomorrow, be mingfull and eat healthy food."
+            return jsonify({"error": message}), 400
 
         return f(*args, **kwargs)
 
     return wrapper
 
 
-def check_rate_limit(user_email):
-    """Check if user has exceeded daily rate limit"""
+def hit_rate_limit(user_email):
+    """Count a request against the user's burst and daily windows"""
+    if user_email == os.getenv("TEST_USER_EMAIL", ""):
+        logger.debug("Rate limit check skipped for test user %s", user_email)
+        return RateLimitResult(True)
     try:
-        # Get daily limit from environment variable
-        daily_limit = int(os.getenv("DAILY_REQUEST_LIMIT", "10"))
-
-        if user_email == os.getenv("TEST_USER_EMAIL", ""):
-            logger.debug("Rate limit check skipped for test user %s", user_email)
-            return True
-        # Get current UTC date as key
-        current_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        redis_key = f"{KEY_PREFIX}rate_limit:{user_email}:{current_date}"
-
-        # Get current count
-        current_count = redis_client.get(redis_key)
-        if current_count is None:
-            current_count = 0
-        else:
-            current_count = int(current_count)
-
-        # Check if limit exceeded
-        if current_count >= daily_limit:
-            logger.warning(
-                "Rate limit exceeded for user %s: %d/%d",
-                user_email,
-                current_count,
-                daily_limit,
-            )
-            return False
-
-        # Increment counter
-        redis_client.incr(redis_key)
-
-        next_day = datetime.now(timezone.utc).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        ) + timedelta(days=1)
-        expiry_seconds = int((next_day - datetime.now(timezone.utc)).total_seconds())
-        redis_client.expire(redis_key, expiry_seconds)
-
+        result = rate_limiter.hit(user_email)
         logger.debug(
-            "Rate limit check passed for user %s: %d/%d",
+            "Rate limit check for user %s: %s (%s %d)",
             user_email,
-            current_count + 1,
-            daily_limit,
+            "passed" if result.allowed else "rejected",
+            result.window,
+            result.count,
         )
-        return True
-
+        return result
     except Exception as e:
         logger.error("Error checking rate limit for user %s: %s", user_email, e)
-        return True
+        return RateLimitResult(True)
 
 
 def get_prompt(key):
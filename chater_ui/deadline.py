@@ -0,0 +1,31 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Absolute deadline in epoch milliseconds. Downstream services drop requests
+# past it and copy it onto their responses.
+DEADLINE_HEADER = "x-deadline-ms"
+
+
+def deadline_headers(timeout_seconds):
+    """Headers giving a request timeout_seconds from now to be answered."""
+    deadline_ms = int((time.time() + timeout_seconds) * 1000)
+    return [(DEADLINE_HEADER, str(deadline_ms).encode())]
+
+
+def get_deadline(message):
+    """Return the message deadline as epoch seconds, or None if it has none."""
+    for name, value in message.headers() or ():
+        if name == DEADLINE_HEADER and value:
+            try:
+                return int(value) / 1000.0
+            except (TypeError, ValueError):
+                logger.warning("Ignoring malformed deadline header: %r", value)
+                return None
+    return None
+
+
+def is_expired(message, now=None):
+    deadline = get_deadline(message)
+    return deadline is not None and deadline <= (now or time.time())
@@ -101,6 +101,7 @@ def get_chess_stats_request(user_email):
         message_id = send_kafka_message(
             "get_chess_stats",
             value={"user_email": user_email, "opponent_email": opponent_email},
+            deadline_seconds=CHESS_READ_TIMEOUT,
         )
         response = get_user_message_response(
             message_id, user_email, timeout=CHESS_READ_TIMEOUT
@@ -128,6 +129,7 @@ def get_all_chess_data_request(user_email):
         message_id = send_kafka_message(
             "get_all_chess_data",
             value={"user_email": user_email},
+            deadline_seconds=CHESS_READ_TIMEOUT,
         )
         response = get_user_message_response(
             message_id, user_email, timeout=CHESS_READ_TIMEOUT
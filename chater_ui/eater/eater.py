@@ -6,7 +6,7 @@ from app.trnd_processor import (_generate_and_cache_recommendation_background,
                                 cache_recommendation,
                                 get_cached_recommendation,
                                 invalidate_recommendation_cache)
-from local_models_helper import LocalModelService
+from local_models_helper import get_local_model_service
 
 from .food_operations import (delete_food, get_alcohol_latest,
                               get_alcohol_range, manual_weight,
@@ -18,7 +18,7 @@ from .language import set_language_handler
 from .process_photo import eater_get_photo
 
 logger = logging.getLogger(__name__)
-local_model_service = LocalModelService()
+local_model_service = get_local_model_service()
 
 
 def eater_photo(user_email):
@@ -8,7 +8,7 @@ from flask import current_app, jsonify
 from kafka_consumer_service import get_user_message_response
 from kafka_producer import KafkaDispatchError, send_kafka_message
 
-from local_models_helper import LocalModelService
+from local_models_helper import get_local_model_service
 
 from .proto import (alcohol_pb2, delete_food_pb2, manual_weight_pb2,
                     modify_food_record_pb2)
@@ -17,13 +17,16 @@ from .process_photo import _dispatch_photo_message
 logger = logging.getLogger(__name__)
 
 
-def _dispatch_kafka_request(topic, payload, user_email, proto_error=None):
+def _dispatch_kafka_request(
+    topic, payload, user_email, proto_error=None, deadline_seconds=None
+):
     try:
         message_id = send_kafka_message(
             topic,
             value=payload,
             key=str(uuid.uuid4()),
             ensure_user_email=True,
+            deadline_seconds=deadline_seconds,
         )
     except KafkaDispatchError as error:
         logger.error(
@@ -196,7 +199,7 @@ def modify_food_record(request, user_email):
 
             photo_base64 = base64.b64encode(photo_bytes).decode("utf-8")
             message_id = str(uuid.uuid4())
-            local_model_service = LocalModelService()
+            local_model_service = get_local_model_service()
 
             suffix = None
             if manual_food_name:
@@ -442,6 +445,7 @@ def get_alcohol_latest(user_email):
             topic="get_alcohol_latest",
             payload=payload,
             user_email=user_email,
+            deadline_seconds=30,
         )
         if error:
             status, _message = error
@@ -510,6 +514,7 @@ def get_alcohol_range(request, user_email):
             topic="get_alcohol_range",
             payload=payload,
             user_email=user_email,
+            deadline_seconds=30,
         )
         if error:
             status, _message = error
@@ -17,6 +17,7 @@ def eater_kafka_request(topic_send, topic_receive, payload, user_email, timeout_
         message_id = send_kafka_message(
             topic_send,
             value={**payload, "user_email": user_email},
+            deadline_seconds=timeout_sec,
         )
         logger.info("Dispatching %s request for user %s", topic_send, user_email)
     except KafkaDispatchError as kafka_error:
@@ -0,0 +1,56 @@
+"""Nutrition rollup endpoint via Kafka (app -> eater service)."""
+import logging
+
+from flask import jsonify, request
+from kafka_consumer_service import get_user_message_response
+from kafka_producer import KafkaDispatchError, send_kafka_message
+
+logger = logging.getLogger(__name__)
+
+NUTRITION_ROLLUP_TIMEOUT = 15
+ROLLUP_PERIODS = ("week", "month")
+
+
+def get_nutrition_rollup_request(user_email):
+    """
+    JSON body: {"period": "week"|"month", "start_date": "dd-mm-yyyy", "end_date": "dd-mm-yyyy"}.
+    Returns the user's weekly or monthly totals for the range as (response_body, status_code).
+    """
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        period = (data.get("period") or "week").strip()
+        start_date = (data.get("start_date") or "").strip()
+        end_date = (data.get("end_date") or "").strip()
+
+        if period not in ROLLUP_PERIODS:
+            return jsonify({"error": "period must be week or month"}), 400
+        if not start_date or not end_date:
+            return jsonify({"error": "start_date and end_date required"}), 400
+
+        message_id = send_kafka_message(
+            "get_nutrition_rollup",
+            value={
+                "user_email": user_email,
+                "period": period,
+                "start_date": start_date,
+                "end_date": end_date,
+            },
+            deadline_seconds=NUTRITION_ROLLUP_TIMEOUT,
+        )
+        response = get_user_message_response(
+            message_id, user_email, timeout=NUTRITION_ROLLUP_TIMEOUT
+        )
+        if response is None:
+            return jsonify({"error": "Service temporarily unavailable"}), 503
+        if response.get("error"):
+            return jsonify({"error": response.get("error")}), 500
+        return jsonify({
+            "period": response.get("period", period),
+            "series": response.get("series", []),
+        }), 200
+    except KafkaDispatchError as e:
+        logger.error("Kafka error in get_nutrition_rollup for %s: %s", user_email, e)
+        return jsonify({"error": "Service unavailable"}), e.status_code
+    except Exception as e:
+        logger.exception("get_nutrition_rollup failed for %s: %s", user_email, e)
+        return jsonify({"error": "Internal server error"}), 500
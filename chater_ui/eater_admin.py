@@ -6,6 +6,7 @@ import requests
 from flask import Response, flash, jsonify, redirect
 from flask import session as flask_session
 from flask import url_for
+from local_models_helper import get_local_model_service
 
 logger = logging.getLogger(__name__)
 
@@ -88,3 +89,34 @@ def eater_admin_proxy(resource_path):
     except requests.exceptions.RequestException as e:
         logger.error(f"Proxy error fetching {target_url}: {e}")
         return Response(status=502)
+
+
+def set_model_tier_request(session, data):
+    """Admin change of a user's model tier, applied by every chater_ui process."""
+    if "logged_in" not in session:
+        logger.warning("Unauthorized model tier change attempt")
+        return jsonify({"message": "Forbidden"}), 403
+
+    data = data or {}
+    email = data.get("email")
+    model_tier = data.get("model_tier")
+    if not isinstance(email, str) or not email or not isinstance(model_tier, str):
+        return jsonify({"error": "email and model_tier are required"}), 400
+
+    try:
+        model_tier = get_local_model_service().set_user_model_tier(email, model_tier)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error setting model tier for {email}: {e}")
+        return jsonify({"error": "Failed to set model tier"}), 500
+    if model_tier is None:
+        return jsonify({"error": f"Unknown user: {email}"}), 404
+
+    logger.info(
+        "Model tier for %s set to %s by %s",
+        email,
+        model_tier,
+        session.get("username"),
+    )
+    return jsonify({"email": email, "model_tier": model_tier}), 200
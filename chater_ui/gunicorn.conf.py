@@ -1,6 +1,7 @@
 # Gunicorn configuration file for production deployment
 import multiprocessing
 import os
+import shutil
 
 # Server socket
 port = os.getenv("PORT", "5000")
@@ -15,8 +16,12 @@ timeout = 60
 graceful_timeout = 30
 keepalive = 2
 
-# Restart workers after this many requests, to prevent memory leaks
-max_requests = 1000
+# Restart workers after this many requests, to prevent memory leaks.
+# child_exit archives each recycled worker's Prometheus files, so the
+# multiprocess directory does not grow with every restart.
+# GUNICORN_MAX_REQUESTS=0 keeps workers alive while hunting a leak with the
+# /debug/tracemalloc endpoints.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
 max_requests_jitter = 50
 
 # Logging - use environment variable for log level
@@ -41,3 +46,57 @@ tmp_upload_dir = None
 # SSL (if certificates are available)
 # keyfile = None
 # certfile = None
+
+
+# Prometheus multiprocess mode
+# Must be in the environment before prometheus_client is imported by the
+# preloaded app. Each worker and router process writes its metrics to files
+# here and /metrics aggregates them, instead of every scrape seeing one worker.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/chater_ui_prometheus"
+)
+
+
+def _reset_prometheus_dir():
+    # Files left by a previous master would be added to this run's counters
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drops the worker's live gauges and folds its counters and histograms
+    # into the archive files, so recycled workers do not pile up files
+    from metrics_archive import archive_process_metrics
+
+    archive_process_metrics(worker.pid)
+
+
+def post_worker_init(worker):
+    # Start the local model prober before the first request needs its answer
+    from local_models_helper import get_local_model_service
+
+    get_local_model_service().is_available()
+
+
+# Kafka response router
+# With KAFKA_RESPONSE_ROUTER=gunicorn the master spawns dedicated router
+# processes once per pod instead of each worker running a consumer thread.
+_router_processes = []
+
+
+def on_starting(server):
+    _reset_prometheus_dir()
+    if os.getenv("KAFKA_RESPONSE_ROUTER", "thread").lower() != "gunicorn":
+        return
+    from response_router import spawn_router_processes
+
+    _router_processes.extend(spawn_router_processes())
+
+
+def on_exit(server):
+    if not _router_processes:
+        return
+    from response_router import stop_router_processes
+
+    # The supervisor restarts routers that exit and stops them on SIGTERM
+    stop_router_processes(_router_processes)
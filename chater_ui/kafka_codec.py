@@ -0,0 +1,85 @@
+import json
+import time
+
+from app.metrics import metrics_registry
+from prometheus_client import Histogram
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+kafka_serialization_seconds = Histogram(
+    "kafka_serialization_seconds",
+    "Time spent encoding or decoding Kafka JSON payloads",
+    ["operation"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+    registry=metrics_registry,
+)
+
+kafka_payload_bytes = Histogram(
+    "kafka_payload_bytes",
+    "Size of encoded or decoded Kafka JSON payloads",
+    ["operation"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    registry=metrics_registry,
+)
+
+
+def loads(data):
+    """Decode JSON bytes/str; orjson errors subclass json.JSONDecodeError."""
+    start = time.perf_counter()
+    obj = orjson.loads(data) if orjson is not None else json.loads(data)
+    kafka_serialization_seconds.labels(operation="decode").observe(
+        time.perf_counter() - start
+    )
+    kafka_payload_bytes.labels(operation="decode").observe(len(data))
+    return obj
+
+
+def dumps(obj):
+    """Encode to JSON bytes, falling back to json for types orjson rejects."""
+    start = time.perf_counter()
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj)
+        except TypeError:
+            data = None
+    if data is None:
+        data = json.dumps(obj).encode("utf-8")
+    kafka_serialization_seconds.labels(operation="encode").observe(
+        time.perf_counter() - start
+    )
+    kafka_payload_bytes.labels(operation="encode").observe(len(data))
+    return data
+
+
+class KafkaMessage:
+    """A consumed Kafka message whose JSON envelope has been decoded once.
+
+    Behaves like the underlying confluent_kafka Message (topic(), key(),
+    headers(), ...) so it can be passed to commit and header helpers.
+    """
+
+    __slots__ = ("_message", "payload")
+
+    def __init__(self, message, payload):
+        self._message = message
+        self.payload = payload
+
+    @classmethod
+    def decode(cls, message):
+        return cls(message, loads(message.value()))
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+    @property
+    def value_dict(self):
+        value = self.payload.get("value") if isinstance(self.payload, dict) else None
+        return value if isinstance(value, dict) else {}
+
+    @property
+    def user_email(self):
+        return self.value_dict.get("user_email")
@@ -4,10 +4,17 @@ import os
 import threading
 import time
 
-import redis
-from confluent_kafka import Consumer, KafkaError, KafkaException
+from commit_manager import OffsetCommitManager
+from app.metrics import (kafka_response_queue_depth,
+                         kafka_response_wait_seconds, kafka_responses_shed_total)
+from confluent_kafka import Consumer, KafkaError, KafkaException, TopicPartition
+from deadline import is_expired
+from kafka_codec import loads
+from message_routing import correlation_id
 from logging_config import setup_logging
 from dev_utils import get_topics_list, get_kafka_group_id
+from redis_pool import redis_client
+from tracing import finish_trace, trace_response
 
 setup_logging("kafka_consumer_service.log")
 logger = logging.getLogger("kafka_consumer_service")
@@ -15,12 +22,19 @@ logger = logging.getLogger("kafka_consumer_service")
 CONSUMER_RESTART_BACKOFF_SECONDS = 5
 MAX_CONSUMER_ERROR_RETRIES = 5
 
+# Where responses are consumed: "thread" inside each app process, "gunicorn"
+# in a router process spawned by the gunicorn master, or "sidecar" when
+# response_router.py runs in its own container.
+RESPONSE_ROUTER_MODE = os.getenv("KAFKA_RESPONSE_ROUTER", "thread").lower()
+RESPONSE_BATCH_SIZE = int(os.getenv("KAFKA_RESPONSE_BATCH_SIZE", "100"))
+# How often the router reports how far behind the response topics it is
+QUEUE_DEPTH_INTERVAL_SECONDS = float(os.getenv("KAFKA_QUEUE_DEPTH_INTERVAL", "5"))
+
 
 class KafkaConsumerService:
-    def __init__(self):
-        self.redis_client = redis.StrictRedis(
-            host=os.getenv("REDIS_ENDPOINT"), port=6379, db=0
-        )
+    def __init__(self, batch_size=RESPONSE_BATCH_SIZE):
+        self.redis_client = redis_client
+        self.batch_size = max(1, batch_size)
         self.consumers = {}
         self.is_running = False
         self.threads = []
@@ -43,10 +57,13 @@ class KafkaConsumerService:
             "record_chess_game_response": {"name": "record_chess_game_response"},
             "get_chess_stats_response": {"name": "get_chess_stats_response"},
             "get_all_chess_data_response": {"name": "get_all_chess_data_response"},
+            "get_nutrition_rollup_response": {
+                "name": "get_nutrition_rollup_response"
+            },
         }
 
     def create_consumer(self, topics):
-        """Create a Kafka consumer for specific topics"""
+        """Create a Kafka consumer and its offset commit manager for specific topics"""
         if not isinstance(topics, list):
             logger.error("Expected list of topic unicode strings")
             raise TypeError("Expected list of topic unicode strings")
@@ -65,7 +82,7 @@ class KafkaConsumerService:
                     "bootstrap.servers": bootstrap_servers,
                     "group.id": get_kafka_group_id("chater_background_service"),
                     "auto.offset.reset": "earliest",
-                    "enable.auto.commit": True,
+                    "enable.auto.commit": False,
                     "max.poll.interval.ms": 300000,
                     "session.timeout.ms": 60000,
                     "heartbeat.interval.ms": 10000,
@@ -73,16 +90,19 @@ class KafkaConsumerService:
                 }
             )
 
+            commits = OffsetCommitManager(consumer)
+
             def on_assign(consumer, partitions):
                 logger.info(f"Assigned partitions: {partitions}")
 
             def on_revoke(consumer, partitions):
                 logger.info(f"Partitions revoked: {partitions}")
+                commits.on_revoke(consumer, partitions)
 
             topics = get_topics_list(topics)
             consumer.subscribe(topics, on_assign=on_assign, on_revoke=on_revoke)
             logger.info(f"Subscribed to topics: {topics}")
-            return consumer
+            return consumer, commits
         except KafkaException as e:
             logger.error(f"Failed to create consumer: {str(e)}")
             raise
@@ -91,18 +111,10 @@ class KafkaConsumerService:
         """Store response in Redis with expiration"""
         try:
             # Store response for 10 minutes (600 seconds)
-            self.redis_client.setex(
-                f"{self.key_prefix}kafka_response:{message_uuid}", 600, json.dumps(response_data)
-            )
-
-            # Also store with user-specific key if user_email is provided
-            if user_email:
-                self.redis_client.setex(
-                    f"{self.key_prefix}kafka_response_user:{user_email}:{message_uuid}",
-                    600,
-                    json.dumps(response_data),
-                )
-
+            if not self.store_responses_in_redis(
+                [(message_uuid, response_data, user_email)]
+            ):
+                return
             logger.info(
                 f"Stored response for message UUID: {message_uuid}"
                 + (f" and user: {user_email}" if user_email else "")
@@ -110,15 +122,72 @@ class KafkaConsumerService:
         except Exception as e:
             logger.error(f"Failed to store response in Redis: {str(e)}")
 
+    def store_responses_in_redis(self, responses):
+        """Store (uuid, value, user_email[, trace]) responses in one round trip"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for message_uuid, response_value, user_email, *trace in responses:
+                payload = json.dumps(response_value)
+                if trace and trace[0]:
+                    # Read back by the waiting request to close its trace
+                    pipe.setex(
+                        f"{self.key_prefix}kafka_trace:{message_uuid}", 600, trace[0]
+                    )
+                pipe.setex(
+                    f"{self.key_prefix}kafka_response:{message_uuid}", 600, payload
+                )
+                if user_email:
+                    pipe.setex(
+                        f"{self.key_prefix}kafka_response_user:{user_email}:{message_uuid}",
+                        600,
+                        payload,
+                    )
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store {len(responses)} responses in Redis: {str(e)}")
+            return False
+
+    def _decode_response(self, msg):
+        """Return (uuid, value, user_email, trace) for a response message, or None"""
+        message_payload = msg.value()
+        if message_payload is None:
+            logger.warning(f"Received empty message payload on topic {msg.topic()}")
+            return None
+
+        try:
+            message_data = loads(message_payload)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse message as JSON: {str(e)}")
+            return None
+        logger.debug("Received message on topic %s: %s", msg.topic(), message_data)
+
+        # Extract message UUID from the correlation header or the envelope
+        message_uuid = correlation_id(msg, message_data)
+        if not message_uuid:
+            logger.warning(f"No message UUID found in message on topic {msg.topic()}")
+            return None
+
+        response_value = (
+            message_data.get("value") if isinstance(message_data, dict) else message_data
+        )
+
+        # Extract user_email for user-specific storage
+        user_email = None
+        if isinstance(response_value, dict):
+            user_email = response_value.get("user_email")
+        return message_uuid, response_value, user_email, trace_response(msg)
+
     def consume_topic_messages(self, topics):
         """Consume messages from specific topics continuously"""
         logger.info(f"Starting consumer worker for topics: {topics}")
 
         while self.is_running:
             consumer = None
+            commits = None
             try:
-                consumer = self.create_consumer(topics)
-                self._consume_loop(consumer, topics)
+                consumer, commits = self.create_consumer(topics)
+                self._consume_loop(consumer, commits, topics)
             except Exception as e:
                 if not self.is_running:
                     break
@@ -129,6 +198,7 @@ class KafkaConsumerService:
             finally:
                 if consumer is not None:
                     try:
+                        commits.close()
                         consumer.close()
                         logger.info(f"Consumer closed for topics: {topics}")
                     except Exception as close_error:
@@ -138,12 +208,41 @@ class KafkaConsumerService:
 
         logger.info(f"Stopping consumer worker for topics: {topics}")
 
-    def _consume_loop(self, consumer, topics):
+    def _update_queue_depth(self, consumer, topics):
+        """Set the response backlog gauge from the assigned partitions' lag"""
+        try:
+            positions = consumer.position(consumer.assignment())
+            depth = dict.fromkeys(get_topics_list(topics), 0)
+            for partition in positions:
+                # The high watermark cached from the last fetch, no broker call
+                watermarks = consumer.get_watermark_offsets(partition, cached=True)
+                if not watermarks or partition.offset < 0 or watermarks[1] < 0:
+                    continue
+                high = watermarks[1]
+                depth[partition.topic] = depth.get(partition.topic, 0) + max(
+                    0, high - partition.offset
+                )
+        except KafkaException as e:
+            logger.debug(f"Could not read response queue depth: {e}")
+            return
+        for topic, count in depth.items():
+            kafka_response_queue_depth.labels(topic=topic).set(count)
+
+    def _consume_loop(self, consumer, commits, topics):
         consecutive_errors = 0
+        depth_updated = 0.0
 
         while self.is_running:
+            if time.monotonic() - depth_updated >= QUEUE_DEPTH_INTERVAL_SECONDS:
+                self._update_queue_depth(consumer, topics)
+                depth_updated = time.monotonic()
             try:
+                # Block for the first message, then drain whatever is already
+                # fetched so a batch never waits on a partially filled poll.
                 msg = consumer.poll(1.0)
+                messages = [msg] if msg is not None else []
+                if messages and self.batch_size > 1:
+                    messages.extend(consumer.consume(self.batch_size - 1, 0))
             except KafkaException as e:
                 error = e.args[0] if e.args else e
                 consecutive_errors += 1
@@ -185,11 +284,17 @@ class KafkaConsumerService:
                 time.sleep(backoff)
                 continue
 
-            if msg is None:
+            if not messages:
+                commits.maybe_commit()
                 continue
 
             consecutive_errors = 0
+            self._route_batch(consumer, commits, topics, messages)
 
+    def _route_batch(self, consumer, commits, topics, messages):
+        responses = []
+        processed = []
+        for msg in messages:
             if msg.error():
                 error = msg.error()
                 if error.code() == KafkaError._PARTITION_EOF:
@@ -226,60 +331,49 @@ class KafkaConsumerService:
                 logger.error(f"Consumer error: {error}")
                 continue
 
-            try:
-                message_payload = msg.value()
-                if message_payload is None:
-                    logger.warning(
-                        f"Received empty message payload on topic {msg.topic()}"
-                    )
-                    continue
-
-                message_data = json.loads(message_payload.decode("utf-8"))
-                logger.info(f"Received message on topic {msg.topic()}: {message_data}")
-
-                # Extract message UUID from key or value
-                message_uuid = msg.key().decode("utf-8") if msg.key() else None
-                if not message_uuid and isinstance(message_data, dict):
-                    message_uuid = message_data.get("key")
-
-                if message_uuid:
-                    # Store the response in Redis
-                    response_value = (
-                        message_data.get("value")
-                        if isinstance(message_data, dict)
-                        else message_data
-                    )
-
-                    # Extract user_email for user-specific storage
-                    user_email = None
-                    if isinstance(response_value, dict):
-                        user_email = response_value.get("user_email")
-
-                    self.store_response_in_redis(
-                        message_uuid, response_value, user_email
-                    )
-
-                    logger.info(
-                        f"Processed message UUID: {message_uuid} from topic: {msg.topic()}"
-                        + (f" for user: {user_email}" if user_email else "")
-                    )
-                else:
-                    logger.warning(f"No message UUID found in message: {message_data}")
-
-                try:
-                    consumer.commit(msg)
-                except KafkaException as commit_error:
-                    logger.error(
-                        f"Commit failed for message {message_uuid} on topic {msg.topic()}: {commit_error}"
-                    )
-                    if commit_error.args and commit_error.args[0].fatal():
-                        raise
+            # Nobody is polling Redis for an answer past its deadline
+            if is_expired(msg):
+                kafka_responses_shed_total.labels(topic=msg.topic()).inc()
+                logger.debug(f"Dropping expired response on topic {msg.topic()}")
+                processed.append(msg)
+                continue
 
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse message as JSON: {str(e)}")
+            try:
+                decoded = self._decode_response(msg)
             except Exception as e:
                 logger.error(f"Error processing message: {str(e)}")
                 logger.debug("Processing error details", exc_info=True)
+                continue
+            if decoded:
+                responses.append(decoded)
+            processed.append(msg)
+
+        if responses:
+            if not self.store_responses_in_redis(responses):
+                # Leave the offsets unmarked and read the batch again
+                self._rewind(consumer, processed)
+                time.sleep(1)
+                return
+            logger.info(
+                "Routed %d responses from %d messages", len(responses), len(messages)
+            )
+
+        # Offsets are only marked once the batch is in Redis
+        for msg in processed:
+            commits.mark(msg)
+
+    @staticmethod
+    def _rewind(consumer, messages):
+        """Seek every partition in the batch back to its first message."""
+        first = {}
+        for msg in messages:
+            key = (msg.topic(), msg.partition())
+            first[key] = min(first.get(key, msg.offset()), msg.offset())
+        for (topic, partition), offset in first.items():
+            try:
+                consumer.seek(TopicPartition(topic, partition, offset))
+            except KafkaException as e:
+                logger.error(f"Failed to rewind {topic}[{partition}] to {offset}: {e}")
 
     def start_service(self):
         """Start the background consumer service"""
@@ -319,10 +413,17 @@ class KafkaConsumerService:
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
-                response_data = self.redis_client.get(f"{self.key_prefix}kafka_response:{message_uuid}")
+                # Read and delete in one round trip; DEL is a no-op on a miss
+                key = f"{self.key_prefix}kafka_response:{message_uuid}"
+                trace_key = f"{self.key_prefix}kafka_trace:{message_uuid}"
+                pipe = self.redis_client.pipeline()
+                pipe.get(key)
+                pipe.get(trace_key)
+                pipe.delete(key, trace_key)
+                response_data, trace_data, _ = pipe.execute()
                 if response_data:
-                    # Delete the response after retrieving it
-                    self.redis_client.delete(f"{self.key_prefix}kafka_response:{message_uuid}")
+                    finish_trace(message_uuid, _decode_trace(trace_data))
+                    _observe_wait(start_time, "answered")
                     return json.loads(response_data.decode("utf-8"))
             except Exception as e:
                 logger.error(f"Error retrieving response from Redis: {str(e)}")
@@ -330,6 +431,8 @@ class KafkaConsumerService:
             time.sleep(0.5)  # Poll every 500ms
 
         logger.warning(f"Timeout waiting for response for UUID: {message_uuid}")
+        finish_trace(message_uuid, None, answered=False)
+        _observe_wait(start_time, "timeout")
         return None
 
     def get_user_response_from_redis(self, message_uuid, user_email, timeout=120):
@@ -337,20 +440,21 @@ class KafkaConsumerService:
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
-                # Try user-specific key first
-                response_data = self.redis_client.get(
-                    f"{self.key_prefix}kafka_response_user:{user_email}:{message_uuid}"
+                user_key = f"{self.key_prefix}kafka_response_user:{user_email}:{message_uuid}"
+                general_key = f"{self.key_prefix}kafka_response:{message_uuid}"
+                trace_key = f"{self.key_prefix}kafka_trace:{message_uuid}"
+                # Fetch the user-specific and general keys in one round trip
+                user_data, response_data, trace_data = self.redis_client.mget(
+                    user_key, general_key, trace_key
                 )
-                if response_data:
+                if user_data:
                     # Delete both user-specific and general keys
-                    self.redis_client.delete(
-                        f"{self.key_prefix}kafka_response_user:{user_email}:{message_uuid}"
-                    )
-                    self.redis_client.delete(f"{self.key_prefix}kafka_response:{message_uuid}")
-                    return json.loads(response_data.decode("utf-8"))
+                    self.redis_client.delete(user_key, general_key, trace_key)
+                    finish_trace(message_uuid, _decode_trace(trace_data))
+                    _observe_wait(start_time, "answered")
+                    return json.loads(user_data.decode("utf-8"))
 
                 # Fallback to general key
-                response_data = self.redis_client.get(f"{self.key_prefix}kafka_response:{message_uuid}")
                 if response_data:
                     parsed_data = json.loads(response_data.decode("utf-8"))
                     # Check if this response is for the correct user
@@ -359,7 +463,9 @@ class KafkaConsumerService:
                         and parsed_data.get("user_email") == user_email
                     ):
                         # Delete the response after retrieving it
-                        self.redis_client.delete(f"{self.key_prefix}kafka_response:{message_uuid}")
+                        self.redis_client.delete(general_key, trace_key)
+                        finish_trace(message_uuid, _decode_trace(trace_data))
+                        _observe_wait(start_time, "answered")
                         return parsed_data
 
             except Exception as e:
@@ -370,9 +476,21 @@ class KafkaConsumerService:
         logger.warning(
             f"Timeout waiting for response for UUID: {message_uuid} and user: {user_email}"
         )
+        finish_trace(message_uuid, None, answered=False)
+        _observe_wait(start_time, "timeout")
         return None
 
 
+def _observe_wait(start_time, outcome):
+    kafka_response_wait_seconds.labels(outcome=outcome).observe(
+        time.time() - start_time
+    )
+
+
+def _decode_trace(trace_data):
+    return trace_data.decode("utf-8") if trace_data else None
+
+
 # Global service instance
 kafka_service = KafkaConsumerService()
 
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import threading
@@ -6,9 +5,15 @@ import time
 import uuid
 from typing import Any, Dict, Optional
 
+from app.metrics import kafka_produce_seconds
 from confluent_kafka import KafkaException, Producer
+from deadline import deadline_headers
+from message_routing import (PARTITIONER, message_headers,
+                             message_routing_key)
 from logging_config import setup_logging
 from dev_utils import get_topic_name
+from kafka_codec import dumps
+from tracing import start_trace
 
 setup_logging("kafka_producer.log")
 logger = logging.getLogger(__name__)
@@ -51,6 +56,7 @@ def create_producer():
                         "message.max.bytes": 10000000,
                         "client.id": "chater-ui-producer",
                         "acks": "all",
+                        "partitioner": PARTITIONER,
                         "socket.keepalive.enable": True,
                     }
                     _producer_instance = Producer(conf)
@@ -64,28 +70,23 @@ def create_producer():
     return _producer_instance
 
 
-def delivery_report(err, msg):
+def delivery_report(err, msg, user_email="unknown"):
     if err is not None:
         logger.error(f"Message delivery failed: {err}")
         return
 
-    try:
-        message_data = json.loads(msg.value()) if msg.value() else {}
-    except (json.JSONDecodeError, TypeError) as parse_error:
-        logger.warning(f"Failed to decode delivered message payload: {parse_error}")
-        message_data = {}
-
-    user_email = message_data.get("value", {}).get("user_email", "unknown")
     logger.info(
         f"Message delivered to {msg.topic()} [{msg.partition()}] for user {user_email}"
     )
 
 
-def produce_message(producer, topic, message, ensure_user_email=True):
+def produce_message(producer, topic, message, ensure_user_email=True, headers=None):
     topic = get_topic_name(topic)
     if not isinstance(message, dict):
         raise TypeError("message must be a dictionary")
 
+    start = None
+    outcome = "error"
     try:
         # Ensure message has a value field
         if "value" not in message or not isinstance(message["value"], dict):
@@ -93,7 +94,7 @@ def produce_message(producer, topic, message, ensure_user_email=True):
 
         # Debug logging for auth topic
         if topic in ("auth_requires_token", "auth_requires_token_dev"):
-            logger.info(f"AUTH DEBUG - Message before user_email check: {message}")
+            logger.info("AUTH DEBUG - Message before user_email check: %s", message)
             logger.info(
                 f"AUTH DEBUG - Message value keys: {list(message.get('value', {}).keys())}"
             )
@@ -104,19 +105,23 @@ def produce_message(producer, topic, message, ensure_user_email=True):
         # Add user_email to the message if not present
         if ensure_user_email and "user_email" not in message["value"]:
             logger.warning(f"No user_email found in message value for topic {topic}")
-            logger.warning(f"Message structure: {message}")
+            logger.warning("Message structure: %s", message)
             message["value"]["user_email"] = "unknown"
 
-        payload = json.dumps(message)
+        payload = dumps(message)
+        user_email = message["value"].get("user_email", "unknown")
 
+        start = time.perf_counter()
         attempts = 0
         while True:
             try:
                 producer.produce(
                     topic,
-                    key=message.get("key"),
+                    key=message_routing_key(message),
                     value=payload,
-                    callback=delivery_report,
+                    headers=message_headers(message, headers),
+                    # Pass the email along rather than re-parsing the payload
+                    callback=lambda err, msg: delivery_report(err, msg, user_email),
                 )
                 producer.poll(0)
                 break
@@ -154,7 +159,9 @@ def produce_message(producer, topic, message, ensure_user_email=True):
                 raise
 
         outstanding = producer.flush(FLUSH_TIMEOUT_SECONDS)
+        outcome = "success"
         if outstanding > 0:
+            outcome = "flush_timeout"
             logger.warning(
                 "Producer flush timed out with %d message(s) still pending delivery",
                 outstanding,
@@ -169,6 +176,11 @@ def produce_message(producer, topic, message, ensure_user_email=True):
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise
+    finally:
+        if start is not None:
+            kafka_produce_seconds.labels(topic=topic, outcome=outcome).observe(
+                time.perf_counter() - start
+            )
 
 
 def send_kafka_message(
@@ -177,13 +189,24 @@ def send_kafka_message(
     *,
     key: Optional[str] = None,
     ensure_user_email: bool = True,
+    deadline_seconds: Optional[float] = None,
 ) -> str:
+    """Send a request and return its correlation key.
+
+    deadline_seconds should match how long the caller waits for the answer;
+    consumers drop the request once it passes. Leave it unset for writes
+    that must be applied even if nobody waits for the response.
+    """
     if not isinstance(value, dict):
         raise TypeError("value must be a dictionary")
 
     message_key = key or str(uuid.uuid4())
     message = {"key": message_key, "value": dict(value)}
 
+    headers = start_trace(topic, message_key, awaited=deadline_seconds is not None)
+    if deadline_seconds is not None:
+        headers += deadline_headers(deadline_seconds)
+
     try:
         producer = create_producer()
         produce_message(
@@ -191,6 +214,7 @@ def send_kafka_message(
             topic,
             message,
             ensure_user_email=ensure_user_email,
+            headers=headers,
         )
     except KafkaException as exc:
         logger.error("Kafka error while sending topic %s: %s", topic, exc)
@@ -1,12 +1,30 @@
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 
 import requests
 from common import create_multilingual_prompt
-from user import get_user_model_tier
+from redis_pool import redis_client
+from user import get_user_model_tier, set_user_model_tier
 
 logger = logging.getLogger(__name__)
 
+IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
+KEY_PREFIX = "_dev:" if IS_DEV else ""
+
+# Availability is probed in the background, so the request path only reads a
+# flag; the probe can afford a real timeout.
+PROBE_INTERVAL_SECONDS = float(os.getenv("LOCAL_MODEL_PROBE_INTERVAL", "5"))
+PROBE_TIMEOUT_SECONDS = float(os.getenv("LOCAL_MODEL_PROBE_TIMEOUT", "1"))
+# Tiers are cached per process; changes made through set_user_model_tier()
+# reach every process over Redis pub/sub, edits made straight in Postgres
+# show up once the entry expires.
+MODEL_TIER_CACHE_SECONDS = float(os.getenv("MODEL_TIER_CACHE_SECONDS", "300"))
+MODEL_TIER_CACHE_SIZE = int(os.getenv("MODEL_TIER_CACHE_SIZE", "10000"))
+TIER_INVALIDATION_CHANNEL = f"{KEY_PREFIX}model_tier_invalidate"
+
 
 class LocalModelService:
     def __init__(self):
@@ -15,26 +33,143 @@ class LocalModelService:
         self.local_model_kafka_topic = os.getenv(
             "LOCAL_MODEL_KAFKA_TOPIC", "eater-send-photo-local"
         )
+        self.available = False
+        self._tiers = OrderedDict()
+        self._tiers_lock = threading.Lock()
+        self._prober = None
+        self._prober_pid = None
+        self._prober_lock = threading.Lock()
 
-    def _check_local_model_service_availability(self):
+    def _check_local_model_service_availability(self, http=requests):
         if self.local_model_service_url:
             try:
-                response = requests.get(self.local_model_service_url, timeout=0.1)
+                response = http.get(
+                    self.local_model_service_url, timeout=PROBE_TIMEOUT_SECONDS
+                )
                 if response.status_code == 200:
                     return True
-                logger.error(
+                logger.debug(
                     "Local model service returned status code %s", response.status_code
                 )
                 return False
             except Exception as e:
-                logger.error("Error checking local model service availability: %s", e)
+                logger.debug("Error checking local model service availability: %s", e)
         return False
 
+    def _ensure_prober(self):
+        # Started lazily: a thread started in the preloaded gunicorn master
+        # would not survive the fork into the workers
+        if self._prober_pid == os.getpid() and self._prober.is_alive():
+            return
+        with self._prober_lock:
+            if self._prober_pid == os.getpid() and self._prober.is_alive():
+                return
+            self.available = False
+            self.clear_tier_cache()
+            self._prober = threading.Thread(
+                target=self._probe_loop, name="local-model-prober", daemon=True
+            )
+            self._prober_pid = os.getpid()
+            self._prober.start()
+
+    def _probe_loop(self):
+        """Probe availability every interval and apply tier invalidations in between."""
+        http = requests.Session()
+        pubsub = None
+        next_probe = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_probe:
+                available = self._check_local_model_service_availability(http)
+                if available != self.available:
+                    logger.warning(
+                        "Local model service at %s is %s",
+                        self.local_model_service_url,
+                        "available" if available else "unavailable",
+                    )
+                self.available = available
+                next_probe = now + PROBE_INTERVAL_SECONDS
+
+            try:
+                if pubsub is None:
+                    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(TIER_INVALIDATION_CHANNEL)
+                    # Changes published while unsubscribed were missed
+                    self.clear_tier_cache()
+                message = pubsub.get_message(
+                    timeout=max(0.0, next_probe - time.monotonic())
+                )
+                if message and message.get("type") == "message":
+                    self._evict_tier(message["data"].decode("utf-8"))
+            except Exception as e:
+                logger.warning("Model tier invalidation subscription failed: %s", e)
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                    pubsub = None
+                time.sleep(max(0.0, next_probe - time.monotonic()))
+
+    def is_available(self):
+        if not self.local_model_service_url:
+            return False
+        self._ensure_prober()
+        return self.available
+
+    def _cached_tier(self, user_email):
+        with self._tiers_lock:
+            cached = self._tiers.get(user_email)
+            if cached is None:
+                return None
+            tier, expires = cached
+            if expires < time.monotonic():
+                del self._tiers[user_email]
+                return None
+            self._tiers.move_to_end(user_email)
+            return tier
+
+    def _cache_tier(self, user_email, tier):
+        with self._tiers_lock:
+            expires = time.monotonic() + MODEL_TIER_CACHE_SECONDS
+            self._tiers[user_email] = (tier, expires)
+            self._tiers.move_to_end(user_email)
+            while len(self._tiers) > MODEL_TIER_CACHE_SIZE:
+                self._tiers.popitem(last=False)
+
+    def _evict_tier(self, user_email):
+        with self._tiers_lock:
+            self._tiers.pop(user_email, None)
+
+    def clear_tier_cache(self):
+        with self._tiers_lock:
+            self._tiers.clear()
+
     def get_user_model_tier(self, user_email):
-        if self._check_local_model_service_availability():
-            return get_user_model_tier(user_email)
-        else:
+        if not self.is_available():
             return self.default_model_tier
+        tier = self._cached_tier(user_email)
+        if tier is None:
+            tier = get_user_model_tier(user_email)
+            self._cache_tier(user_email, tier)
+        return tier
+
+    def set_user_model_tier(self, user_email, model_tier):
+        """Change a user's tier and drop it from every process's cache.
+
+        Returns None, changing nothing, when the user does not exist.
+        """
+        model_tier = set_user_model_tier(user_email, model_tier)
+        if model_tier is None:
+            return None
+        self._evict_tier(user_email)
+        try:
+            redis_client.publish(TIER_INVALIDATION_CHANNEL, user_email)
+        except Exception as e:
+            logger.error(
+                "Failed to publish model tier change for %s: %s", user_email, e
+            )
+        return model_tier
 
     def get_user_kafka_topic(self, user_email, default_topic):
         try:
@@ -60,3 +195,17 @@ class LocalModelService:
         except Exception as e:
             logger.error("Error getting user prompt: %s", e)
             return prompt
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_local_model_service():
+    """Process-wide LocalModelService, so every caller shares one prober and cache."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = LocalModelService()
+    return _service
@@ -0,0 +1,73 @@
+"""Folds the Prometheus files of exited processes into one archive per type.
+
+In multiprocess mode every process writes counter_<pid>.db,
+histogram_<pid>.db and so on. The files outlive the process so its counts
+stay in the totals, which with max_requests recycling means one more set of
+files, and one more file for every scrape to read, per recycled worker.
+archive_process_metrics() adds a dead process's counters, histograms and
+summaries into <type>_archive.db and deletes its files, so the directory
+stays at one set of files per live process plus the archives.
+
+Scrapes hold a shared lock while reading and the archiving holds it
+exclusively, so a scrape never sees a dead process counted twice or not at
+all (Prometheus would read either as a counter reset).
+"""
+
+import fcntl
+import glob
+import os
+from contextlib import contextmanager
+
+ARCHIVED_TYPES = ("counter", "histogram", "summary")
+LOCK_FILE = ".archive.lock"
+
+
+@contextmanager
+def archive_lock(path, exclusive=False):
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def archive_process_metrics(pid, path=None):
+    """Mark a process dead and merge its metric files into the archives."""
+    from prometheus_client import multiprocess
+
+    path = path or os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    multiprocess.mark_process_dead(pid, path)
+    with archive_lock(path, exclusive=True):
+        for typ in ARCHIVED_TYPES:
+            for dead in glob.glob(os.path.join(path, f"{typ}_{pid}.db")):
+                _merge_into_archive(dead, os.path.join(path, f"{typ}_archive.db"))
+
+
+def _merge_into_archive(dead, archive):
+    from prometheus_client.mmap_dict import MmapedDict, mmap_key
+    from prometheus_client.multiprocess import MultiProcessCollector
+
+    files = [dead] + ([archive] if os.path.exists(archive) else [])
+    # accumulate=False keeps histogram buckets per bucket, as they are stored
+    merged = MultiProcessCollector.merge(files, accumulate=False)
+    # Written next to the archive and renamed over it; *.db.tmp is not scraped
+    tmp = archive + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = MmapedDict(tmp)
+    try:
+        for metric in merged:
+            for sample in metric.samples:
+                key = mmap_key(
+                    metric.name,
+                    sample.name,
+                    list(sample.labels),
+                    list(sample.labels.values()),
+                    metric.documentation,
+                )
+                db.write_value(key, sample.value, 0.0)
+    finally:
+        db.close()
+    os.replace(tmp, archive)
+    os.remove(dead)
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
+KEY_PREFIX = "_dev:" if IS_DEV else ""
+
+WINDOW_MINUTE = "minute"
+WINDOW_DAY = "day"
+
+# Checks every window first and only increments when all of them have room, so
+# concurrent requests cannot race past the limit. TTL is set on first increment.
+# KEYS: minute key, day key
+# ARGV: minute limit, day limit, minute ttl, day ttl (limit <= 0 disables window)
+_RATE_LIMIT_LUA = """
+local names = {'minute', 'day'}
+local counts = {}
+for i = 1, 2 do
+    local limit = tonumber(ARGV[i])
+    local current = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if limit > 0 and current >= limit then
+        return {0, names[i], current}
+    end
+    counts[i] = current
+end
+for i = 1, 2 do
+    if tonumber(ARGV[i]) > 0 then
+        counts[i] = redis.call('INCR', KEYS[i])
+        if counts[i] == 1 then
+            redis.call('EXPIRE', KEYS[i], tonumber(ARGV[i + 2]))
+        end
+    end
+end
+return {1, 'ok', counts[2] or 0}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    window: str = ""
+    count: int = 0
+
+
+class _TokenBucket:
+    """In-process bucket used to reject obvious bursts without touching Redis."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity):
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        redis_client,
+        daily_limit,
+        burst_limit,
+        max_tracked_users=10000,
+        clock=None,
+    ):
+        self.redis_client = redis_client
+        self.daily_limit = daily_limit
+        self.burst_limit = burst_limit
+        self.max_tracked_users = max_tracked_users
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+        self._script = redis_client.register_script(_RATE_LIMIT_LUA)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, redis_client):
+        return cls(
+            redis_client,
+            daily_limit=int(os.getenv("DAILY_REQUEST_LIMIT", "10")),
+            # Off unless configured, so only the daily quota applies by default
+            burst_limit=int(os.getenv("BURST_REQUEST_LIMIT_PER_MINUTE", "0")),
+        )
+
+    def _take_local_token(self, user_email):
+        """Pre-check against a per-process bucket refilled at burst_limit/minute.
+
+        Each gunicorn worker keeps its own bucket; it sheds obvious bursts
+        without a round trip while Redis stays the source of truth.
+        """
+        if self.burst_limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_email)
+            if bucket is None:
+                bucket = _TokenBucket(self.burst_limit)
+                self._buckets[user_email] = bucket
+                if len(self._buckets) > self.max_tracked_users:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user_email)
+                refill = (now - bucket.updated) * self.burst_limit / 60.0
+                bucket.tokens = min(float(self.burst_limit), bucket.tokens + refill)
+                bucket.updated = now
+            if bucket.tokens < 1.0:
+                return False
+            bucket.tokens -= 1.0
+            return True
+
+    def _keys_and_ttls(self, user_email):
+        now = self._clock()
+        prefix = f"{KEY_PREFIX}rate_limit:{user_email}"
+        minute_key = f"{prefix}:{now.strftime('%Y-%m-%dT%H:%M')}"
+        day_key = f"{prefix}:{now.strftime('%Y-%m-%d')}"
+        next_day = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            days=1
+        )
+        day_ttl = max(1, int((next_day - now).total_seconds()))
+        minute_ttl = 60 - now.second + 1
+        return [minute_key, day_key], [minute_ttl, day_ttl]
+
+    def hit(self, user_email):
+        """Consume one request for the user in every window, atomically."""
+        if not self._take_local_token(user_email):
+            return RateLimitResult(False, WINDOW_MINUTE, self.burst_limit)
+
+        keys, ttls = self._keys_and_ttls(user_email)
+        allowed, window, count = self._script(
+            keys=keys,
+            args=[self.burst_limit, self.daily_limit, ttls[0], ttls[1]],
+        )
+        if isinstance(window, bytes):
+            window = window.decode()
+        if not allowed:
+            return RateLimitResult(False, window, int(count))
+        return RateLimitResult(True, WINDOW_DAY, int(count))
@@ -0,0 +1,55 @@
+import logging
+import os
+
+import redis
+
+try:
+    from redis.utils import HIREDIS_AVAILABLE
+except ImportError:
+    HIREDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_ENDPOINT")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# One pool per process. redis-py resets the pool after fork, so gunicorn
+# workers forked from a preloaded master each get their own connections.
+# hiredis is picked up automatically when the package is installed.
+pool = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_keepalive=True,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    retry_on_timeout=True,
+)
+
+redis_client = redis.StrictRedis(connection_pool=pool)
+
+logger.info(
+    "Redis pool configured for %s:%s (max_connections=%d, parser=%s)",
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_MAX_CONNECTIONS,
+    "hiredis" if HIREDIS_AVAILABLE else "python",
+)
+
+
+def pool_stats():
+    """Snapshot of connection usage for the metrics endpoint."""
+    in_use = len(getattr(pool, "_in_use_connections", ()))
+    idle = len(getattr(pool, "_available_connections", ()))
+    return {
+        "max": pool.max_connections,
+        "created": in_use + idle,
+        "in_use": in_use,
+        "idle": idle,
+    }
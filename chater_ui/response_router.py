@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Per-pod Kafka response router.
+
+Consumes every response topic in batches and hands the decoded responses to
+the gunicorn workers through Redis, where get_message_response() picks them
+up. Runs either as a sidecar container (``python response_router.py``) or
+as child processes spawned by the gunicorn master (KAFKA_RESPONSE_ROUTER=gunicorn).
+"""
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+
+from logging_config import setup_logging
+
+logger = logging.getLogger("response_router")
+
+# Extra processes share the consumer group, so partitions (and decoding) are
+# spread across them instead of funnelling through a single thread.
+ROUTER_PROCESSES = int(os.getenv("KAFKA_RESPONSE_ROUTER_PROCESSES", "1"))
+# Exited routers are restarted after this delay, doubled (up to a minute)
+# each time a router dies within ROUTER_STABLE_SECONDS of starting
+ROUTER_RESTART_BACKOFF_SECONDS = float(os.getenv("KAFKA_RESPONSE_ROUTER_BACKOFF", "1"))
+ROUTER_STABLE_SECONDS = 60
+
+
+def run():
+    """Run the router in the current process until SIGTERM/SIGINT."""
+    setup_logging("response_router.log")
+    from kafka_consumer_service import kafka_service
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("Received signal %s, stopping response router", signum)
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info(
+        "Response router started (pid=%s, batch_size=%d)",
+        os.getpid(),
+        kafka_service.batch_size,
+    )
+    kafka_service.start_service()
+    try:
+        while not stop_event.is_set() and kafka_service.is_running:
+            stop_event.wait(1)
+    finally:
+        kafka_service.stop_service()
+        logger.info("Response router stopped (pid=%s)", os.getpid())
+
+
+def spawn_router_processes(count=ROUTER_PROCESSES):
+    """Start router processes from the gunicorn master.
+
+    Uses the spawn start method so the children never inherit the master's
+    preloaded app state, threads or sockets. The routers are children of a
+    supervisor process rather than of the master: the gunicorn master reaps
+    every child it has, which would hide a router's exit from is_alive().
+    """
+    context = multiprocessing.get_context("spawn")
+    supervisor = context.Process(
+        target=supervise, args=(count,), name="chater_ui-response-router-supervisor"
+    )
+    supervisor.start()
+    logger.info("Spawned response router supervisor (pid=%s)", supervisor.pid)
+    return [supervisor]
+
+
+def _start_router(context, index):
+    process = context.Process(target=run, name=f"chater_ui-response-router-{index}")
+    process.start()
+    logger.info("Spawned response router %s (pid=%s)", process.name, process.pid)
+    return process
+
+
+def supervise(count=ROUTER_PROCESSES):
+    """Keep `count` router processes running, restarting any that exit."""
+    setup_logging("response_router.log")
+    context = multiprocessing.get_context("spawn")
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    routers = [_start_router(context, index) for index in range(max(1, count))]
+    started = [time.monotonic()] * len(routers)
+    backoff = [ROUTER_RESTART_BACKOFF_SECONDS] * len(routers)
+    restart_at = [None] * len(routers)
+    try:
+        while not stop_event.wait(1):
+            now = time.monotonic()
+            for index, process in enumerate(routers):
+                if restart_at[index] is None:
+                    if process.is_alive():
+                        continue
+                    _archive_metrics(process.pid)
+                    # A router that keeps dying right after start backs off
+                    if now - started[index] < ROUTER_STABLE_SECONDS:
+                        backoff[index] = min(backoff[index] * 2, 60)
+                    else:
+                        backoff[index] = ROUTER_RESTART_BACKOFF_SECONDS
+                    restart_at[index] = now + backoff[index]
+                    logger.error(
+                        "Response router %s (pid=%s) exited with code %s, "
+                        "restarting in %.0f s",
+                        process.name,
+                        process.pid,
+                        process.exitcode,
+                        backoff[index],
+                    )
+                elif now >= restart_at[index]:
+                    routers[index] = _start_router(context, index)
+                    started[index] = now
+                    restart_at[index] = None
+    finally:
+        stop_router_processes(routers)
+        for process in routers:
+            _archive_metrics(process.pid)
+        logger.info("Response router supervisor stopped (pid=%s)", os.getpid())
+
+
+def _archive_metrics(pid):
+    # Drop the dead router's live gauges and archive its counters
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    from metrics_archive import archive_process_metrics
+
+    archive_process_metrics(pid)
+
+
+def stop_router_processes(processes, timeout=10):
+    """Terminate router (or supervisor) processes and wait for them to exit."""
+    for process in processes:
+        if process.exitcode is None:
+            process.terminate()
+    # Wait on the sentinels: in the gunicorn master the children may already
+    # be reaped, which makes join()/is_alive() unreliable there
+    sentinels = {process.sentinel: process for process in processes}
+    deadline = time.monotonic() + timeout
+    while sentinels:
+        ready = multiprocessing.connection.wait(
+            list(sentinels), max(0.0, deadline - time.monotonic())
+        )
+        if not ready:
+            break
+        for sentinel in ready:
+            sentinels.pop(sentinel)
+    for process in sentinels.values():
+        logger.warning("Response router %s did not stop, killing", process.name)
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+if __name__ == "__main__":
+    run()
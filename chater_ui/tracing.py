@@ -0,0 +1,220 @@
+import importlib
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from app.metrics import kafka_trace_hop_seconds
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger("tracing")
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "chater_ui")
+# console, otlp, or module:factory returning a SpanExporter; unset exports nothing
+TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+
+# Every request sent to Kafka starts a trace: W3C trace context, the topic it
+# went to, and the hops it took so far ("chater_ui.produce=<epoch ms>;..."),
+# which the other services copy onto everything they produce for it. Hop
+# times come from each pod's clock, so cross-service hops are only as exact
+# as NTP.
+TRACEPARENT_HEADER = "traceparent"
+REQUEST_HEADER = "x-trace-request"
+HOPS_HEADER = "x-trace-hops"
+MAX_HOPS = 32
+
+# Root spans of requests whose response is still awaited, by correlation key
+MAX_OPEN_TRACES = 10000
+_open = OrderedDict()
+_open_lock = threading.Lock()
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _header(message, name):
+    for header, value in message.headers() or ():
+        if header == name and value:
+            return value.decode("utf-8") if isinstance(value, bytes) else value
+    return None
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def parse_hops(value):
+    hops = []
+    for item in (value or "").split(";"):
+        name, _, ms = item.partition("=")
+        try:
+            hops.append((name, int(ms)))
+        except ValueError:
+            continue
+    return hops
+
+
+def format_hops(hops):
+    return ";".join(f"{name}={ms}" for name, ms in hops[-MAX_HOPS:])
+
+
+def _exporter():
+    if TRACES_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    if TRACES_EXPORTER == "otlp":
+        # Endpoint and headers come from the usual OTEL_EXPORTER_OTLP_* variables
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    module_name, _, factory = TRACES_EXPORTER.partition(":")
+    return getattr(importlib.import_module(module_name), factory)()
+
+
+def get_tracer():
+    """OpenTelemetry tracer, or None when no exporter is configured."""
+    global _tracer
+    if otel_trace is None or TRACES_EXPORTER in ("", "none"):
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    provider = TracerProvider(
+                        resource=Resource.create({"service.name": SERVICE_NAME})
+                    )
+                    provider.add_span_processor(BatchSpanProcessor(_exporter()))
+                    _tracer = provider.get_tracer(SERVICE_NAME)
+                except Exception as e:
+                    logger.error(f"Tracing disabled, exporter setup failed: {e}")
+                    _tracer = False
+    return _tracer or None
+
+
+def _parent_context(traceparent):
+    try:
+        _, trace_id, span_id, flags = traceparent.split("-")
+        span_context = otel_trace.SpanContext(
+            trace_id=int(trace_id, 16),
+            span_id=int(span_id, 16),
+            is_remote=True,
+            trace_flags=otel_trace.TraceFlags(int(flags, 16)),
+        )
+    except ValueError:
+        return None
+    return otel_trace.set_span_in_context(otel_trace.NonRecordingSpan(span_context))
+
+
+def _record_hop(trace, previous, hop, span_name, attributes):
+    """Observe the time from the previous hop and export it as a span."""
+    (from_hop, from_ms), (to_hop, to_ms) = previous, hop
+    kafka_trace_hop_seconds.labels(
+        request=trace["request"], from_hop=from_hop, to_hop=to_hop
+    ).observe(max(0, to_ms - from_ms) / 1000.0)
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    parent = _parent_context(trace["traceparent"])
+    if parent is None:
+        return
+    span = tracer.start_span(
+        span_name,
+        context=parent,
+        start_time=from_ms * 1_000_000,
+        attributes=attributes,
+    )
+    span.end(end_time=max(from_ms, to_ms) * 1_000_000)
+
+
+def start_trace(topic, message_key, awaited):
+    """Headers opening a trace for a request produced to `topic`.
+
+    When the caller waits for the response (awaited), the root span stays
+    open until finish_trace() is called with the same message_key.
+    """
+    now = _now_ms()
+    span = None
+    tracer = get_tracer()
+    if tracer is not None:
+        span = tracer.start_span(
+            f"{SERVICE_NAME} {topic}",
+            start_time=now * 1_000_000,
+            attributes={"messaging.destination": topic},
+        )
+        context = span.get_span_context()
+        trace_id, span_id = f"{context.trace_id:032x}", f"{context.span_id:016x}"
+    else:
+        trace_id, span_id = secrets.token_hex(16), secrets.token_hex(8)
+
+    if awaited:
+        with _open_lock:
+            _open[message_key] = span
+            while len(_open) > MAX_OPEN_TRACES:
+                _, evicted = _open.popitem(last=False)
+                if evicted is not None:
+                    evicted.end()
+    elif span is not None:
+        span.end()
+
+    return [
+        (TRACEPARENT_HEADER, f"00-{trace_id}-{span_id}-01".encode()),
+        (REQUEST_HEADER, topic.encode()),
+        (HOPS_HEADER, format_hops([(f"{SERVICE_NAME}.produce", now)]).encode()),
+    ]
+
+
+def trace_response(message):
+    """Time a response's last Kafka hop; returns the trace to store with it."""
+    traceparent = _header(message, TRACEPARENT_HEADER)
+    if not traceparent:
+        return None
+    trace = {
+        "traceparent": traceparent,
+        "request": _header(message, REQUEST_HEADER) or "unknown",
+    }
+    hops = parse_hops(_header(message, HOPS_HEADER))
+    hop = (f"{SERVICE_NAME}.consume", _now_ms())
+    if hops:
+        _record_hop(
+            trace,
+            hops[-1],
+            hop,
+            f"kafka {message.topic()}",
+            {"messaging.destination": message.topic()},
+        )
+    return "|".join((traceparent, trace["request"], format_hops(hops + [hop])))
+
+
+def finish_trace(message_key, stored, answered=True):
+    """Close a request's trace once its response was read from Redis.
+
+    stored is what trace_response() returned for the response, if anything;
+    answered is False when the wait timed out.
+    """
+    with _open_lock:
+        span = _open.pop(message_key, None)
+    if stored:
+        traceparent, request, hops_value = stored.split("|", 2)
+        hops = parse_hops(hops_value)
+        if hops:
+            trace = {"traceparent": traceparent, "request": request}
+            hop = (f"{SERVICE_NAME}.read", _now_ms())
+            _record_hop(trace, hops[-1], hop, "redis response wait", {})
+            # The whole round trip, first hop to last
+            kafka_trace_hop_seconds.labels(
+                request=request, from_hop=hops[0][0], to_hop=hop[0]
+            ).observe(max(0, hop[1] - hops[0][1]) / 1000.0)
+    if span is not None:
+        if not answered:
+            span.set_attribute("chater.response", "missing")
+        span.end()
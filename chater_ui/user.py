@@ -98,3 +98,24 @@ def get_user_model_tier(email):
         return model_tier
     finally:
         session.close()
+
+
+def set_user_model_tier(email, model_tier):
+    """Set an existing user's model tier; returns None if there is no such user."""
+    model_tier = (model_tier or "cloud").strip().lower()
+    if model_tier not in ["cloud", "local"]:
+        raise ValueError(f"Unknown model tier: {model_tier}")
+
+    session = Session()
+    try:
+        result = session.execute(
+            text('UPDATE "user" SET model_tier = :model_tier WHERE email = :email'),
+            {"model_tier": model_tier, "email": email},
+        )
+        if result.rowcount == 0:
+            session.rollback()
+            return None
+        session.commit()
+        return model_tier
+    finally:
+        session.close()
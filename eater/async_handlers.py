@@ -0,0 +1,173 @@
+"""Kafka request handlers that run on the AsyncDBRunner event loop.
+
+Each mirrors a branch of eater.process_messages() and answers through
+reply(topic, message) instead of calling produce_message() directly.
+"""
+
+import asyncio
+import functools
+import logging
+
+import chess_leaderboard
+from async_postgres import (get_alcohol_events_in_range_async,
+                            get_all_chess_data_async, get_chess_stats_async,
+                            get_nutrition_rollup_async, get_today_dishes_async,
+                            record_chess_game_async)
+from process_gpt import get_recommendation_async, process_food_async
+
+logger = logging.getLogger(__name__)
+
+
+def _replying_errors(handler):
+    """Answer on error_response when a handler fails, like the sync loop."""
+
+    @functools.wraps(handler)
+    async def wrapper(reply, message_key, user_email, *args):
+        try:
+            await handler(reply, message_key, user_email, *args)
+        except Exception as e:
+            logger.error("Failed to process message for user %s: %s", user_email, e)
+            await reply(
+                "error_response",
+                {
+                    "key": message_key,
+                    "value": {"error": str(e), "user_email": user_email},
+                },
+            )
+
+    return wrapper
+
+
+@_replying_errors
+async def handle_food(reply, message_key, user_email, json_response):
+    await process_food_async(json_response, user_email)
+    await reply(
+        "photo-analysis-response-check",
+        {
+            "key": message_key,
+            "value": {"status": "Success", "user_email": user_email},
+        },
+    )
+
+
+@_replying_errors
+async def handle_today_data(reply, message_key, user_email):
+    today_dishes = await get_today_dishes_async(user_email)
+    await reply(
+        "send_today_data",
+        {
+            "key": message_key,
+            "value": {"dishes": today_dishes, "user_email": user_email},
+        },
+    )
+
+
+@_replying_errors
+async def handle_alcohol_latest(reply, message_key, user_email):
+    today_dishes = await get_today_dishes_async(user_email)
+    alcohol = (today_dishes or {}).get("alcohol_for_day", {})
+    await reply(
+        "send_alcohol_latest",
+        {
+            "key": message_key,
+            "value": {"alcohol": alcohol, "user_email": user_email},
+        },
+    )
+
+
+@_replying_errors
+async def handle_alcohol_range(reply, message_key, user_email, start_date, end_date):
+    events = await get_alcohol_events_in_range_async(
+        start_date=start_date, end_date=end_date, user_email=user_email
+    )
+    await reply(
+        "send_alcohol_range",
+        {
+            "key": message_key,
+            "value": {"events": events, "user_email": user_email},
+        },
+    )
+
+
+@_replying_errors
+async def handle_nutrition_rollup(
+    reply, message_key, user_email, period, start_date, end_date
+):
+    series = await get_nutrition_rollup_async(
+        period=period, start_date=start_date, end_date=end_date, user_email=user_email
+    )
+    await reply(
+        "get_nutrition_rollup_response",
+        {
+            "key": message_key,
+            "value": {"period": period, "series": series, "user_email": user_email},
+        },
+    )
+
+
+@_replying_errors
+async def handle_recommendation(reply, message_key, user_email, message, value_dict):
+    await get_recommendation_async(reply, message_key, message, value_dict, user_email)
+
+
+@_replying_errors
+async def handle_record_chess_game(
+    reply, message_key, user_email, opponent_email, result, timestamp
+):
+    scores = await record_chess_game_async(
+        user_email, opponent_email, result, timestamp
+    )
+    if not scores:
+        value = {
+            "success": False,
+            "error": "Failed to record game",
+            "user_email": user_email,
+        }
+    else:
+        await asyncio.to_thread(
+            chess_leaderboard.record_game, user_email, opponent_email, result
+        )
+        value = {
+            "success": True,
+            "user_email": user_email,
+            "player_wins": scores["player"]["wins"],
+            "player_losses": scores["player"]["losses"],
+            "opponent_wins": scores["opponent"]["wins"],
+            "opponent_losses": scores["opponent"]["losses"],
+        }
+    await reply("record_chess_game_response", {"key": message_key, "value": value})
+
+
+@_replying_errors
+async def handle_chess_stats(reply, message_key, user_email, opponent_email):
+    stats = await get_chess_stats_async(user_email, opponent_email) or {}
+    await reply(
+        "get_chess_stats_response",
+        {
+            "key": message_key,
+            "value": {
+                "user_email": user_email,
+                "score": stats.get("score", "0:0"),
+                "opponent_name": stats.get("opponent_name", ""),
+                "last_game_date": stats.get("last_game_date", ""),
+            },
+        },
+    )
+
+
+@_replying_errors
+async def handle_all_chess_data(reply, message_key, user_email):
+    data = await get_all_chess_data_async(user_email) or {}
+    await reply(
+        "get_all_chess_data_response",
+        {
+            "key": message_key,
+            "value": {
+                "user_email": user_email,
+                "total_wins": data.get("total_wins", 0),
+                "total_losses": data.get("total_losses", 0),
+                "total_draws": data.get("total_draws", 0),
+                "opponents": data.get("opponents", {}),
+            },
+        },
+    )
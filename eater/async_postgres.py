@@ -0,0 +1,346 @@
+"""asyncpg-backed variants of the hot eater queries.
+
+They share SQL and response shaping with postgres.py, so the async and sync
+paths return identical payloads. Used when EATER_ASYNC_DB is enabled, where
+one eater process overlaps DB calls for different users.
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from postgres import (_CHESS_PAIR_SCORE, _CHESS_PAIRS, _INSERT_CHESS_GAME,
+                      _LAST_CHESS_PAIR, _RECENT_CHESS_GAMES,
+                      _RECORD_CHESS_PAIR, _REFRESH_ROLLUP, _ROLLUP_RANGE,
+                      _TODAY_SNAPSHOT, CHESS_GAMES_PER_OPPONENT,
+                      AlcoholConsumption, AlcoholForDay, DishesDay,
+                      TotalForDay, _alcohol_consumption_values,
+                      _alcohol_event_item, _aggregate_contains,
+                      _all_chess_data_result, _as_date, _chess_game_rows,
+                      _chess_pair_params, _chess_stats_result,
+                      _dish_day_values, _dish_history_item,
+                      _empty_chess_stats, _message_date,
+                      _pairs_in_lock_order, _parse_request_date,
+                      _recorded_chess_scores, _rollup_item,
+                      _rollup_range_params, _rollup_refresh_params,
+                      _today_result, current_date, register_pool_metrics,
+                      register_query_metrics)
+from sqlalchemy import JSON, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+logger = logging.getLogger(__name__)
+
+db_user = os.environ.get("POSTGRES_USER")
+db_password = os.environ.get("POSTGRES_PASSWORD")
+db_host = os.environ.get("POSTGRES_HOST")
+db_name = os.environ.get("POSTGRES_DB")
+
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:5432/{db_name}"
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_size=int(os.getenv("EATER_ASYNC_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("EATER_ASYNC_MAX_OVERFLOW", "10")),
+    pool_timeout=30,
+)
+
+register_pool_metrics("async", async_engine.sync_engine.pool)
+register_query_metrics("async", async_engine.sync_engine)
+
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def get_async_session():
+    async with AsyncSession() as session:
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Async database session error: {e}")
+            await session.rollback()
+            raise
+
+
+async def get_today_dishes_async(user_email: str = None):
+    try:
+        async with get_async_session() as session:
+            row = (
+                await session.execute(
+                    _TODAY_SNAPSHOT,
+                    {"day": current_date(), "user_email": user_email},
+                )
+            ).one()
+            result = _today_result(row)
+            logger.debug(f"Result of get_today_dishes_async {result}")
+            return result
+    except Exception as e:
+        logger.error(f"Error retrieving today's dishes: {e}")
+        return {}
+
+
+async def write_to_dish_day_async(
+    message=None, recalculate: Optional[bool] = False, user_email: str = None
+):
+    """Async write_to_dish_day: day totals are upserted instead of read-then-written."""
+    try:
+        async with get_async_session() as session:
+            if not recalculate:
+                values = _dish_day_values(message, user_email)
+                values["date"] = _as_date(values["date"])
+                # Overwrite an existing record for the same time/user (manual
+                # re-analysis). dishes_day is partitioned by date, so there is
+                # no unique index on time alone for ON CONFLICT to use.
+                updated = await session.execute(
+                    update(DishesDay)
+                    .where(DishesDay.time == values["time"])
+                    .where(DishesDay.user_email == user_email)
+                    .values(**values)
+                )
+                if not updated.rowcount:
+                    await session.execute(insert(DishesDay).values(**values))
+
+                alcohol_values = _alcohol_consumption_values(values, user_email)
+                if alcohol_values:
+                    await session.execute(
+                        insert(AlcoholConsumption).values(**alcohol_values)
+                    )
+                await session.commit()
+                logger.debug(
+                    f"Successfully wrote dish data to database: {values['dish_name']}"
+                )
+
+            recalc_date = _as_date(_message_date(message))
+            day_filter = (
+                DishesDay.date == recalc_date,
+                DishesDay.user_email == user_email,
+            )
+            total_data = (
+                await session.execute(
+                    select(
+                        func.sum(DishesDay.estimated_avg_calories).label(
+                            "total_calories"
+                        ),
+                        func.sum(DishesDay.total_avg_weight).label("total_weight"),
+                        func.array_agg(DishesDay.dish_name).label("all_dishes"),
+                        # Typed so asyncpg's JSON text is decoded
+                        func.json_agg(DishesDay.contains, type_=JSON).label(
+                            "all_contains"
+                        ),
+                        func.sum(DishesDay.added_sugar_tsp).label("added_sugar_tsp"),
+                    ).where(*day_filter)
+                )
+            ).one()
+            ingredients_subq = (
+                select(func.unnest(DishesDay.ingredients).label("ingredient"))
+                .where(*day_filter)
+                .subquery()
+            )
+            all_ingredients = (
+                await session.execute(
+                    select(func.array_agg(ingredients_subq.c.ingredient))
+                )
+            ).scalar() or []
+
+            totals = {
+                "total_calories": total_data.total_calories or 0,
+                "ingredients": all_ingredients,
+                "dishes_of_day": [d for d in total_data.all_dishes or [] if d],
+                "total_avg_weight": total_data.total_weight or 0,
+                "contains": _aggregate_contains(
+                    total_data.all_contains, total_data.added_sugar_tsp
+                ),
+            }
+            stmt = pg_insert(TotalForDay).values(
+                date=recalc_date, today=recalc_date, user_email=user_email, **totals
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[TotalForDay.date, TotalForDay.user_email],
+                    set_=totals,
+                )
+            )
+            await session.commit()
+            logger.debug(
+                f"Successfully wrote aggregated data to total_for_day for {recalc_date}"
+            )
+
+            try:
+                alcohol_totals = (
+                    await session.execute(
+                        select(
+                            func.sum(AlcoholConsumption.calories).label(
+                                "total_calories"
+                            ),
+                            func.count(AlcoholConsumption.time).label("total_drinks"),
+                            func.array_agg(AlcoholConsumption.drink_name).label(
+                                "drinks"
+                            ),
+                        )
+                        .where(AlcoholConsumption.date == recalc_date)
+                        .where(AlcoholConsumption.user_email == user_email)
+                    )
+                ).one()
+                alcohol = {
+                    "total_calories": int(alcohol_totals.total_calories or 0),
+                    "total_drinks": int(alcohol_totals.total_drinks or 0),
+                    "drinks_of_day": alcohol_totals.drinks or [],
+                }
+                stmt = pg_insert(AlcoholForDay).values(
+                    date=recalc_date, user_email=user_email, **alcohol
+                )
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[AlcoholForDay.date, AlcoholForDay.user_email],
+                        set_=alcohol,
+                    )
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"Failed to aggregate alcohol_for_day: {e}")
+
+            try:
+                for params in _rollup_refresh_params(user_email, recalc_date):
+                    await session.execute(_REFRESH_ROLLUP, params)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"Failed to refresh nutrition rollups: {e}")
+    except Exception as e:
+        logger.error(f"Error writing to database: {e}")
+
+
+async def get_dishes_async(days, user_email: str = None):
+    try:
+        today = datetime.now()
+        start_date = today - timedelta(days=days)
+        async with get_async_session() as session:
+            rows = await session.execute(
+                select(
+                    DishesDay.time,
+                    DishesDay.date,
+                    DishesDay.dish_name,
+                    DishesDay.estimated_avg_calories,
+                    DishesDay.total_avg_weight,
+                    DishesDay.health_rating,
+                    DishesDay.ingredients,
+                    DishesDay.contains,
+                )
+                .where(DishesDay.date.between(start_date.date(), today.date()))
+                .where(DishesDay.user_email == user_email)
+            )
+            return [_dish_history_item(dish) for dish in rows]
+    except Exception as e:
+        logger.error(f"Error retrieving dishes from database: {e}", exc_info=True)
+        return []
+
+
+async def get_alcohol_events_in_range_async(
+    start_date: str, end_date: str, user_email: str = None
+):
+    try:
+        start_sql = _parse_request_date(start_date)
+        end_sql = _parse_request_date(end_date)
+        async with get_async_session() as session:
+            rows = await session.execute(
+                select(
+                    AlcoholConsumption.time,
+                    AlcoholConsumption.date,
+                    AlcoholConsumption.drink_name,
+                    AlcoholConsumption.calories,
+                    AlcoholConsumption.quantity,
+                )
+                .where(AlcoholConsumption.user_email == user_email)
+                .where(AlcoholConsumption.date.between(start_sql, end_sql))
+            )
+            return [_alcohol_event_item(ev) for ev in rows]
+    except Exception as e:
+        logger.error(f"Error retrieving alcohol events: {e}")
+        return []
+
+
+async def get_nutrition_rollup_async(
+    period: str, start_date: str, end_date: str, user_email: str = None
+):
+    params = _rollup_range_params(period, start_date, end_date, user_email)
+    try:
+        async with get_async_session() as session:
+            rows = await session.execute(_ROLLUP_RANGE, params)
+            return [_rollup_item(row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error retrieving nutrition rollup: {e}")
+        return []
+
+
+async def record_chess_game_async(
+    player_email: str, opponent_email: str, result: str, timestamp: int
+):
+    try:
+        async with get_async_session() as session:
+            game_rows = _chess_game_rows(
+                player_email, opponent_email, result, timestamp
+            )
+            await session.execute(_INSERT_CHESS_GAME, game_rows)
+            scores = {}
+            for params in _pairs_in_lock_order(game_rows):
+                scores[params["player_email"]] = (
+                    await session.execute(
+                        _RECORD_CHESS_PAIR, _chess_pair_params(params)
+                    )
+                ).one()
+            await session.commit()
+        return _recorded_chess_scores(scores[player_email], scores[opponent_email])
+    except Exception as e:
+        logger.exception("record_chess_game_async failed: %s", e)
+        return None
+
+
+async def get_chess_stats_async(user_email: str, opponent_email: Optional[str] = None):
+    try:
+        async with get_async_session() as session:
+            if not opponent_email:
+                last_row = (
+                    await session.execute(_LAST_CHESS_PAIR, {"user_email": user_email})
+                ).fetchone()
+                if not last_row:
+                    return _empty_chess_stats()
+                return _chess_stats_result(last_row[0], last_row[1:])
+
+            row = (
+                await session.execute(
+                    _CHESS_PAIR_SCORE,
+                    {"user_email": user_email, "opponent_email": opponent_email},
+                )
+            ).fetchone()
+            return _chess_stats_result(opponent_email, row)
+    except Exception as e:
+        logger.exception("get_chess_stats_async failed: %s", e)
+        return None
+
+
+async def get_all_chess_data_async(user_email: str):
+    try:
+        async with get_async_session() as session:
+            pair_rows = (
+                await session.execute(_CHESS_PAIRS, {"user_email": user_email})
+            ).fetchall()
+            game_rows = (
+                await session.execute(
+                    _RECENT_CHESS_GAMES,
+                    {
+                        "user_email": user_email,
+                        "per_opponent": CHESS_GAMES_PER_OPPONENT,
+                    },
+                )
+            ).fetchall()
+            return _all_chess_data_result(pair_rows, game_rows)
+    except Exception as e:
+        logger.exception("get_all_chess_data_async failed: %s", e)
+        return {"total_wins": 0, "total_losses": 0, "total_draws": 0, "opponents": {}}
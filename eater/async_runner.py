@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import bind_deadline, current_deadline
+from kafka_producer import produce_message
+from tracing import bind_trace, current_trace
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDBRunner:
+    """Runs async DB handlers on a background event loop.
+
+    The Kafka consumer stays synchronous and hands handlers over with
+    submit(). Work for one user is chained so it keeps Kafka order, while
+    different users overlap their database calls. At most max_in_flight
+    handlers are pending; submit() blocks beyond that, which pauses polling.
+    """
+
+    def __init__(self, max_in_flight=32, reply_workers=4, on_close=None):
+        self._loop = asyncio.new_event_loop()
+        # Coroutine function run on the loop once close() drained the work,
+        # e.g. disposing the engine whose connections belong to this loop
+        self._on_close = on_close
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._tails = {}
+        # produce_message() flushes synchronously, so it runs off the loop
+        self._reply_executor = ThreadPoolExecutor(
+            max_workers=reply_workers, thread_name_prefix="async-db-reply"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="async-db-loop", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, user_email, handler, *args):
+        """Schedule handler(reply, *args) after earlier work for user_email.
+
+        reply(topic, message) is an async callable that produces a Kafka
+        message carrying the deadline and trace of the message being consumed
+        now.
+        """
+        self._slots.acquire()
+        deadline = current_deadline()
+        trace = current_trace()
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self._chain(user_email, deadline, trace, handler, args), self._loop
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def wait_for_user(self, user_email):
+        """Block until all submitted work for user_email has finished.
+
+        Called before handling a message synchronously, so it cannot overtake
+        that user's pending async work.
+        """
+        asyncio.run_coroutine_threadsafe(
+            self._wait_tail(user_email), self._loop
+        ).result()
+
+    async def _wait_tail(self, user_email):
+        tail = self._tails.get(user_email)
+        if tail is not None:
+            await asyncio.wait([tail])
+
+    async def _chain(self, user_email, deadline, trace, handler, args):
+        previous = self._tails.get(user_email)
+        task = asyncio.current_task()
+        self._tails[user_email] = task
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+
+            async def reply(topic, message):
+                await self._loop.run_in_executor(
+                    self._reply_executor, self._produce, deadline, trace, topic, message
+                )
+
+            await handler(reply, *args)
+        except Exception as e:
+            logger.exception("Async handler failed for user %s: %s", user_email, e)
+        finally:
+            if self._tails.get(user_email) is task:
+                del self._tails[user_email]
+
+    @staticmethod
+    def _produce(deadline, trace, topic, message):
+        bind_deadline(deadline)
+        bind_trace(trace)
+        produce_message(topic=topic, message=message)
+
+    def close(self, timeout=30):
+        """Finish submitted work, run on_close and stop the loop thread."""
+
+        async def drain():
+            pending = list(self._tails.values())
+            if pending:
+                await asyncio.wait(pending, timeout=timeout)
+            if self._on_close is not None:
+                await self._on_close()
+
+        asyncio.run_coroutine_threadsafe(drain(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._reply_executor.shutdown(wait=True)
@@ -0,0 +1,195 @@
+"""Latency of the day-view reads against a live Postgres.
+
+Seeds a throwaway user with a long weight history and a day of dishes, then
+times the previous ORM implementation (one query per table, full weight
+history loaded for the closest-weight lookup) against the single LATERAL
+query now used by get_today_dishes / get_custom_date_dishes.
+
+Needs the usual POSTGRES_* variables. The seeded rows are removed afterwards.
+
+Usage: python benchmarks/bench_day_queries.py [-n 200] [--weights 5000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import postgres  # noqa: E402
+from baseline import percentile  # noqa: E402
+from postgres import (AlcoholForDay, DishesDay, TotalForDay, Weight,  # noqa: E402
+                      get_db_session)
+
+BENCH_USER = "bench-day-queries@example.invalid"
+
+
+def legacy_today(user_email):
+    with get_db_session() as session:
+        latest = (
+            session.query(Weight)
+            .filter(Weight.user_email == user_email)
+            .order_by(Weight.time.desc())
+            .first()
+        )
+        total = (
+            session.query(TotalForDay)
+            .filter(TotalForDay.today == postgres.current_date())
+            .filter(TotalForDay.user_email == user_email)
+            .first()
+        )
+        dishes = (
+            session.query(DishesDay)
+            .filter(DishesDay.date == postgres.current_date())
+            .filter(DishesDay.user_email == user_email)
+            .all()
+        )
+        alcohol = (
+            session.query(AlcoholForDay)
+            .filter(AlcoholForDay.date == postgres.current_date())
+            .filter(AlcoholForDay.user_email == user_email)
+            .first()
+        )
+        return latest, total, [d.dish_name for d in dishes], alcohol
+
+
+def legacy_custom_date(day, user_email):
+    target = int(datetime.combine(day, datetime.min.time()).timestamp())
+    with get_db_session() as session:
+        weights = session.query(Weight).filter(Weight.user_email == user_email).all()
+        closest = min(weights, key=lambda w: abs(w.time - target)) if weights else None
+        total = (
+            session.query(TotalForDay)
+            .filter(TotalForDay.today == day)
+            .filter(TotalForDay.user_email == user_email)
+            .first()
+        )
+        dishes = (
+            session.query(DishesDay)
+            .filter(DishesDay.date == day)
+            .filter(DishesDay.user_email == user_email)
+            .all()
+        )
+        alcohol = (
+            session.query(AlcoholForDay)
+            .filter(AlcoholForDay.date == day)
+            .filter(AlcoholForDay.user_email == user_email)
+            .first()
+        )
+        return closest, total, [d.dish_name for d in dishes], alcohol
+
+
+def seed(weights, dishes):
+    today = postgres.current_date()
+    # One weigh-in a day going back in time; the odd second offset keeps the
+    # time primary keys clear of real entries. Dishes sit far in the future.
+    now = int(time.time()) - 7
+    base = 4_000_000_000
+    with get_db_session() as session:
+        session.add_all(
+            Weight(
+                time=now - i * 86400,
+                date=(today - timedelta(days=i)).isoformat(),
+                weight=70 + (i % 100) / 10,
+                user_email=BENCH_USER,
+            )
+            for i in range(weights)
+        )
+        session.add_all(
+            DishesDay(
+                time=base + i,
+                date=today,
+                dish_name=f"dish {i}",
+                estimated_avg_calories=300 + i,
+                ingredients=["rice", "chicken", "broccoli"],
+                total_avg_weight=250,
+                health_rating=70,
+                food_health_level="healthy",
+                contains={"proteins": 20, "fats": 10, "carbohydrates": 40},
+                user_email=BENCH_USER,
+                image_id=f"bench-{i}",
+            )
+            for i in range(dishes)
+        )
+        session.add(
+            TotalForDay(
+                date=today,
+                today=today,
+                total_calories=300 * dishes,
+                ingredients=["rice", "chicken", "broccoli"],
+                dishes_of_day=[f"dish {i}" for i in range(dishes)],
+                total_avg_weight=250 * dishes,
+                contains={"proteins": 20, "fats": 10, "carbohydrates": 40},
+                user_email=BENCH_USER,
+            )
+        )
+        session.add(
+            AlcoholForDay(
+                date=today,
+                user_email=BENCH_USER,
+                total_drinks=1,
+                total_calories=150,
+                drinks_of_day=["beer"],
+            )
+        )
+
+
+def cleanup():
+    with get_db_session() as session:
+        for model in (Weight, DishesDay, TotalForDay, AlcoholForDay):
+            session.query(model).filter(model.user_email == BENCH_USER).delete()
+
+
+def measure(label, fn, iterations):
+    fn()  # warm the pool and the plan cache
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = percentile(samples, 95)
+    print(
+        f"{label:<24} median {statistics.median(samples):7.2f}ms  p95 {p95:7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Day-view query benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--weights", type=int, default=5000)
+    parser.add_argument("--dishes", type=int, default=8)
+    args = parser.parse_args()
+
+    cleanup()
+    seed(args.weights, args.dishes)
+    try:
+        today = postgres.current_date()
+        past = today - timedelta(days=400)
+        past_str = past.strftime("%d-%m-%Y")
+        measure("today legacy", lambda: legacy_today(BENCH_USER), args.iterations)
+        measure(
+            "today lateral",
+            lambda: postgres.get_today_dishes(BENCH_USER),
+            args.iterations,
+        )
+        measure(
+            "custom date legacy",
+            lambda: legacy_custom_date(past, BENCH_USER),
+            args.iterations,
+        )
+        measure(
+            "custom date lateral",
+            lambda: postgres.get_custom_date_dishes(past_str, BENCH_USER),
+            args.iterations,
+        )
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Offline cost of eater's request path: validate_user_data and the
+process_messages() dispatch loop, from fake-consumer poll through JSON
+decode, validation and routing to the encoded fake-producer reply.
+
+Kafka is replaced by the in-process fakes in fakes.py. Database reads are
+answered with canned payloads unless --postgres is given, in which case they
+hit the database in the usual POSTGRES_* variables (e.g. one seeded by
+eater_init/benchmarks/plan_regression.py).
+
+Usage: python benchmarks/bench_dispatch.py [-n 2000] [--batch 100]
+           [--save-baseline base.json | --baseline base.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+fakes.install()
+
+import baseline  # noqa: E402
+import eater  # noqa: E402
+from kafka_consumer import validate_user_data  # noqa: E402
+
+BENCH_USER = "plan-user-0@example.invalid"
+
+TODAY = {
+    "total_for_day": {
+        "total_calories": 1850,
+        "total_avg_weight": 1400,
+        "contains": {"proteins": 95, "fats": 60, "carbohydrates": 210, "sugar": 40},
+    },
+    "dishes_today": [
+        {
+            "time": 1760000000 + i * 3600,
+            "dish_name": f"Dish {i}",
+            "estimated_avg_calories": 450,
+            "total_avg_weight": 350,
+            "health_rating": 70,
+            "ingredients": ["rice", "chicken", "broccoli", "soy sauce"],
+            "image_id": f"{BENCH_USER}/20260101_12000{i}.jpg",
+            "added_sugar_tsp": 0.5,
+        }
+        for i in range(5)
+    ],
+    "latest_weight": {"time": 1760000000, "weight": 78.4},
+}
+
+CANNED = {
+    "get_today_dishes": lambda user_email: TODAY,
+    "get_chess_stats_sync": lambda user_email, opponent_email=None: {
+        "score": "3:2",
+        "opponent_name": "rival",
+        "last_game_date": "2026-01-01",
+    },
+    "get_nutrition_rollup": lambda **kwargs: [
+        {"period_start": f"2026-01-{d:02d}", "total_calories": 14000}
+        for d in range(1, 29, 7)
+    ],
+}
+
+# (topic, extra request fields)
+REQUESTS = [
+    ("get_today_data", {"date": "01-01-2026"}),
+    ("get_alcohol_latest", {}),
+    ("get_chess_stats", {"opponent_email": "plan-user-1@example.invalid"}),
+    (
+        "get_nutrition_rollup",
+        {"period": "week", "start_date": "01-12-2025", "end_date": "01-01-2026"},
+    ),
+]
+
+
+def make_message(topic, fields, user_email, offset):
+    key = str(uuid.uuid4())
+    envelope = {"key": key, "value": {**fields, "user_email": user_email}}
+    return fakes.FakeMessage(
+        eater.get_topic_name(topic),
+        json.dumps(envelope).encode(),
+        key=key.encode(),
+        offset=offset,
+    )
+
+
+def make_batch(size, user_email):
+    return [
+        make_message(*REQUESTS[i % len(REQUESTS)], user_email, i) for i in range(size)
+    ]
+
+
+def run_batch(messages):
+    fakes.FakeBroker.reset(messages)
+    try:
+        eater.process_messages()
+    except fakes.BrokerDrained:
+        pass
+    if len(fakes.FakeBroker.produced) != len(messages):
+        raise RuntimeError(
+            f"{len(messages)} requests produced {len(fakes.FakeBroker.produced)} replies"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--postgres", action="store_true")
+    parser.add_argument("--user", default=BENCH_USER)
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--log-level", default="WARNING",
+        help="INFO includes the per-message log lines in the timings",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    if not args.postgres:
+        for name, fn in CANNED.items():
+            setattr(eater, name, fn)
+
+    envelope = {"key": str(uuid.uuid4()), "value": {"user_email": args.user}}
+    nested = json.dumps({"key": envelope["key"], "value": json.dumps(envelope["value"])})
+    cases = {
+        "validate_user_data.dict": lambda: validate_user_data(envelope, args.user),
+        "validate_user_data.nested_str": lambda: validate_user_data(nested, args.user),
+    }
+    results = {}
+    for name, fn in cases.items():
+        results[name] = baseline.measure(fn, args.iterations)
+        baseline.report(name, results[name])
+
+    # One sample is a whole batch; scale to per-message figures
+    batch = make_batch(args.batch, args.user)
+    batches = max(1, args.iterations // args.batch)
+    name = "dispatch.postgres" if args.postgres else "dispatch.canned"
+    result = baseline.measure(lambda: run_batch(list(batch)), batches, warmup=1)
+    for key in ("median_us", "p95_us", "mean_us"):
+        result[key] = round(result[key] / args.batch, 2)
+    results[name] = result
+    baseline.report(name + " (per message)", result)
+
+    if args.save_baseline:
+        baseline.save(results, args.save_baseline)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = baseline.compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
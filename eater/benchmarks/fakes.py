@@ -0,0 +1,138 @@
+"""In-process stand-ins for Kafka, so benchmarks run without a broker.
+
+install() registers a fake confluent_kafka module; it must run before any
+eater module that imports confluent_kafka. Consumers created afterwards read
+from FakeBroker.queue and raise BrokerDrained once it is empty, which ends
+process_messages(); producers append to FakeBroker.produced.
+"""
+
+import sys
+import types
+from collections import deque
+
+
+class BrokerDrained(Exception):
+    """Raised by FakeConsumer.poll() when every queued message was consumed."""
+
+
+class FakeBroker:
+    queue = deque()
+    produced = []
+
+    @classmethod
+    def reset(cls, messages=()):
+        cls.queue = deque(messages)
+        cls.produced = []
+
+
+class FakeMessage:
+    """The confluent_kafka.Message accessors the services use."""
+
+    def __init__(self, topic, value, key=None, headers=None, partition=0, offset=0):
+        self._topic = topic
+        self._value = value
+        self._key = key
+        self._headers = headers
+        self._partition = partition
+        self._offset = offset
+
+    def topic(self):
+        return self._topic
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def headers(self):
+        return self._headers
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    def __init__(self, conf=None):
+        self.conf = conf
+        self.committed = 0
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.topics = topics
+
+    def poll(self, timeout=None):
+        if not FakeBroker.queue:
+            raise BrokerDrained()
+        return FakeBroker.queue.popleft()
+
+    def consume(self, num_messages=1, timeout=None):
+        if not FakeBroker.queue:
+            raise BrokerDrained()
+        count = min(num_messages, len(FakeBroker.queue))
+        return [FakeBroker.queue.popleft() for _ in range(count)]
+
+    def commit(self, message=None, offsets=None, asynchronous=True):
+        self.committed += 1
+
+    def close(self):
+        pass
+
+
+class FakeProducer:
+    def __init__(self, conf=None):
+        self.conf = conf
+        self._pending = []
+
+    def produce(self, topic, value=None, key=None, headers=None, callback=None, **kwargs):
+        message = FakeMessage(topic, value, key, headers)
+        FakeBroker.produced.append(message)
+        if callback is not None:
+            self._pending.append((callback, message))
+
+    def poll(self, timeout=None):
+        pending, self._pending = self._pending, []
+        for callback, message in pending:
+            callback(None, message)
+        return len(pending)
+
+    def flush(self, timeout=None):
+        self.poll(0)
+        return 0
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class KafkaError:
+    _PARTITION_EOF = -191
+    BROKER_NOT_AVAILABLE = 8
+    INVALID_MSG_SIZE = 4
+
+
+class KafkaException(Exception):
+    pass
+
+
+class TopicPartition:
+    def __init__(self, topic, partition=0, offset=-1001):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+def install():
+    """Make `import confluent_kafka` resolve to the fakes above."""
+    module = types.ModuleType("confluent_kafka")
+    module.Consumer = FakeConsumer
+    module.Producer = FakeProducer
+    module.KafkaError = KafkaError
+    module.KafkaException = KafkaException
+    module.TopicPartition = TopicPartition
+    sys.modules["confluent_kafka"] = module
+    return module
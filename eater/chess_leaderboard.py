@@ -0,0 +1,45 @@
+"""Chess leaderboard updates for games recorded over Kafka.
+
+Keys and Lua script come from chess_ratings.py, shared with eater_user,
+which also serves the leaderboard reads and rebuilds it from chess_games.
+"""
+
+import logging
+import os
+
+import redis
+from chess_ratings import RECORD_GAME_LUA, script_call
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_ENDPOINT")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+_client = None
+_record_script = None
+
+
+def get_client():
+    global _client, _record_script
+    if _client is None:
+        _client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            socket_timeout=5,
+            socket_connect_timeout=2,
+            decode_responses=True,
+        )
+        _record_script = _client.register_script(RECORD_GAME_LUA)
+    return _client
+
+
+def record_game(player_email: str, opponent_email: str, result: str):
+    """Apply one game to the leaderboard. Errors are logged, not raised:
+    the game is already committed in Postgres and a rebuild will catch up."""
+    if not REDIS_HOST:
+        return
+    try:
+        get_client()
+        _record_script(**script_call(player_email, opponent_email, result))
+    except Exception as e:
+        logger.warning("Failed to update chess leaderboard: %s", e)
@@ -28,3 +28,9 @@ def get_kafka_group_id(base_group_id: str) -> str:
     if is_dev_environment():
         return f"{base_group_id}-dev"
     return base_group_id
+
+
+def get_redis_key(base_key: str) -> str:
+    if is_dev_environment():
+        return f"_dev:{base_key}"
+    return base_key
@@ -1,20 +1,114 @@
-import json
+import atexit
 import logging
+import os
+import signal
+import sys
 import uuid
 
+import chess_leaderboard
 from common import remove_markdown_fence
 from dev_utils import get_topics_list, get_topic_name, is_dev_environment
-from kafka_consumer import consume_messages, validate_user_data
+from kafka_codec import loads as decode_json
+from kafka_consumer import consume_messages
 from kafka_producer import produce_message
 from logging_config import setup_logging
+from message_routing import correlation_id
 from postgres import (AlcoholConsumption, AlcoholForDay, delete_food,
                       get_alcohol_events_in_range, get_custom_date_dishes,
                       get_all_chess_data_sync, get_chess_stats_sync, get_food_health_level,
-                      get_today_dishes, modify_food, record_chess_game)
+                      get_nutrition_rollup, get_today_dishes, modify_food,
+                      record_chess_game, start_partition_maintenance)
 from process_gpt import get_recommendation, process_food, process_weight
+from profiling import install_signal_handlers
+from prometheus_client import start_http_server
 
 logger = logging.getLogger(__name__)
 
+# Serve DB-bound requests from an asyncpg pool on a background event loop so
+# one process overlaps queries for different users
+ASYNC_DB = os.getenv("EATER_ASYNC_DB", "false").lower() == "true"
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("EATER_ASYNC_MAX_IN_FLIGHT", "32"))
+
+if ASYNC_DB:
+    import async_handlers
+    from async_postgres import async_engine
+    from async_runner import AsyncDBRunner
+
+
+def _dispatch_async(runner, topic, message_key, user_email, value_dict):
+    """Hand a DB-bound request to the async runner; False if it stays sync."""
+    value = value_dict.get("value", {})
+    if not isinstance(value, dict):
+        value = {}
+    if topic == get_topic_name("get_today_data"):
+        runner.submit(
+            user_email, async_handlers.handle_today_data, message_key, user_email
+        )
+    elif topic == get_topic_name("get_alcohol_latest"):
+        runner.submit(
+            user_email, async_handlers.handle_alcohol_latest, message_key, user_email
+        )
+    elif topic == get_topic_name("get_alcohol_range"):
+        if not value.get("start_date") or not value.get("end_date"):
+            return False
+        runner.submit(
+            user_email,
+            async_handlers.handle_alcohol_range,
+            message_key,
+            user_email,
+            value["start_date"],
+            value["end_date"],
+        )
+    elif topic == get_topic_name("get_nutrition_rollup"):
+        runner.submit(
+            user_email,
+            async_handlers.handle_nutrition_rollup,
+            message_key,
+            user_email,
+            value.get("period", "week"),
+            value.get("start_date"),
+            value.get("end_date"),
+        )
+    elif topic == get_topic_name("get_recommendation"):
+        runner.submit(
+            user_email,
+            async_handlers.handle_recommendation,
+            message_key,
+            user_email,
+            value,
+            value_dict,
+        )
+    elif topic == get_topic_name("record_chess_game"):
+        player_email = (value.get("player_email") or "").strip()
+        result = (value.get("result") or "").strip()
+        # Rejections need no database and are answered by the sync branch
+        if player_email != user_email or result not in ("win", "loss", "draw"):
+            return False
+        runner.submit(
+            user_email,
+            async_handlers.handle_record_chess_game,
+            message_key,
+            user_email,
+            (value.get("opponent_email") or "").strip(),
+            result,
+            int(value.get("timestamp") or 0),
+        )
+    elif topic == get_topic_name("get_chess_stats"):
+        runner.submit(
+            user_email,
+            async_handlers.handle_chess_stats,
+            message_key,
+            user_email,
+            (value.get("opponent_email") or "").strip() or None,
+        )
+    elif topic == get_topic_name("get_all_chess_data"):
+        runner.submit(
+            user_email, async_handlers.handle_all_chess_data, message_key, user_email
+        )
+    else:
+        return False
+    return True
+
 
 def process_messages():
     base_topics = [
@@ -31,45 +125,54 @@ def process_messages():
         "record_chess_game",
         "get_chess_stats",
         "get_all_chess_data",
+        "get_nutrition_rollup",
     ]
     topics = get_topics_list(base_topics)
     if is_dev_environment():
         logger.info("Running in DEV environment - using _dev topic suffix")
     logger.info(f"Starting message processing with topics: {topics}")
+    runner = None
+    if ASYNC_DB:
+        runner = AsyncDBRunner(
+            max_in_flight=ASYNC_MAX_IN_FLIGHT, on_close=async_engine.dispose
+        )
+        # Drains queued handlers and closes the asyncpg pool on exit
+        atexit.register(runner.close)
     while True:
-        for message, consumer in consume_messages(topics):
+        for message, commits in consume_messages(topics):
             try:
-                value = message.value().decode("utf-8")
-                value_dict = json.loads(value)
+                # Decoded and validated once by consume_messages
+                value_dict = message.payload
 
                 # Extract user_email from the message
-                user_email = value_dict.get("value", {}).get("user_email")
+                user_email = message.user_email
                 if not user_email:
                     logger.warning("No user_email found in message, skipping")
                     continue
 
-                # Validate user data
-                if not validate_user_data(value_dict, user_email):
-                    logger.warning(
-                        f"Invalid user data in message for user {user_email}, skipping"
-                    )
-                    continue
-
                 # Get message key for tracking
-                message_key = value_dict.get("key")
+                message_key = correlation_id(message, value_dict)
                 if not message_key:
                     logger.warning(
                         f"No message key found for user {user_email}, skipping"
                     )
                     continue
 
-                consumer.commit(message)
+                commits.mark(message)
+
+                if runner is not None:
+                    if _dispatch_async(
+                        runner, message.topic(), message_key, user_email, value_dict
+                    ):
+                        continue
+                    # Don't let a sync write overtake this user's queued work
+                    runner.wait_for_user(user_email)
 
                 if message.topic() == get_topic_name("photo-analysis-response"):
                     gpt_response = value_dict.get("value", {})
                     if isinstance(gpt_response, str):
                         gpt_response = remove_markdown_fence(gpt_response)
-                        json_response = json.loads(gpt_response)
+                        json_response = decode_json(gpt_response)
                     else:
                         json_response = gpt_response
 
@@ -78,11 +181,11 @@ def process_messages():
 
                     # Parse nested analysis if present
                     if "analysis" in json_response:
-                        json_response = json.loads(json_response.get("analysis"))
+                        json_response = decode_json(json_response.get("analysis"))
 
                     # Check for errors after parsing
                     if json_response.get("error"):
-                        logger.error(f"Error for user {user_email}: {json_response}")
+                        logger.error("Error for user %s: %s", user_email, json_response)
                         produce_message(
                             topic="photo-analysis-response-check",
                             message={
@@ -123,6 +226,16 @@ def process_messages():
                             elif "image_id" not in json_response:
                                 json_response["image_id"] = original_image_id or message_key
 
+                            if runner is not None:
+                                # The runner answers with the Success check
+                                runner.submit(
+                                    user_email,
+                                    async_handlers.handle_food,
+                                    message_key,
+                                    user_email,
+                                    json_response,
+                                )
+                                continue
                             process_food(json_response, user_email)
                         elif type_of_processing == "weight_processing":
                             process_weight(json_response, user_email)
@@ -199,6 +312,26 @@ def process_messages():
                             "value": {"events": events, "user_email": user_email},
                         },
                     )
+                elif message.topic() == get_topic_name("get_nutrition_rollup"):
+                    value = value_dict.get("value", {})
+                    period = value.get("period", "week")
+                    series = get_nutrition_rollup(
+                        period=period,
+                        start_date=value.get("start_date"),
+                        end_date=value.get("end_date"),
+                        user_email=user_email,
+                    )
+                    produce_message(
+                        topic="get_nutrition_rollup_response",
+                        message={
+                            "key": message_key,
+                            "value": {
+                                "period": period,
+                                "series": series,
+                                "user_email": user_email,
+                            },
+                        },
+                    )
                 elif message.topic() == get_topic_name("delete_food"):
                     delete_food(value_dict.get("value"), user_email)
                     # Send confirmation
@@ -296,10 +429,14 @@ def process_messages():
                             },
                         )
                     else:
-                        ok = record_chess_game(
+                        scores = record_chess_game(
                             player_email, opponent_email, result, timestamp
                         )
-                        if not ok:
+                        if scores:
+                            chess_leaderboard.record_game(
+                                player_email, opponent_email, result
+                            )
+                        if not scores:
                             produce_message(
                                 topic="record_chess_game_response",
                                 message={
@@ -312,12 +449,6 @@ def process_messages():
                                 },
                             )
                         else:
-                            player_stats = get_chess_stats_sync(
-                                player_email, opponent_email
-                            )
-                            opponent_stats = get_chess_stats_sync(
-                                opponent_email, player_email
-                            )
                             produce_message(
                                 topic="record_chess_game_response",
                                 message={
@@ -325,18 +456,12 @@ def process_messages():
                                     "value": {
                                         "success": True,
                                         "user_email": user_email,
-                                        "player_wins": (player_stats or {}).get(
-                                            "wins", 0
-                                        ),
-                                        "player_losses": (player_stats or {}).get(
-                                            "losses", 0
-                                        ),
-                                        "opponent_wins": (opponent_stats or {}).get(
-                                            "wins", 0
-                                        ),
-                                        "opponent_losses": (opponent_stats or {}).get(
-                                            "losses", 0
-                                        ),
+                                        "player_wins": scores["player"]["wins"],
+                                        "player_losses": scores["player"]["losses"],
+                                        "opponent_wins": scores["opponent"]["wins"],
+                                        "opponent_losses": scores["opponent"][
+                                            "losses"
+                                        ],
                                     },
                                 },
                             )
@@ -373,7 +498,10 @@ def process_messages():
                     )
             except Exception as e:
                 logger.error(
-                    f"Failed to process message for user {user_email}: {e}, message {value_dict}"
+                    "Failed to process message for user %s: %s, message %s",
+                    user_email,
+                    e,
+                    value_dict,
                 )
                 # Send error response if we have a message key
                 if message_key:
@@ -389,4 +517,12 @@ def process_messages():
 if __name__ == "__main__":
     setup_logging("eater.log")
     logger.info("Starting Eater processor")
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        start_http_server(int(metrics_port))
+    # kill -USR1 / -USR2 for a live profile or tracemalloc diff
+    install_signal_handlers()
+    # Exit through SystemExit so the consumer and atexit cleanup run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    start_partition_maintenance()
     process_messages()
@@ -1,10 +1,14 @@
 import json
 import logging
 import os
-from datetime import time
+import time
 
+from commit_manager import OffsetCommitManager
 from confluent_kafka import Consumer, KafkaError, KafkaException
+from deadline import shed_if_expired
 from dev_utils import get_kafka_group_id
+from kafka_codec import KafkaMessage
+from tracing import trace_consumed
 
 logger = logging.getLogger("kafka_consumer")
 
@@ -78,11 +82,21 @@ def consume_messages(topics, expected_user_email=None):
         }
     )
 
-    consumer.subscribe(topics)
+    commits = OffsetCommitManager(consumer)
+    consumer.subscribe(topics, on_revoke=commits.on_revoke)
 
+    try:
+        yield from _poll_messages(consumer, commits, expected_user_email)
+    finally:
+        commits.close()
+        consumer.close()
+
+
+def _poll_messages(consumer, commits, expected_user_email):
     while True:
         msg = consumer.poll(1.0)
         if msg is None:
+            commits.maybe_commit()
             continue
         if msg.error():
             if msg.error().code() == KafkaError._PARTITION_EOF:
@@ -99,18 +113,28 @@ def consume_messages(topics, expected_user_email=None):
                 logger.error(f"Consumer error: {msg.error()}")
                 continue
 
+        # Drop work nobody is waiting for before any DB or LLM call
+        if shed_if_expired(msg):
+            commits.mark(msg)
+            continue
+        trace_consumed(msg)
+
         try:
-            message_data = json.loads(msg.value())
-            logger.debug(f"Received message: {message_data}")
+            message = KafkaMessage.decode(msg)
+            message_data = message.payload
+            logger.debug("Received message: %s", message_data)
             if not validate_user_data(message_data, expected_user_email):
-                logger.warning(f"Skipping message for unexpected user: {message_data}")
+                logger.warning("Skipping message for unexpected user: %s", message_data)
                 continue
 
-            user_email = message_data.get("value", {}).get("user_email", "unknown")
+            user_email = message.user_email or "unknown"
             logger.info(
-                f"Consumed message for user {user_email}: {msg.key()} - {msg.value()}"
+                "Consumed message for user %s: %s - %s",
+                user_email,
+                msg.key(),
+                message_data,
             )
-            yield msg, consumer
+            yield message, commits
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse message as JSON: {str(e)}")
             continue
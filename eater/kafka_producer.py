@@ -1,9 +1,13 @@
-import json
 import logging
 import os
 
 from confluent_kafka import Producer
+from deadline import propagation_headers
 from dev_utils import get_topic_name
+from kafka_codec import dumps
+from message_routing import (PARTITIONER, message_headers,
+                             message_routing_key)
+from tracing import trace_headers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,6 +16,7 @@ conf = {
     "bootstrap.servers": os.getenv("BOOTSTRAP_SERVER"),
     "client.id": "python-producer",
     "acks": "all",
+    "partitioner": PARTITIONER,
 }
 
 producer = Producer(conf)
@@ -35,8 +40,11 @@ def produce_message(topic, message):
     try:
         producer.produce(
             actual_topic,
-            key=(message["key"]),
-            value=json.dumps(message),
+            key=message_routing_key(message),
+            value=dumps(message),
+            headers=message_headers(
+                message, propagation_headers() + trace_headers(actual_topic)
+            ),
             callback=delivery_report,
         )
         producer.flush()
@@ -1,12 +1,16 @@
+import json
 import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+from prometheus_client import Gauge, Histogram
 from sqlalchemy import (ARRAY, JSON, BigInteger, Column, Date, Float, Integer,
                         PrimaryKeyConstraint, String, cast, create_engine,
-                        func, text)
+                        event, func, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -28,6 +32,50 @@ engine = create_engine(
     pool_timeout=30,
 )
 
+db_pool_connections = Gauge(
+    "eater_db_pool_connections",
+    "Database connection pool usage",
+    ["engine", "state"],
+)
+
+
+def register_pool_metrics(engine_name, pool):
+    """Export a SQLAlchemy QueuePool's usage, read on every scrape."""
+    states = {
+        "size": pool.size,
+        "checked_out": pool.checkedout,
+        "idle": pool.checkedin,
+        # QueuePool counts overflow from -pool_size while the pool fills up
+        "overflow": lambda: max(0, pool.overflow()),
+    }
+    for state, read in states.items():
+        db_pool_connections.labels(engine=engine_name, state=state).set_function(read)
+
+
+db_query_seconds = Histogram(
+    "eater_db_query_seconds",
+    "Time spent executing SQL statements",
+    ["engine"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+def register_query_metrics(engine_name, sync_engine):
+    """Time every statement run on an engine (the sync_engine of an async one)."""
+    histogram = db_query_seconds.labels(engine=engine_name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - context._query_started)
+
+
+register_pool_metrics("sync", engine.pool)
+register_query_metrics("sync", engine)
+
 Base = declarative_base()
 
 
@@ -125,131 +173,322 @@ def get_db_session():
         session.close()
 
 
+# Range-partitioned by month in eater_init; upcoming months are created here
+PARTITIONED_TABLES = ["dishes_day", "alcohol_consumption"]
+PARTITION_MONTHS_AHEAD = int(os.getenv("EATER_PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_HOURS = float(os.getenv("EATER_PARTITION_CHECK_HOURS", "24"))
+
+_ENSURE_PARTITIONS = text("""
+    SELECT c.relname,
+           public.ensure_monthly_partitions(
+               c.relname, CURRENT_DATE,
+               (CURRENT_DATE + make_interval(months => :ahead))::date
+           ) AS created
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relname = ANY(:tables) AND c.relkind = 'p'
+""")
+
+
+def ensure_partitions():
+    """Make sure the next PARTITION_MONTHS_AHEAD monthly partitions exist.
+
+    A no-op for tables that have not been converted to partitions yet.
+    """
+    try:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                _ENSURE_PARTITIONS,
+                {"ahead": PARTITION_MONTHS_AHEAD, "tables": PARTITIONED_TABLES},
+            ).fetchall()
+        for table_name, created in rows:
+            if created:
+                logger.info(f"Created {created} partitions for {table_name}")
+    except Exception as e:
+        logger.warning(f"Failed to ensure table partitions: {e}")
+
+
+def start_partition_maintenance():
+    """Run ensure_partitions() now and every PARTITION_CHECK_HOURS."""
+
+    def loop():
+        while True:
+            ensure_partitions()
+            time.sleep(PARTITION_CHECK_HOURS * 3600)
+
+    threading.Thread(target=loop, name="partition-maintenance", daemon=True).start()
+
+
+def _message_date(message):
+    """Date a dish message belongs to as YYYY-MM-DD, defaulting to today.
+
+    Backdated photo uploads carry a dd-mm-yyyy "date"; everything else is
+    stored against the current day.
+    """
+    date_val = message.get("date") if message else None
+    if date_val:
+        try:
+            day, month, year = date_val.split("-")
+            return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+        except ValueError:
+            pass
+    return current_date()
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def _dish_day_values(message, user_email):
+    """Column values of the dishes_day row for a food_processing message."""
+    raw_rating = message.get("health_rating", 0)
+    health_rating = max(0, min(100, int(raw_rating))) if isinstance(raw_rating, (int, float)) else 0
+    food_health_level_data = message.get("food_health_level")
+    food_health_level_str = None
+    if food_health_level_data:
+        food_health_level_str = json.dumps(food_health_level_data)
+
+    # If message has timestamp, use it. Otherwise use now.
+    timestamp_val = message.get("timestamp")
+    if timestamp_val:
+        time_to_store = int(timestamp_val)
+    else:
+        time_to_store = int(datetime.now().timestamp())
+
+    return {
+        "time": time_to_store,
+        "date": _message_date(message),
+        "dish_name": message.get("dish_name"),
+        "estimated_avg_calories": message.get("estimated_avg_calories"),
+        "ingredients": message.get("ingredients"),
+        "total_avg_weight": message.get("total_avg_weight"),
+        "health_rating": health_rating,
+        "food_health_level": food_health_level_str,
+        "contains": message.get("contains"),
+        "user_email": user_email,
+        "image_id": message.get("image_id"),
+    }
+
+
+def _alcohol_consumption_values(dish_values, user_email):
+    """alcohol_consumption row for a dish flagged is_alcohol, else None."""
+    try:
+        is_alcohol = bool((dish_values["contains"] or {}).get("is_alcohol", False))
+    except Exception:
+        is_alcohol = False
+    if not is_alcohol:
+        return None
+    return {
+        "time": int(datetime.now().timestamp()),
+        "date": current_date(),
+        "drink_name": dish_values["dish_name"],
+        "calories": int(dish_values["estimated_avg_calories"] or 0),
+        "quantity": int(dish_values["total_avg_weight"] or 0),
+        "user_email": user_email,
+    }
+
+
+def _aggregate_contains(all_contains, total_added_sugar_tsp):
+    aggregated_contains = {
+        "proteins": 0,
+        "fats": 0,
+        "carbohydrates": 0,
+        "sugar": 0,
+    }
+    for entry in all_contains or []:
+        for key in aggregated_contains:
+            aggregated_contains[key] += entry.get(key, 0)
+    # Add sugar from added_sugar_tsp (1 tsp = ~5g)
+    aggregated_contains["sugar"] += float(total_added_sugar_tsp or 0) * 5
+    return aggregated_contains
+
+
+ROLLUP_PERIODS = ("week", "month")
+
+# Recompute one week/month rollup row from the per-day tables. Bounded by
+# the period (at most 31 days) and served by idx_total_for_day_user_today and
+# idx_alcohol_for_day_user_date, so it is cheap to run on every dish write.
+_REFRESH_ROLLUP = text("""
+    INSERT INTO public.nutrition_rollup (
+        user_email, period, period_start, period_end,
+        total_calories, total_avg_weight, proteins, fats, carbohydrates, sugar,
+        dish_count, days_logged, alcohol_drinks, alcohol_calories
+    )
+    SELECT
+        :user_email, :period, :period_start, :period_end,
+        COALESCE(t.total_calories, 0),
+        COALESCE(t.total_avg_weight, 0),
+        COALESCE(t.proteins, 0),
+        COALESCE(t.fats, 0),
+        COALESCE(t.carbohydrates, 0),
+        COALESCE(t.sugar, 0),
+        COALESCE(t.dish_count, 0),
+        COALESCE(t.days_logged, 0),
+        COALESCE(a.total_drinks, 0),
+        COALESCE(a.total_calories, 0)
+    FROM (
+        SELECT
+            SUM(total_calories) AS total_calories,
+            SUM(total_avg_weight) AS total_avg_weight,
+            SUM(COALESCE((contains->>'proteins')::float, 0)) AS proteins,
+            SUM(COALESCE((contains->>'fats')::float, 0)) AS fats,
+            SUM(COALESCE((contains->>'carbohydrates')::float, 0)) AS carbohydrates,
+            SUM(COALESCE((contains->>'sugar')::float, 0)) AS sugar,
+            SUM(COALESCE(cardinality(dishes_of_day), 0)) AS dish_count,
+            COUNT(*) AS days_logged
+        FROM public.total_for_day
+        WHERE user_email = :user_email
+          AND today BETWEEN :period_start AND :period_end
+    ) AS t,
+    (
+        SELECT SUM(total_drinks) AS total_drinks, SUM(total_calories) AS total_calories
+        FROM public.alcohol_for_day
+        WHERE user_email = :user_email
+          AND date BETWEEN :period_start AND :period_end
+    ) AS a
+    ON CONFLICT (user_email, period, period_start) DO UPDATE SET
+        period_end = EXCLUDED.period_end,
+        total_calories = EXCLUDED.total_calories,
+        total_avg_weight = EXCLUDED.total_avg_weight,
+        proteins = EXCLUDED.proteins,
+        fats = EXCLUDED.fats,
+        carbohydrates = EXCLUDED.carbohydrates,
+        sugar = EXCLUDED.sugar,
+        dish_count = EXCLUDED.dish_count,
+        days_logged = EXCLUDED.days_logged,
+        alcohol_drinks = EXCLUDED.alcohol_drinks,
+        alcohol_calories = EXCLUDED.alcohol_calories
+""")
+
+# A user's series is one range scan of the (user_email, period, period_start)
+# primary key
+_ROLLUP_RANGE = text("""
+    SELECT period_start, period_end, total_calories, total_avg_weight,
+           proteins, fats, carbohydrates, sugar, dish_count, days_logged,
+           alcohol_drinks, alcohol_calories
+    FROM public.nutrition_rollup
+    WHERE user_email = :user_email
+      AND period = :period
+      AND period_start BETWEEN :start AND :end
+    ORDER BY period_start
+""")
+
+
+def _period_bounds(period, day):
+    """First and last day of the week (Monday based) or month holding day."""
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _rollup_refresh_params(user_email, day):
+    day = _as_date(day)
+    for period in ROLLUP_PERIODS:
+        period_start, period_end = _period_bounds(period, day)
+        yield {
+            "user_email": user_email,
+            "period": period,
+            "period_start": period_start,
+            "period_end": period_end,
+        }
+
+
+def _rollup_range_params(period, start_date, end_date, user_email):
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(ROLLUP_PERIODS)}")
+    # Include the period that contains start_date
+    start, _ = _period_bounds(period, _parse_request_date(start_date))
+    return {
+        "user_email": user_email,
+        "period": period,
+        "start": start,
+        "end": _parse_request_date(end_date),
+    }
+
+
+def _rollup_item(row):
+    return {
+        "period_start": row.period_start.strftime("%Y-%m-%d"),
+        "period_end": row.period_end.strftime("%Y-%m-%d"),
+        "total_calories": row.total_calories,
+        "total_avg_weight": row.total_avg_weight,
+        "proteins": row.proteins,
+        "fats": row.fats,
+        "carbohydrates": row.carbohydrates,
+        "sugar": row.sugar,
+        "dish_count": row.dish_count,
+        "days_logged": row.days_logged,
+        "alcohol_drinks": row.alcohol_drinks,
+        "alcohol_calories": row.alcohol_calories,
+    }
+
+
+def refresh_rollups(session, user_email, day):
+    """Bring the week and month rollups containing day up to date."""
+    for params in _rollup_refresh_params(user_email, day):
+        session.execute(_REFRESH_ROLLUP, params)
+
+
+def get_nutrition_rollup(
+    period: str, start_date: str, end_date: str, user_email: str = None
+):
+    """
+    Weekly or monthly nutrition series for dd-mm-yyyy start/end dates.
+    """
+    params = _rollup_range_params(period, start_date, end_date, user_email)
+    try:
+        with get_db_session() as session:
+            rows = session.execute(_ROLLUP_RANGE, params)
+            return [_rollup_item(row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error retrieving nutrition rollup: {e}")
+        return []
+
+
 def write_to_dish_day(
     message=None, recalculate: Optional[bool] = False, user_email: str = None
 ):
     try:
         with get_db_session() as session:
             if not recalculate:
-                dish_name = message.get("dish_name")
-                estimated_avg_calories = message.get("estimated_avg_calories")
-                ingredients = message.get("ingredients")
-                total_avg_weight = message.get("total_avg_weight")
-                raw_rating = message.get("health_rating", 0)
-                health_rating = max(0, min(100, int(raw_rating))) if isinstance(raw_rating, (int, float)) else 0
-                food_health_level_data = message.get("food_health_level")
-                food_health_level_str = None
-                if food_health_level_data:
-                    import json
-
-                    food_health_level_str = json.dumps(food_health_level_data)
-                contains = message.get("contains")
-                image_id = message.get("image_id")
-                
-                # Get date from message if present (e.g., from backdated photo upload)
-                # Ensure it's in YYYY-MM-DD format for storage
-                date_val = message.get("date")
-                if date_val:
-                    # Input expected: DD-MM-YYYY (from process_photo dispatch)
-                    # Output wanted: YYYY-MM-DD (for Postgres date column standard)
-                    try:
-                        day, month, year = date_val.split("-")
-                        storage_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                    except ValueError:
-                        # Fallback if format is unexpected
-                        storage_date = current_date()
-                else:
-                    storage_date = current_date()
-
-                # Get correct timestamp for time column
-                # If message has timestamp, use it. Otherwise use now.
-                timestamp_val = message.get("timestamp")
-                if timestamp_val:
-                    time_to_store = int(timestamp_val)
-                else:
-                    time_to_store = int(datetime.now().timestamp())
+                values = _dish_day_values(message, user_email)
 
                 # Upsert: overwrite existing record for same time/user (used by manual re-analysis)
                 dish_day = (
                     session.query(DishesDay)
-                    .filter(DishesDay.time == time_to_store)
+                    .filter(DishesDay.time == values["time"])
                     .filter(DishesDay.user_email == user_email)
                     .first()
                 )
 
                 if dish_day:
-                    dish_day.date = storage_date
-                    dish_day.dish_name = dish_name
-                    dish_day.estimated_avg_calories = estimated_avg_calories
-                    dish_day.ingredients = ingredients
-                    dish_day.total_avg_weight = total_avg_weight
-                    dish_day.health_rating = health_rating
-                    dish_day.food_health_level = food_health_level_str
-                    dish_day.contains = contains
-                    dish_day.image_id = image_id
+                    for column, value in values.items():
+                        setattr(dish_day, column, value)
                 else:
-                    dish_day = DishesDay(
-                        time=time_to_store,
-                        date=storage_date,
-                        dish_name=dish_name,
-                        estimated_avg_calories=estimated_avg_calories,
-                        ingredients=ingredients,
-                        total_avg_weight=total_avg_weight,
-                        health_rating=health_rating,
-                        food_health_level=food_health_level_str,
-                        contains=contains,
-                        user_email=user_email,
-                        image_id=image_id,
-                    )
-                    session.add(dish_day)
+                    session.add(DishesDay(**values))
 
-                # If the dish is alcohol, record alcohol consumption
-                try:
-                    contains_obj = contains or {}
-                    is_alcohol = bool(contains_obj.get("is_alcohol", False))
-                except Exception:
-                    is_alcohol = False
-
-                if is_alcohol:
-                    drink_name = dish_name
-                    calories = estimated_avg_calories or 0
-                    quantity = total_avg_weight or 0
-                    alcohol_entry = AlcoholConsumption(
-                        time=int(datetime.now().timestamp()),
-                        date=current_date(),
-                        drink_name=drink_name,
-                        calories=int(calories),
-                        quantity=int(quantity),
-                        user_email=user_email,
-                    )
-                    session.add(alcohol_entry)
+                alcohol_values = _alcohol_consumption_values(values, user_email)
+                if alcohol_values:
+                    session.add(AlcoholConsumption(**alcohol_values))
                     logger.debug(
-                        f"Recorded alcohol consumption for user {user_email}: {drink_name}, cal {calories}, qty {quantity}"
+                        f"Recorded alcohol consumption for user {user_email}: "
+                        f"{alcohol_values['drink_name']}, cal {alcohol_values['calories']}, "
+                        f"qty {alcohol_values['quantity']}"
                     )
                 session.commit()
-                
-                logger.debug(f"Successfully wrote dish data to database: {dish_name}")
-
-            # Determine which date to recalculate totals for
-            # logic: if we just wrote, use storage_date. If generic recalc, try to infer or fallback.
-            # But wait, storage_date is local to the block above. We need scope.
-            # Best approach: if recalculating without message (generic), use current_date().
-            # If message provided (even if recalculate=True logic path entered), try to extract date.
-            
-            recalc_date = current_date() # Default
-            if message:
-                 date_val = message.get("date")
-                 if date_val:
-                    try:
-                        day, month, year = date_val.split("-")
-                        recalc_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                    except ValueError:
-                         pass
-            
-            # Note: storage_date above was YYYY-MM-DD. current_date() returns user's notion of today YYYY-MM-DD.
-            # We need to make sure we query consistently.
-            
-            # Query aggregated data for the *target* date
+
+                logger.debug(
+                    f"Successfully wrote dish data to database: {values['dish_name']}"
+                )
+
+            # Recalculate totals for the day the message belongs to (today for
+            # a generic recalculation without a message)
+            recalc_date = _message_date(message)
             logger.debug(f"Calculating total food data for {recalc_date}")
 
             # Get total_calories, total_weight, all_dishes, all_contains
@@ -286,40 +525,17 @@ def write_to_dish_day(
                 else []
             )
 
-            all_contains = total_data.all_contains or []
-            aggregated_contains = {
-                "proteins": 0,
-                "fats": 0,
-                "carbohydrates": 0,
-                "sugar": 0,
-            }
-            for entry in all_contains:
-                for key in aggregated_contains:
-                    aggregated_contains[key] += entry.get(key, 0)
-            
-            # Add sugar from added_sugar_tsp (1 tsp = ~5g)
-            total_added_sugar_result = (
+            total_added_sugar_tsp = (
                 session.query(func.sum(DishesDay.added_sugar_tsp))
                 .filter(DishesDay.date == recalc_date)
                 .filter(DishesDay.user_email == user_email)
                 .scalar()
             )
-            total_added_sugar_tsp = total_added_sugar_result or 0
-            aggregated_contains["sugar"] += float(total_added_sugar_tsp) * 5  # Convert tsp to grams
-
-            # Prepare data for total_for_day table
-            total_for_day = TotalForDay(
-                date=recalc_date,
-                today=recalc_date,
-                total_calories=total_calories,
-                ingredients=all_ingredients,
-                dishes_of_day=all_dishes,
-                total_avg_weight=total_weight,
-                contains=aggregated_contains,
-                user_email=user_email,
+            aggregated_contains = _aggregate_contains(
+                total_data.all_contains, total_added_sugar_tsp
             )
 
-            # Check if there's an existing entry for today
+            # Check if there's an existing entry for the day
             existing_entry = (
                 session.query(TotalForDay)
                 .filter(TotalForDay.date == recalc_date)
@@ -336,7 +552,18 @@ def write_to_dish_day(
                 existing_entry.contains = aggregated_contains
             else:
                 logger.debug("Inserting new entry in total_for_day table")
-                session.add(total_for_day)
+                session.add(
+                    TotalForDay(
+                        date=recalc_date,
+                        today=recalc_date,
+                        total_calories=total_calories,
+                        ingredients=all_ingredients,
+                        dishes_of_day=all_dishes,
+                        total_avg_weight=total_weight,
+                        contains=aggregated_contains,
+                        user_email=user_email,
+                    )
+                )
 
             session.commit()
 
@@ -386,96 +613,179 @@ def write_to_dish_day(
                 )
             except Exception as e:
                 logger.warning(f"Failed to aggregate alcohol_for_day: {e}")
+                session.rollback()
+
+            try:
+                refresh_rollups(session, user_email, recalc_date)
+                session.commit()
+            except Exception as e:
+                logger.warning(f"Failed to refresh nutrition rollups: {e}")
     except Exception as e:
         logger.error(f"Error writing to database: {e}")
 
 
+# One round trip per day view: each piece is a LATERAL subquery driven off a
+# single-row seed, so the planner resolves them as independent index lookups
+# and only the columns the API returns are fetched.
+_DAY_SNAPSHOT_SQL = """
+    SELECT
+        t.user_email IS NOT NULL AS has_total,
+        t.total_calories,
+        t.total_avg_weight,
+        t.contains,
+        d.dishes,
+        a.user_email IS NOT NULL AS has_alcohol,
+        a.total_drinks,
+        a.total_calories AS alcohol_calories,
+        a.drinks_of_day,
+        w.time AS weight_time,
+        w.weight,
+        w.date AS weight_date
+    FROM (SELECT 1) AS seed
+    LEFT JOIN LATERAL (
+        SELECT user_email, total_calories, total_avg_weight, contains
+        FROM public.total_for_day
+        WHERE today = :day AND user_email = :user_email
+        LIMIT 1
+    ) AS t ON true
+    LEFT JOIN LATERAL (
+        SELECT json_agg(
+            json_build_object(
+                'time', time,
+                'dish_name', dish_name,
+                'estimated_avg_calories', estimated_avg_calories,
+                'total_avg_weight', total_avg_weight,
+                'health_rating', health_rating,
+                'ingredients', ingredients,
+                'food_health_level', food_health_level,
+                'image_id', image_id,
+                'added_sugar_tsp', added_sugar_tsp
+            ) ORDER BY time
+        ) AS dishes
+        FROM public.dishes_day
+        WHERE date = :day AND user_email = :user_email
+    ) AS d ON true
+    LEFT JOIN LATERAL (
+        SELECT user_email, total_drinks, total_calories, drinks_of_day
+        FROM public.alcohol_for_day
+        WHERE date = :day AND user_email = :user_email
+        LIMIT 1
+    ) AS a ON true
+    LEFT JOIN LATERAL ({weight}) AS w ON true
+"""
+
+# Both weight lookups walk idx_weight_user_time (user_email, time)
+_LATEST_WEIGHT_SQL = """
+        SELECT time, weight, date
+        FROM public.weight
+        WHERE user_email = :user_email
+        ORDER BY time DESC
+        LIMIT 1
+"""
+
+# Nearest entry to :target: the closest row on each side of it, each a single
+# index probe, then the smaller distance of the two.
+_CLOSEST_WEIGHT_SQL = """
+        SELECT time, weight, date
+        FROM (
+            (SELECT time, weight, date
+             FROM public.weight
+             WHERE user_email = :user_email AND time <= :target
+             ORDER BY time DESC
+             LIMIT 1)
+            UNION ALL
+            (SELECT time, weight, date
+             FROM public.weight
+             WHERE user_email = :user_email AND time > :target
+             ORDER BY time ASC
+             LIMIT 1)
+        ) AS candidates
+        ORDER BY abs(time - :target)
+        LIMIT 1
+"""
+
+# Typed so drivers that hand back raw JSON text (asyncpg) are decoded too
+_TODAY_SNAPSHOT = text(
+    _DAY_SNAPSHOT_SQL.format(weight=_LATEST_WEIGHT_SQL)
+).columns(contains=JSON, dishes=JSON)
+_CUSTOM_DATE_SNAPSHOT = text(
+    _DAY_SNAPSHOT_SQL.format(weight=_CLOSEST_WEIGHT_SQL)
+).columns(contains=JSON, dishes=JSON)
+
+
+def _dishes_for_output(dishes, include_health_level=False):
+    dishes_list = []
+    for dish in dishes or []:
+        item = {
+            "time": dish["time"],
+            "dish_name": dish["dish_name"],
+            "estimated_avg_calories": dish["estimated_avg_calories"],
+            "total_avg_weight": dish["total_avg_weight"],
+            "health_rating": _health_rating_for_output(dish["health_rating"]),
+            "ingredients": dish["ingredients"],
+            "image_id": dish["image_id"],
+            "added_sugar_tsp": dish["added_sugar_tsp"] or 0.0,
+        }
+        if include_health_level:
+            item["food_health_level"] = dish["food_health_level"]
+        dishes_list.append(item)
+    return dishes_list
+
+
+def _alcohol_for_output(row):
+    if not row.has_alcohol:
+        return None
+    return {
+        "total_drinks": row.total_drinks,
+        "total_calories": row.alcohol_calories,
+        "drinks_of_day": row.drinks_of_day or [],
+    }
+
+
+def _today_result(row):
+    """Shape a _TODAY_SNAPSHOT row into the get_today_dishes response."""
+    latest_weight = None
+    if row.weight_time is not None:
+        latest_weight = {"time": row.weight_time, "weight": row.weight}
+
+    if not row.has_total:
+        logger.debug(f"No data found in total_for_day for {current_date()}")
+        result = {
+            "total_for_day": {
+                "total_calories": 0,
+                "total_avg_weight": row.weight if latest_weight else 0,
+                "contains": [],
+            },
+            "dishes_today": [],
+        }
+        if latest_weight:
+            result["latest_weight"] = latest_weight
+        return result
+
+    result = {
+        "total_for_day": {
+            "total_calories": row.total_calories,
+            "total_avg_weight": row.total_avg_weight,
+            "contains": row.contains,
+        },
+        "dishes_today": _dishes_for_output(row.dishes),
+    }
+    alcohol = _alcohol_for_output(row)
+    if alcohol:
+        result["alcohol_for_day"] = alcohol
+    if latest_weight:
+        result["latest_weight"] = latest_weight
+    return result
+
+
 def get_today_dishes(user_email: str = None):
     try:
         with get_db_session() as session:
-            latest_weight_entry = (
-                session.query(Weight)
-                .filter(Weight.user_email == user_email)
-                .order_by(Weight.time.desc())
-                .first()
-            )
-
-            total_data = (
-                session.query(TotalForDay)
-                .filter(TotalForDay.today == current_date())
-                .filter(TotalForDay.user_email == user_email)
-                .first()
-            )
-            if not total_data:
-                logger.debug(f"No data found in total_for_day for {current_date()}")
-                total_for_day_data = {
-                    "total_calories": 0,
-                    "total_avg_weight": (
-                        latest_weight_entry.weight if latest_weight_entry else 0
-                    ),
-                    "contains": [],
-                }
-                dishes_list = []
-                result = {
-                    "total_for_day": total_for_day_data,
-                    "dishes_today": dishes_list,
-                }
-                if latest_weight_entry:
-                    result["latest_weight"] = {
-                        "time": latest_weight_entry.time,
-                        "weight": latest_weight_entry.weight,
-                    }
-                return result
-            total_for_day_data = {
-                "total_calories": total_data.total_calories,
-                "total_avg_weight": total_data.total_avg_weight,
-                "contains": total_data.contains,
-            }
-            dishes_today = (
-                session.query(DishesDay)
-                .filter(DishesDay.date == current_date())
-                .filter(DishesDay.user_email == user_email)
-                .all()
-            )
-            dishes_list = [
-                {
-                    "time": dish.time,
-                    "dish_name": dish.dish_name,
-                    "estimated_avg_calories": dish.estimated_avg_calories,
-                    "total_avg_weight": dish.total_avg_weight,
-                    "health_rating": _health_rating_for_output(dish.health_rating),
-                    "ingredients": dish.ingredients,
-                    "image_id": dish.image_id,
-                    "added_sugar_tsp": getattr(dish, 'added_sugar_tsp', 0.0) or 0.0,
-                }
-                for dish in dishes_today
-            ]
-            result = {
-                "total_for_day": total_for_day_data,
-                "dishes_today": dishes_list,
-            }
-            # Include today's alcohol summary
-            try:
-                alcohol = (
-                    session.query(AlcoholForDay)
-                    .filter(AlcoholForDay.date == current_date())
-                    .filter(AlcoholForDay.user_email == user_email)
-                    .first()
-                )
-                if alcohol:
-                    result["alcohol_for_day"] = {
-                        "total_drinks": alcohol.total_drinks,
-                        "total_calories": alcohol.total_calories,
-                        "drinks_of_day": alcohol.drinks_of_day or [],
-                    }
-            except Exception as e:
-                logger.warning(f"Failed to fetch alcohol_for_day: {e}")
-            if latest_weight_entry:
-                result["latest_weight"] = {
-                    "time": latest_weight_entry.time,
-                    "weight": latest_weight_entry.weight,
-                }
-
+            row = session.execute(
+                _TODAY_SNAPSHOT,
+                {"day": current_date(), "user_email": user_email},
+            ).one()
+            result = _today_result(row)
             logger.debug(f"Result of get_today_dishes {result}")
             return result
     except Exception as e:
@@ -493,106 +803,51 @@ def get_custom_date_dishes(custom_date: str, user_email: str = None):
             day, month, year = custom_date.split("-")
             formatted_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
 
-            # Get the timestamp for the requested date to find closest weight entry
+            # Timestamp of the requested date, to find the closest weight entry
             requested_date = datetime.strptime(formatted_date, "%Y-%m-%d")
             requested_timestamp = int(requested_date.timestamp())
 
-            # Find weight entry closest to the requested date
-            # First try to get weight entries and find the one with minimum time difference
-            weight_entries = (
-                session.query(Weight).filter(Weight.user_email == user_email).all()
-            )
-
-            closest_weight_entry = None
-            if weight_entries:
-                closest_weight_entry = min(
-                    weight_entries, key=lambda w: abs(w.time - requested_timestamp)
-                )
-
-            total_data = (
-                session.query(TotalForDay)
-                .filter(TotalForDay.today == formatted_date)
-                .filter(TotalForDay.user_email == user_email)
-                .first()
-            )
-            dishes_today = (
-                session.query(DishesDay)
-                .filter(DishesDay.date == formatted_date)
-                .filter(DishesDay.user_email == user_email)
-                .all()
-            )
-            dishes_list = [
+            row = session.execute(
+                _CUSTOM_DATE_SNAPSHOT,
                 {
-                    "time": dish.time,
-                    "dish_name": dish.dish_name,
-                    "estimated_avg_calories": dish.estimated_avg_calories,
-                    "total_avg_weight": dish.total_avg_weight,
-                    "health_rating": _health_rating_for_output(dish.health_rating),
-                    "ingredients": dish.ingredients,
-                    "food_health_level": dish.food_health_level,
-                    "image_id": dish.image_id,
-                    "added_sugar_tsp": getattr(dish, 'added_sugar_tsp', 0.0) or 0.0,
-                }
-                for dish in dishes_today
-            ]
+                    "day": requested_date.date(),
+                    "user_email": user_email,
+                    "target": requested_timestamp,
+                },
+            ).one()
+            dishes = row.dishes or []
+            dishes_list = _dishes_for_output(dishes, include_health_level=True)
 
-            if not total_data:
+            if not row.has_total:
                 logger.debug(f"No data found in total_for_day for {formatted_date}")
                 # Calculate summary from dishes if total_for_day is missing
-                cal_sum = sum(d.estimated_avg_calories for d in dishes_today)
-                weight_sum = sum(d.total_avg_weight for d in dishes_today)
-
                 total_for_day_data = {
-                    "total_calories": cal_sum,
-                    "total_avg_weight": weight_sum,
+                    "total_calories": sum(
+                        d["estimated_avg_calories"] or 0 for d in dishes
+                    ),
+                    "total_avg_weight": sum(d["total_avg_weight"] or 0 for d in dishes),
                     "contains": {},
                 }
-                result = {
-                    "total_for_day": total_for_day_data,
-                    "dishes_today": dishes_list,
+                alcohol = None
+            else:
+                total_for_day_data = {
+                    "total_calories": row.total_calories,
+                    "total_avg_weight": row.total_avg_weight,
+                    "contains": row.contains,
                 }
-                if closest_weight_entry:
-                    result["closest_weight"] = {
-                        "time": closest_weight_entry.time,
-                        "weight": closest_weight_entry.weight,
-                        "date": closest_weight_entry.date,
-                    }
-                return result
-            total_for_day_data = {
-                "total_calories": total_data.total_calories,
-                "total_avg_weight": total_data.total_avg_weight,
-                "contains": total_data.contains,
-            }
-            # dishes_today and dishes_list already fetched above
+                alcohol = _alcohol_for_output(row)
+
             result = {
                 "total_for_day": total_for_day_data,
                 "dishes_today": dishes_list,
             }
-            # Include alcohol summary for date
-            try:
-                alcohol = (
-                    session.query(AlcoholForDay)
-                    .filter(AlcoholForDay.date == formatted_date)
-                    .filter(AlcoholForDay.user_email == user_email)
-                    .first()
-                )
-                if alcohol:
-                    result["alcohol_for_day"] = {
-                        "total_drinks": alcohol.total_drinks,
-                        "total_calories": alcohol.total_calories,
-                        "drinks_of_day": alcohol.drinks_of_day or [],
-                    }
-            except Exception as e:
-                logger.warning(
-                    f"Failed to fetch alcohol_for_day for {formatted_date}: {e}"
-                )
-
-            # Return raw alcohol events in range if asked later via separate function
-            if closest_weight_entry:
+            if alcohol:
+                result["alcohol_for_day"] = alcohol
+            if row.weight_time is not None:
                 result["closest_weight"] = {
-                    "time": closest_weight_entry.time,
-                    "weight": closest_weight_entry.weight,
-                    "date": closest_weight_entry.date,
+                    "time": row.weight_time,
+                    "weight": row.weight,
+                    "date": row.weight_date,
                 }
 
             logger.debug(
@@ -797,6 +1052,19 @@ def write_weight(weight, user_email: str = None):
         logger.error(f"Error writing weight to database: {e}")
 
 
+def _dish_history_item(dish):
+    return {
+        "time": dish.time,
+        "date": dish.date,
+        "dish_name": dish.dish_name,
+        "estimated_avg_calories": dish.estimated_avg_calories,
+        "total_avg_weight": dish.total_avg_weight,
+        "health_rating": _health_rating_for_output(dish.health_rating),
+        "ingredients": dish.ingredients,
+        "contains": dish.contains,
+    }
+
+
 def get_dishes(days, user_email: str = None):
     try:
         logger.debug(f"Starting get_dishes function with days={days}")
@@ -811,40 +1079,42 @@ def get_dishes(days, user_email: str = None):
                 .all()
             )
 
-            dishes_list = [
-                {
-                    "time": dish.time,
-                    "date": dish.date,
-                    "dish_name": dish.dish_name,
-                    "estimated_avg_calories": dish.estimated_avg_calories,
-                    "total_avg_weight": dish.total_avg_weight,
-                    "health_rating": _health_rating_for_output(dish.health_rating),
-                    "ingredients": dish.ingredients,
-                    "contains": dish.contains,
-                }
-                for dish in dishes
-            ]
-            return dishes_list
+            return [_dish_history_item(dish) for dish in dishes]
     except Exception as e:
         logger.error(f"Error retrieving dishes from database: {e}", exc_info=True)
         return []
 
 
+def _parse_request_date(date_str: str):
+    """Convert a dd-mm-yyyy request date to a date."""
+    day, month, year = date_str.split("-")
+    return datetime.strptime(
+        f"{year}-{month.zfill(2)}-{day.zfill(2)}", "%Y-%m-%d"
+    ).date()
+
+
+def _alcohol_event_item(ev):
+    return {
+        "time": ev.time,
+        "date": (
+            ev.date.strftime("%Y-%m-%d")
+            if isinstance(ev.date, datetime)
+            else str(ev.date)
+        ),
+        "drink_name": ev.drink_name,
+        "calories": ev.calories,
+        "quantity": ev.quantity,
+    }
+
+
 def get_alcohol_events_in_range(start_date: str, end_date: str, user_email: str = None):
     """
     Get alcohol events for a date range where dates are provided in dd-mm-yyyy format
     and converted to yyyy-mm-dd for DB filtering.
     """
     try:
-        # Convert dd-mm-yyyy to yyyy-mm-dd
-        def to_date(date_str: str):
-            day, month, year = date_str.split("-")
-            return datetime.strptime(
-                f"{year}-{month.zfill(2)}-{day.zfill(2)}", "%Y-%m-%d"
-            ).date()
-
-        start_sql = to_date(start_date)
-        end_sql = to_date(end_date)
+        start_sql = _parse_request_date(start_date)
+        end_sql = _parse_request_date(end_date)
 
         with get_db_session() as session:
             events_query = (
@@ -867,22 +1137,7 @@ def get_alcohol_events_in_range(start_date: str, end_date: str, user_email: str
                     )
                 except Exception:
                     pass
-            events = []
-            for ev in events_query:
-                events.append(
-                    {
-                        "time": ev.time,
-                        "date": (
-                            ev.date.strftime("%Y-%m-%d")
-                            if isinstance(ev.date, datetime)
-                            else str(ev.date)
-                        ),
-                        "drink_name": ev.drink_name,
-                        "calories": ev.calories,
-                        "quantity": ev.quantity,
-                    }
-                )
-            return events
+            return [_alcohol_event_item(ev) for ev in events_query]
     except Exception as e:
         logger.error(f"Error retrieving alcohol events: {e}")
         return []
@@ -902,8 +1157,6 @@ def get_food_health_level(time_value: int, user_email: str = None):
                 .first()
             )
             if dish and dish.food_health_level:
-                import json
-
                 return json.loads(dish.food_health_level)
             return None
     except Exception as e:
@@ -911,40 +1164,211 @@ def get_food_health_level(time_value: int, user_email: str = None):
         return None
 
 
+_INSERT_CHESS_GAME = text("""
+    INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
+    VALUES (:player_email, :opponent_email, :result, :timestamp)
+""")
+
+# Per-pair counters, bumped in the same transaction as the chess_games rows.
+# RETURNING hands back the new score so the caller needs no follow-up read.
+_RECORD_CHESS_PAIR = text("""
+    INSERT INTO chess_pair_stats AS s
+        (player_email, opponent_email, wins, losses, draws, last_game_timestamp)
+    VALUES (:player_email, :opponent_email, :wins, :losses, :draws, :timestamp)
+    ON CONFLICT (player_email, opponent_email) DO UPDATE SET
+        wins = s.wins + EXCLUDED.wins,
+        losses = s.losses + EXCLUDED.losses,
+        draws = s.draws + EXCLUDED.draws,
+        last_game_timestamp = GREATEST(s.last_game_timestamp, EXCLUDED.last_game_timestamp)
+    RETURNING wins, losses, draws
+""")
+
+_CHESS_PAIR_SCORE = text("""
+    SELECT wins, losses, last_game_timestamp
+    FROM chess_pair_stats
+    WHERE player_email = :user_email AND opponent_email = :opponent_email
+""")
+
+_LAST_CHESS_PAIR = text("""
+    SELECT opponent_email, wins, losses, last_game_timestamp
+    FROM chess_pair_stats
+    WHERE player_email = :user_email
+    ORDER BY last_game_timestamp DESC
+    LIMIT 1
+""")
+
+_CHESS_PAIRS = text("""
+    SELECT opponent_email, wins, losses, draws, last_game_timestamp
+    FROM chess_pair_stats
+    WHERE player_email = :user_email
+    ORDER BY last_game_timestamp DESC
+""")
+
+# Most recent games per opponent; older ones are paged through the history
+_RECENT_CHESS_GAMES = text("""
+    SELECT g.opponent_email, g.result, g.timestamp
+    FROM chess_pair_stats AS p
+    CROSS JOIN LATERAL (
+        SELECT opponent_email, result, timestamp
+        FROM chess_games
+        WHERE player_email = p.player_email AND opponent_email = p.opponent_email
+        ORDER BY timestamp DESC
+        LIMIT :per_opponent
+    ) AS g
+    WHERE p.player_email = :user_email
+    ORDER BY g.timestamp DESC
+""")
+
+CHESS_GAMES_PER_OPPONENT = int(os.getenv("CHESS_GAMES_PER_OPPONENT", "50"))
+
+
+def _chess_game_rows(player_email, opponent_email, result, timestamp):
+    """Parameters for the two chess_games rows (one per player) of a game."""
+    opponent_result = "loss" if result == "win" else ("win" if result == "loss" else "draw")
+    return [
+        {
+            "player_email": player_email,
+            "opponent_email": opponent_email,
+            "result": result,
+            "timestamp": timestamp,
+        },
+        {
+            "player_email": opponent_email,
+            "opponent_email": player_email,
+            "result": opponent_result,
+            "timestamp": timestamp,
+        },
+    ]
+
+
+def _chess_pair_params(game_row):
+    """chess_pair_stats increment for one chess_games row."""
+    return {
+        **game_row,
+        "wins": int(game_row["result"] == "win"),
+        "losses": int(game_row["result"] == "loss"),
+        "draws": int(game_row["result"] == "draw"),
+    }
+
+
+def _pairs_in_lock_order(game_rows):
+    # A fixed order keeps two concurrent games between the same players from
+    # deadlocking on each other's chess_pair_stats rows
+    return sorted(game_rows, key=lambda row: row["player_email"])
+
+
+def _recorded_chess_scores(player, opponent):
+    """Scores of both players after a game, from the RETURNING rows."""
+    return {
+        "player": {"wins": player[0], "losses": player[1], "draws": player[2]},
+        "opponent": {"wins": opponent[0], "losses": opponent[1], "draws": opponent[2]},
+    }
+
+
+def _empty_chess_stats(opponent_email=""):
+    return {"score": "0:0", "opponent_name": opponent_email, "last_game_date": "", "wins": 0, "losses": 0}
+
+
+def _chess_stats_result(opponent_email, row):
+    """Shape a (wins, losses, last_game_timestamp) pair row into chess stats."""
+    if not row:
+        return _empty_chess_stats(opponent_email)
+    wins = row[0] or 0
+    losses = row[1] or 0
+    ts = row[2]
+    last_date = ""
+    if ts:
+        try:
+            dt = datetime.fromtimestamp(int(ts) / 1000.0, tz=timezone.utc)
+            last_date = dt.strftime("%Y-%m-%d")
+        except Exception:
+            pass
+    return {
+        "score": f"{wins}:{losses}",
+        "opponent_name": opponent_email,
+        "last_game_date": last_date,
+        "wins": wins,
+        "losses": losses,
+    }
+
+
+def _all_chess_data_result(pair_rows, game_rows):
+    total_wins = sum(int(r[1] or 0) for r in pair_rows)
+    total_losses = sum(int(r[2] or 0) for r in pair_rows)
+    total_draws = sum(int(r[3] or 0) for r in pair_rows)
+
+    # Group games by opponent
+    games_by_opponent = {}
+    for g in game_rows:
+        opp = g[0]
+        ts = g[2]
+        try:
+            dt = datetime.fromtimestamp(int(ts) / 1000.0, tz=timezone.utc)
+            game_entry = {
+                "result": g[1],
+                "timestamp": ts,
+                "date": dt.strftime("%Y-%m-%d"),
+                "time": dt.strftime("%H:%M"),
+            }
+        except Exception:
+            game_entry = {"result": g[1], "timestamp": ts, "date": "", "time": ""}
+        games_by_opponent.setdefault(opp, []).append(game_entry)
+
+    opponents = {}
+    for r in pair_rows:
+        opp_email = r[0]
+        my_wins = int(r[1] or 0)
+        opp_wins = int(r[2] or 0)
+        draws = int(r[3] or 0)
+
+        last_ts = r[4]
+        last_date = ""
+        if last_ts:
+            try:
+                dt = datetime.fromtimestamp(int(last_ts) / 1000.0, tz=timezone.utc)
+                last_date = dt.strftime("%Y-%m-%d")
+            except Exception:
+                pass
+
+        opponents[opp_email] = {
+            "score": f"{my_wins}:{opp_wins}",
+            "wins": my_wins,
+            "losses": opp_wins,
+            "draws": draws,
+            "nickname": opp_email,
+            "last_game_date": last_date,
+            "games": games_by_opponent.get(opp_email, []),
+        }
+
+    return {
+        "total_wins": total_wins,
+        "total_losses": total_losses,
+        "total_draws": total_draws,
+        "opponents": opponents,
+    }
+
+
 def record_chess_game(player_email: str, opponent_email: str, result: str, timestamp: int):
-    """Record a chess game for both players (sync). result: win, loss, or draw."""
+    """Record a chess game for both players (sync). result: win, loss, or draw.
+
+    Returns both players' updated scores against each other, or None on error.
+    """
     try:
         with get_db_session() as session:
-            session.execute(
-                text("""
-                    INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
-                    VALUES (:player_email, :opponent_email, :result, :timestamp)
-                """),
-                {
-                    "player_email": player_email,
-                    "opponent_email": opponent_email,
-                    "result": result,
-                    "timestamp": timestamp,
-                },
-            )
-            opponent_result = "loss" if result == "win" else ("win" if result == "loss" else "draw")
-            session.execute(
-                text("""
-                    INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
-                    VALUES (:player_email, :opponent_email, :result, :timestamp)
-                """),
-                {
-                    "player_email": opponent_email,
-                    "opponent_email": player_email,
-                    "result": opponent_result,
-                    "timestamp": timestamp,
-                },
+            game_rows = _chess_game_rows(
+                player_email, opponent_email, result, timestamp
             )
+            session.execute(_INSERT_CHESS_GAME, game_rows)
+            scores = {}
+            for params in _pairs_in_lock_order(game_rows):
+                scores[params["player_email"]] = session.execute(
+                    _RECORD_CHESS_PAIR, _chess_pair_params(params)
+                ).one()
             session.commit()
-        return True
+        return _recorded_chess_scores(scores[player_email], scores[opponent_email])
     except Exception as e:
         logger.exception("record_chess_game failed: %s", e)
-        return False
+        return None
 
 
 def get_chess_stats_sync(user_email: str, opponent_email: Optional[str] = None):
@@ -956,54 +1380,17 @@ def get_chess_stats_sync(user_email: str, opponent_email: Optional[str] = None):
         with get_db_session() as session:
             if not opponent_email:
                 last_row = session.execute(
-                    text("""
-                        SELECT opponent_email, timestamp
-                        FROM chess_games
-                        WHERE player_email = :user_email
-                        ORDER BY timestamp DESC
-                        LIMIT 1
-                    """),
-                    {"user_email": user_email},
+                    _LAST_CHESS_PAIR, {"user_email": user_email}
                 ).fetchone()
                 if not last_row:
-                    return {"score": "0:0", "opponent_name": "", "last_game_date": "", "wins": 0, "losses": 0}
-                opponent_email = last_row[0]
-                last_ts = last_row[1]
-            else:
-                last_ts = None
-
-            result = session.execute(
-                text("""
-                    SELECT
-                        COUNT(*) FILTER (WHERE result = 'win') AS wins,
-                        COUNT(*) FILTER (WHERE result = 'loss') AS losses,
-                        MAX(timestamp) AS last_game_timestamp
-                    FROM chess_games
-                    WHERE player_email = :user_email AND opponent_email = :opponent_email
-                """),
+                    return _empty_chess_stats()
+                return _chess_stats_result(last_row[0], last_row[1:])
+
+            row = session.execute(
+                _CHESS_PAIR_SCORE,
                 {"user_email": user_email, "opponent_email": opponent_email},
-            )
-            row = result.fetchone()
-            if not row:
-                return {"score": "0:0", "opponent_name": opponent_email, "last_game_date": "", "wins": 0, "losses": 0}
-            wins = row[0] or 0
-            losses = row[1] or 0
-            ts = last_ts or row[2]
-            last_date = ""
-            if ts:
-                from datetime import datetime, timezone
-                try:
-                    dt = datetime.fromtimestamp(int(ts) / 1000.0, tz=timezone.utc)
-                    last_date = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    pass
-            return {
-                "score": f"{wins}:{losses}",
-                "opponent_name": opponent_email,
-                "last_game_date": last_date,
-                "wins": wins,
-                "losses": losses,
-            }
+            ).fetchone()
+            return _chess_stats_result(opponent_email, row)
     except Exception as e:
         logger.exception("get_chess_stats_sync failed: %s", e)
         return None
@@ -1011,99 +1398,17 @@ def get_chess_stats_sync(user_email: str, opponent_email: Optional[str] = None):
 
 def get_all_chess_data_sync(user_email: str):
     """Return total_wins, total_losses, total_draws, and detailed opponents data.
-    Each opponent entry includes score and game history with date/time."""
+    Each opponent entry includes score and its most recent games with date/time."""
     try:
         with get_db_session() as session:
-            total_row = session.execute(
-                text("""
-                    SELECT
-                        COUNT(*) FILTER (WHERE result = 'win') AS total_wins,
-                        COUNT(*) FILTER (WHERE result = 'loss') AS total_losses,
-                        COUNT(*) FILTER (WHERE result = 'draw') AS total_draws
-                    FROM chess_games
-                    WHERE player_email = :user_email
-                """),
-                {"user_email": user_email},
-            ).fetchone()
-            total_wins = int(total_row[0] or 0) if total_row else 0
-            total_losses = int(total_row[1] or 0) if total_row else 0
-            total_draws = int(total_row[2] or 0) if total_row else 0
-
-            opp_rows = session.execute(
-                text("""
-                    SELECT opponent_email,
-                           SUM(CASE WHEN result = 'win' THEN 1 ELSE 0 END) AS wins,
-                           SUM(CASE WHEN result = 'loss' THEN 1 ELSE 0 END) AS losses,
-                           SUM(CASE WHEN result = 'draw' THEN 1 ELSE 0 END) AS draws,
-                           MAX(timestamp) AS last_game_timestamp
-                    FROM chess_games
-                    WHERE player_email = :user_email
-                    GROUP BY opponent_email
-                    ORDER BY MAX(timestamp) DESC
-                """),
-                {"user_email": user_email},
+            pair_rows = session.execute(
+                _CHESS_PAIRS, {"user_email": user_email}
             ).fetchall()
-
-            # Fetch game history
             game_rows = session.execute(
-                text("""
-                    SELECT opponent_email, result, timestamp
-                    FROM chess_games
-                    WHERE player_email = :user_email
-                    ORDER BY timestamp DESC
-                """),
-                {"user_email": user_email},
+                _RECENT_CHESS_GAMES,
+                {"user_email": user_email, "per_opponent": CHESS_GAMES_PER_OPPONENT},
             ).fetchall()
-
-            # Group games by opponent
-            games_by_opponent = {}
-            for g in game_rows:
-                opp = g[0]
-                ts = g[2]
-                try:
-                    dt = datetime.fromtimestamp(int(ts) / 1000.0, tz=timezone.utc)
-                    game_entry = {
-                        "result": g[1],
-                        "timestamp": ts,
-                        "date": dt.strftime("%Y-%m-%d"),
-                        "time": dt.strftime("%H:%M"),
-                    }
-                except Exception:
-                    game_entry = {"result": g[1], "timestamp": ts, "date": "", "time": ""}
-                games_by_opponent.setdefault(opp, []).append(game_entry)
-
-            opponents = {}
-            for r in opp_rows:
-                opp_email = r[0]
-                my_wins = int(r[1] or 0)
-                opp_wins = int(r[2] or 0)
-                draws = int(r[3] or 0)
-
-                last_ts = r[4]
-                last_date = ""
-                if last_ts:
-                    try:
-                        dt = datetime.fromtimestamp(int(last_ts) / 1000.0, tz=timezone.utc)
-                        last_date = dt.strftime("%Y-%m-%d")
-                    except Exception:
-                        pass
-
-                opponents[opp_email] = {
-                    "score": f"{my_wins}:{opp_wins}",
-                    "wins": my_wins,
-                    "losses": opp_wins,
-                    "draws": draws,
-                    "nickname": opp_email,
-                    "last_game_date": last_date,
-                    "games": games_by_opponent.get(opp_email, []),
-                }
-
-            return {
-                "total_wins": total_wins,
-                "total_losses": total_losses,
-                "total_draws": total_draws,
-                "opponents": opponents,
-            }
+            return _all_chess_data_result(pair_rows, game_rows)
     except Exception as e:
         logger.exception("get_all_chess_data_sync failed: %s", e)
         return {"total_wins": 0, "total_losses": 0, "total_draws": 0, "opponents": {}}
@@ -8,31 +8,35 @@ from postgres import get_dishes, write_to_dish_day, write_weight
 logger = logging.getLogger(__name__)
 
 
+def _check_food_message(message, user_email):
+    dish_name = message.get("dish_name")
+    estimated_avg_calories = message.get("estimated_avg_calories")
+    ingredients = message.get("ingredients")
+    total_awg_weight = message.get("total_avg_weight")
+    contains = message.get("contains")
+
+    if not all(
+        [dish_name, estimated_avg_calories, ingredients, total_awg_weight, contains]
+    ):
+        logger.error(
+            f"Missing required fields in food processing for user {user_email}"
+        )
+        raise ValueError("Missing required fields in food processing")
+
+    # Ensure image_id is preserved if present in message
+    if "image_id" not in message:
+        logger.debug(f"No image_id found in message for user {user_email}")
+
+    logger.debug(
+        f"Found dish {dish_name} for user {user_email}, with {estimated_avg_calories} calories, "
+        f"contains ingredients {ingredients}, weight {total_awg_weight}, and nutrients {contains}"
+    )
+
+
 def process_food(message, user_email):
     logger.debug(f"Starting food processing for user {user_email}")
     try:
-        dish_name = message.get("dish_name")
-        estimated_avg_calories = message.get("estimated_avg_calories")
-        ingredients = message.get("ingredients")
-        total_awg_weight = message.get("total_avg_weight")
-        contains = message.get("contains")
-
-        if not all(
-            [dish_name, estimated_avg_calories, ingredients, total_awg_weight, contains]
-        ):
-            logger.error(
-                f"Missing required fields in food processing for user {user_email}"
-            )
-            raise ValueError("Missing required fields in food processing")
-
-        # Ensure image_id is preserved if present in message
-        if "image_id" not in message:
-            logger.debug(f"No image_id found in message for user {user_email}")
-
-        logger.debug(
-            f"Found dish {dish_name} for user {user_email}, with {estimated_avg_calories} calories, "
-            f"contains ingredients {ingredients}, weight {total_awg_weight}, and nutrients {contains}"
-        )
+        _check_food_message(message, user_email)
         write_to_dish_day(message=message, user_email=user_email)
         logger.debug(f"Successfully processed food for user {user_email}")
 
@@ -41,6 +45,20 @@ def process_food(message, user_email):
         raise
 
 
+async def process_food_async(message, user_email):
+    from async_postgres import write_to_dish_day_async
+
+    logger.debug(f"Starting food processing for user {user_email}")
+    try:
+        _check_food_message(message, user_email)
+        await write_to_dish_day_async(message=message, user_email=user_email)
+        logger.debug(f"Successfully processed food for user {user_email}")
+
+    except Exception as e:
+        logger.error(f"Error during food processing for user {user_email}: {str(e)}")
+        raise
+
+
 def process_weight(message, user_email):
     logger.debug(f"Starting weight processing for user {user_email}")
     try:
@@ -58,50 +76,73 @@ def process_weight(message, user_email):
         raise
 
 
-def get_recommendation(message_key, message, value_dict, user_email):
-    logger.debug(f"Received request to get recommendation for user {user_email}")
-    days = message.get("days")
+def _recommendation_request(message_key, message, value_dict, user_email, food_table):
+    """Topic and payload of the model request for get_recommendation."""
     prompt = message.get("prompt", "")
     model_topic = message.get("model_topic") or value_dict.get("value", {}).get(
         "model_topic", ""
     )
-    food_table = get_dishes(days=days, user_email=user_email)
-    id = message_key
+    if food_table:
+        # User has food data, send normal recommendation request
+        payload = {
+            "key": message_key,
+            "value": {
+                "question": str(f"{prompt} Food Table: {food_table}"),
+                "user_email": user_email,
+            },
+        }
+        logger.debug(f"model_topic for user {user_email}: {model_topic}")
+        if model_topic == "eater-send-photo-local":
+            topic = model_topic
+        else:
+            topic = "gemini-send"
+        logger.debug(f"formatted_payload for user {user_email}: {payload}")
+        return topic, payload
+
+    # No food data found for user, send specific message
+    no_food_message = "Respond with exactly this message: 'NO FOOD RECORDS FOUND FOR USER. Please record your food before using this feature.' Do not provide any additional text, analysis, or recommendations. Only respond with this exact message."
+    payload = {
+        "key": message_key,
+        "value": {
+            "question": no_food_message,
+            "user_email": user_email,
+        },
+    }
     logger.debug(
-        f"Payload for user {user_email}: {days}, {prompt}, food table {food_table}"
+        f"No food data found. Sending no-food message for user {user_email}: {payload}"
     )
+    return "gemini-send", payload
+
+
+def get_recommendation(message_key, message, value_dict, user_email):
+    logger.debug(f"Received request to get recommendation for user {user_email}")
+    days = message.get("days")
+    food_table = get_dishes(days=days, user_email=user_email)
+    logger.debug(f"Payload for user {user_email}: {days}, food table {food_table}")
 
     try:
-        if food_table:
-            # User has food data, send normal recommendation request
-            payload = {
-                "key": id,
-                "value": {
-                    "question": str(f"{prompt} Food Table: {food_table}"),
-                    "user_email": user_email,
-                },
-            }
-            logger.debug(f"model_topic for user {user_email}: {model_topic}")
-            if model_topic == "eater-send-photo-local":
-                topic = model_topic
-            else:
-                topic = "gemini-send"
-            produce_message(topic=topic, message=payload)
-            logger.debug(f"formatted_payload for user {user_email}: {payload}")
-        else:
-            # No food data found for user, send specific message
-            no_food_message = "Respond with exactly this message: 'NO FOOD RECORDS FOUND FOR USER. Please record your food before using this feature.' Do not provide any additional text, analysis, or recommendations. Only respond with this exact message."
-            payload = {
-                "key": id,
-                "value": {
-                    "question": no_food_message,
-                    "user_email": user_email,
-                },
-            }
-            produce_message(topic="gemini-send", message=payload)
-            logger.debug(
-                f"No food data found. Sent no-food message for user {user_email}: {payload}"
-            )
+        topic, payload = _recommendation_request(
+            message_key, message, value_dict, user_email, food_table
+        )
+        produce_message(topic=topic, message=payload)
+    except Exception as e:
+        logger.error(f"Error formatting payload for user {user_email}: {e}")
+        return
+
+
+async def get_recommendation_async(reply, message_key, message, value_dict, user_email):
+    from async_postgres import get_dishes_async
+
+    logger.debug(f"Received request to get recommendation for user {user_email}")
+    days = message.get("days")
+    food_table = await get_dishes_async(days=days, user_email=user_email)
+    logger.debug(f"Payload for user {user_email}: {days}, food table {food_table}")
+
+    try:
+        topic, payload = _recommendation_request(
+            message_key, message, value_dict, user_email, food_table
+        )
+        await reply(topic, payload)
     except Exception as e:
         logger.error(f"Error formatting payload for user {user_email}: {e}")
         return
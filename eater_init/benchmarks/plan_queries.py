@@ -0,0 +1,286 @@
+"""Hot queries checked by plan_regression.py.
+
+eater keeps its SQL in module-level constants, which are loaded from
+eater/postgres.py so the suite always plans the SQL that ships. eater_user
+and admin_service build theirs inline, so those are mirrored here; "source"
+names the function each one comes from and must be kept in step with it.
+
+Parameter values written as "{name}" are filled in by plan_regression.py
+from the seeded dataset (the synthetic user, today's date, a cursor, ...).
+"""
+
+import importlib.util
+import os
+from dataclasses import dataclass, field
+
+REPO_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+@dataclass
+class PlanQuery:
+    name: str
+    source: str
+    sql: str
+    params: dict
+    # Execution time budget in milliseconds at the default dataset size
+    budget_ms: float = 20.0
+    # Relations a sequential scan is expected on (small or whole-table reads)
+    allow_seq_scan: set = field(default_factory=set)
+
+
+def load_service_module(service, module_name="postgres"):
+    """Import <service>/<module>.py by path; every service has a postgres.py."""
+    path = os.path.join(REPO_ROOT, service, f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"{service}_{module_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _sql(clause):
+    """SQL string of a text() clause, including text().columns()."""
+    return getattr(clause, "element", clause).text
+
+
+def eater_queries():
+    eater = load_service_module("eater")
+    return [
+        PlanQuery(
+            "eater.today_snapshot",
+            "eater/postgres.py:get_today_dishes",
+            _sql(eater._TODAY_SNAPSHOT),
+            {"day": "{today}", "user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater.custom_date_snapshot",
+            "eater/postgres.py:get_custom_date_dishes",
+            _sql(eater._CUSTOM_DATE_SNAPSHOT),
+            {"day": "{past_day}", "user_email": "{user}", "target": "{past_ts}"},
+        ),
+        PlanQuery(
+            "eater.dishes_range",
+            "eater/postgres.py:get_dishes",
+            """
+            SELECT time, date, dish_name, estimated_avg_calories,
+                   total_avg_weight, health_rating, ingredients, contains
+            FROM public.dishes_day
+            WHERE date BETWEEN :start AND :today AND user_email = :user_email
+            """,
+            {"start": "{week_ago}", "today": "{today}", "user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater.day_totals",
+            "eater/postgres.py:write_to_dish_day",
+            """
+            SELECT sum(estimated_avg_calories), sum(total_avg_weight),
+                   array_agg(dish_name), json_agg(contains),
+                   sum(added_sugar_tsp)
+            FROM public.dishes_day
+            WHERE date = :day AND user_email = :user_email
+            """,
+            {"day": "{today}", "user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater.alcohol_range",
+            "eater/postgres.py:get_alcohol_events_in_range",
+            """
+            SELECT time, date, drink_name, calories, quantity
+            FROM public.alcohol_consumption
+            WHERE user_email = :user_email AND date BETWEEN :start AND :today
+            """,
+            {"start": "{month_ago}", "today": "{today}", "user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater.refresh_rollup",
+            "eater/postgres.py:refresh_rollups",
+            _sql(eater._REFRESH_ROLLUP),
+            {
+                "user_email": "{user}",
+                "period": "month",
+                "period_start": "{month_start}",
+                "period_end": "{month_end}",
+            },
+        ),
+        PlanQuery(
+            "eater.rollup_range",
+            "eater/postgres.py:get_nutrition_rollup",
+            _sql(eater._ROLLUP_RANGE),
+            {
+                "user_email": "{user}",
+                "period": "week",
+                "start": "{year_ago}",
+                "end": "{today}",
+            },
+        ),
+        PlanQuery(
+            "eater.chess_pair_score",
+            "eater/postgres.py:get_chess_stats_sync",
+            _sql(eater._CHESS_PAIR_SCORE),
+            {"user_email": "{user}", "opponent_email": "{opponent}"},
+        ),
+        PlanQuery(
+            "eater.last_chess_pair",
+            "eater/postgres.py:get_chess_stats_sync",
+            _sql(eater._LAST_CHESS_PAIR),
+            {"user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater.recent_chess_games",
+            "eater/postgres.py:get_all_chess_data_sync",
+            _sql(eater._RECENT_CHESS_GAMES),
+            {"user_email": "{user}", "per_opponent": eater.CHESS_GAMES_PER_OPPONENT},
+        ),
+    ]
+
+
+def eater_user_queries():
+    return [
+        PlanQuery(
+            "eater_user.autocomplete",
+            "eater_user/postgres.py:autocomplete_query",
+            """
+            SELECT email, nickname, register_date, last_activity
+            FROM "user"
+            WHERE (email ILIKE :like_query OR nickname ILIKE :like_query)
+              AND email != :user_email
+            ORDER BY
+                CASE WHEN email ILIKE :exact_query THEN 1 ELSE 2 END,
+                email
+            LIMIT 10
+            """,
+            {
+                "like_query": "%plan-1%",
+                "exact_query": "plan-1%",
+                "user_email": "{user}",
+            },
+            # nickname has no trigram index, so the OR cannot use a bitmap scan
+            allow_seq_scan={"user"},
+        ),
+        PlanQuery(
+            "eater_user.nickname",
+            "eater_user/postgres.py:get_nickname",
+            'SELECT nickname FROM "user" WHERE lower(email) = lower(:user_email)',
+            {"user_email": "{user}"},
+            budget_ms=5,
+        ),
+        PlanQuery(
+            "eater_user.nicknames",
+            "eater_user/postgres.py:get_nicknames",
+            'SELECT lower(email) AS email, nickname FROM "user" '
+            "WHERE lower(email) = ANY(:emails) AND nickname IS NOT NULL",
+            {"emails": "{opponents}"},
+            budget_ms=5,
+        ),
+        PlanQuery(
+            "eater_user.food_record_by_time",
+            "eater_user/postgres.py:get_food_record_by_time",
+            """
+            SELECT dish_name, estimated_avg_calories, ingredients, total_avg_weight,
+                   contains, health_rating, food_health_level, image_id
+            FROM public.dishes_day
+            WHERE time = :time AND user_email = :user_email
+            LIMIT 1
+            """,
+            {"time": "{dish_time}", "user_email": "{user}"},
+        ),
+        PlanQuery(
+            "eater_user.chess_history_page",
+            "eater_user/postgres.py:get_chess_history",
+            """
+            SELECT id, opponent_email, result, timestamp
+            FROM chess_games
+            WHERE player_email = :user_email
+              AND (timestamp, id) < (:before_ts, :before_id)
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 51
+            """,
+            {
+                "user_email": "{user}",
+                "before_ts": "{chess_cursor_ts}",
+                "before_id": 2147483647,
+            },
+        ),
+        PlanQuery(
+            "eater_user.chess_history_total",
+            "eater_user/postgres.py:get_chess_history",
+            """
+            SELECT COALESCE(SUM(wins + losses + draws), 0) AS total
+            FROM chess_pair_stats
+            WHERE player_email = :user_email
+            """,
+            {"user_email": "{user}"},
+        ),
+    ]
+
+
+def admin_queries():
+    admin = load_service_module("admin_service")
+    return [
+        PlanQuery(
+            "admin.feedback_page",
+            "admin_service/postgres.py:get_feedback_page",
+            """
+            SELECT id, date, user_email, feedback, created_at
+            FROM feedbacks
+            WHERE user_email != :test_user
+              AND (created_at, id) < (:before_created, :before_id)
+            ORDER BY created_at DESC, id DESC
+            LIMIT 101
+            """,
+            {
+                "test_user": admin.TEST_USER_EMAIL,
+                "before_created": "{feedback_cursor}",
+                "before_id": 2147483647,
+            },
+        ),
+        PlanQuery(
+            "admin.feedback_search",
+            "admin_service/postgres.py:get_feedback_page",
+            """
+            SELECT id, date, user_email, feedback, created_at
+            FROM feedbacks
+            WHERE user_email != :test_user
+              AND to_tsvector('simple', feedback) @@ websearch_to_tsquery('simple', :search)
+            ORDER BY created_at DESC, id DESC
+            LIMIT 101
+            """,
+            {"test_user": admin.TEST_USER_EMAIL, "search": "crash"},
+            budget_ms=50,
+        ),
+        PlanQuery(
+            "admin.user_feedback_page",
+            "admin_service/postgres.py:get_feedback_page",
+            """
+            SELECT id, date, user_email, feedback, created_at
+            FROM feedbacks
+            WHERE user_email = :user_email
+            ORDER BY created_at DESC, id DESC
+            LIMIT 101
+            """,
+            {"user_email": "{user}"},
+        ),
+        PlanQuery(
+            "admin.statistics_view",
+            "admin_service/postgres.py:get_user_statistics",
+            "SELECT * FROM admin_user_statistics",
+            {},
+            budget_ms=5,
+            # A single-row materialized view
+            allow_seq_scan={"admin_user_statistics"},
+        ),
+        PlanQuery(
+            "admin.statistics_refresh",
+            "admin_service/postgres.py:refresh_user_statistics",
+            admin._USER_STATISTICS_SELECT,
+            {},
+            budget_ms=2000,
+            # Whole-table aggregates, run in the background every few minutes
+            allow_seq_scan={"total_for_day", "dishes_day", "user"},
+        ),
+    ]
+
+
+def all_queries():
+    return eater_queries() + eater_user_queries() + admin_queries()
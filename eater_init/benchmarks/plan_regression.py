@@ -0,0 +1,452 @@
+"""Query-plan regression check for the hot queries of eater, eater_user and
+admin_service (catalogued in plan_queries.py).
+
+Creates the schema the way production does (create_tables plus the
+admin_service feedback table and statistics view), seeds a synthetic dataset
+of configurable size, then runs every query under
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) inside a transaction that is rolled
+back. A query fails when its plan contains a sequential scan over a non-empty
+relation it is not allowed to scan, or when its median execution time is
+over budget. The JSON report keeps the full plans; pass an earlier report as
+--baseline to also fail on latency regressions after a schema or index change.
+
+Needs the usual POSTGRES_* variables and a throwaway database: seeding a
+non-local host requires --force. Synthetic rows use plan-user-N@example.invalid
+and are replaced on every run.
+
+Usage: python benchmarks/plan_regression.py [--users 2000] [--days 90]
+           [--report plan_report.json] [--baseline previous.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import create_tables  # noqa: E402
+from plan_queries import all_queries, load_service_module  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+USER_PATTERN = "plan-user-%@example.invalid"
+# Dish times are UTC day start + slot * DISH_SLOT_SECONDS + user index, so
+# time stays unique while users < DISH_SLOT_SECONDS (days are generated as
+# timestamp without time zone, which dataset_context relies on)
+DISH_SLOT_SECONDS = 7200
+CHESS_OPPONENTS = 5
+
+_SYNTHETIC_ROWS = [
+    ("chess_pair_stats", "player_email"),
+    ("chess_games", "player_email"),
+    ("nutrition_rollup", "user_email"),
+    ("alcohol_for_day", "user_email"),
+    ("alcohol_consumption", "user_email"),
+    ("total_for_day", "user_email"),
+    ("dishes_day", "user_email"),
+    ("weight", "user_email"),
+    ("feedbacks", "user_email"),
+    ('"user"', "email"),
+]
+
+_SEED_STATEMENTS = [
+    """
+    INSERT INTO public."user" (email, register_date, last_activity, language, nickname)
+    SELECT 'plan-user-' || u || '@example.invalid',
+           to_char(CURRENT_DATE - :days, 'YYYY-MM-DD'),
+           to_char(CURRENT_DATE - u % 30, 'YYYY-MM-DD'),
+           'en', 'plan_' || u
+    FROM generate_series(0, :users - 1) AS u
+    """,
+    """
+    INSERT INTO public.dishes_day
+        (time, date, dish_name, estimated_avg_calories, ingredients,
+         total_avg_weight, health_rating, food_health_level, contains,
+         user_email, image_id)
+    SELECT extract(epoch FROM day)::bigint + k * :slot + u,
+           day::date, 'Dish ' || (u + k) % 50, 200 + (u * 7 + k * 13) % 500,
+           ARRAY['rice', 'chicken', 'salad'], 150 + (u + k) % 300,
+           40 + (u + k) % 60, NULL,
+           json_build_object('proteins', 20, 'fats', 10,
+                             'carbohydrates', 40, 'sugar', 5),
+           'plan-user-' || u || '@example.invalid', 'plan-image-' || k
+    FROM generate_series(0, :users - 1) AS u,
+         generate_series((CURRENT_DATE - (:days - 1))::timestamp,
+                         CURRENT_DATE::timestamp, interval '1 day') AS day,
+         generate_series(0, :dishes - 1) AS k
+    """,
+    """
+    INSERT INTO public.total_for_day
+        (date, user_email, total_calories, ingredients, dishes_of_day,
+         total_avg_weight, contains, today)
+    SELECT date, user_email, SUM(estimated_avg_calories), ARRAY['rice'],
+           array_agg(dish_name), SUM(total_avg_weight),
+           json_build_object('proteins', 20 * COUNT(*), 'fats', 10 * COUNT(*),
+                             'carbohydrates', 40 * COUNT(*), 'sugar', 5 * COUNT(*)),
+           date
+    FROM public.dishes_day
+    WHERE user_email LIKE :pattern
+    GROUP BY date, user_email
+    """,
+    """
+    INSERT INTO public.weight (time, date, weight, user_email)
+    SELECT extract(epoch FROM day)::bigint + 21600 + u,
+           to_char(day, 'YYYY-MM-DD'), 60 + u % 40 + (extract(doy FROM day) % 7) / 10.0,
+           'plan-user-' || u || '@example.invalid'
+    FROM generate_series(0, :users - 1) AS u,
+         generate_series((CURRENT_DATE - (:days - 1))::timestamp,
+                         CURRENT_DATE::timestamp, interval '1 day') AS day
+    """,
+    """
+    INSERT INTO public.alcohol_consumption
+        (time, date, drink_name, calories, quantity, user_email)
+    SELECT extract(epoch FROM day)::bigint + 20 * 3600 + u, day::date,
+           'Beer', 200, 500, 'plan-user-' || u || '@example.invalid'
+    FROM generate_series(0, :users - 1) AS u,
+         generate_series((CURRENT_DATE - (:days - 1))::timestamp,
+                         CURRENT_DATE::timestamp, interval '1 day') AS day
+    WHERE (extract(doy FROM day)::int + u) % 3 = 0
+    """,
+    """
+    INSERT INTO public.alcohol_for_day
+        (date, user_email, total_drinks, total_calories, drinks_of_day)
+    SELECT date, user_email, COUNT(*), SUM(calories), array_agg(drink_name)
+    FROM public.alcohol_consumption
+    WHERE user_email LIKE :pattern
+    GROUP BY date, user_email
+    """,
+    """
+    INSERT INTO public.nutrition_rollup
+        (user_email, period, period_start, period_end, total_calories,
+         total_avg_weight, proteins, fats, carbohydrates, sugar, dish_count,
+         days_logged, alcohol_drinks, alcohol_calories)
+    SELECT t.user_email, p.period, date_trunc(p.period, t.today)::date,
+           (date_trunc(p.period, t.today) + ('1 ' || p.period)::interval
+            - interval '1 day')::date,
+           SUM(t.total_calories), SUM(t.total_avg_weight),
+           SUM((t.contains->>'proteins')::float), SUM((t.contains->>'fats')::float),
+           SUM((t.contains->>'carbohydrates')::float),
+           SUM((t.contains->>'sugar')::float),
+           SUM(cardinality(t.dishes_of_day)), COUNT(*), 0, 0
+    FROM public.total_for_day t
+    CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+    WHERE t.user_email LIKE :pattern
+    GROUP BY t.user_email, p.period, date_trunc(p.period, t.today)
+    """,
+    # Both sides of every game, like record_chess_game
+    """
+    WITH games AS (
+        SELECT 'plan-user-' || u || '@example.invalid' AS player_email,
+               'plan-user-' || (u + j) % :users || '@example.invalid' AS opponent_email,
+               (ARRAY['win', 'loss', 'draw'])[1 + (u + j + g) % 3] AS result,
+               (extract(epoch FROM now()) * 1000)::bigint
+                   - ((g * :users + u) * :opponents + j) * 60000 AS timestamp
+        FROM generate_series(0, :users - 1) AS u,
+             generate_series(1, :opponents) AS j,
+             generate_series(0, :games - 1) AS g
+    )
+    INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
+    SELECT player_email, opponent_email, result, timestamp FROM games
+    UNION ALL
+    SELECT opponent_email, player_email,
+           CASE result WHEN 'win' THEN 'loss' WHEN 'loss' THEN 'win' ELSE 'draw' END,
+           timestamp
+    FROM games
+    """,
+    """
+    INSERT INTO chess_pair_stats
+        (player_email, opponent_email, wins, losses, draws, last_game_timestamp)
+    SELECT player_email, opponent_email,
+           COUNT(*) FILTER (WHERE result = 'win'),
+           COUNT(*) FILTER (WHERE result = 'loss'),
+           COUNT(*) FILTER (WHERE result = 'draw'),
+           MAX(timestamp)
+    FROM chess_games
+    WHERE player_email LIKE :pattern
+    GROUP BY player_email, opponent_email
+    """,
+    """
+    INSERT INTO feedbacks (date, user_email, feedback, created_at)
+    SELECT now() - i * interval '1 minute',
+           'plan-user-' || i % :users || '@example.invalid',
+           (ARRAY['App crashes when I upload a photo',
+                  'Calories for pasta look wrong',
+                  'Love the weekly chart',
+                  'Sync with my watch is slow',
+                  'Please add barcode scanning'])[1 + i % 5] || ' #' || i,
+           now() - i * interval '1 minute'
+    FROM generate_series(1, :feedbacks) AS i
+    """,
+]
+
+
+def _database_url():
+    db_user = os.environ.get("POSTGRES_USER")
+    db_password = os.environ.get("POSTGRES_PASSWORD")
+    db_host = os.environ.get("POSTGRES_HOST")
+    db_name = os.environ.get("POSTGRES_DB")
+    if not all([db_user, db_password, db_host, db_name]):
+        raise SystemExit("Missing required database environment variables")
+    return db_host, f"postgresql://{db_user}:{db_password}@{db_host}:5432/{db_name}"
+
+
+def setup_schema():
+    """Production schema: eater_init tables plus what the services add at startup."""
+    create_tables.create_tables()
+    admin = load_service_module("admin_service")
+    admin.create_feedback_table()
+    admin.create_statistics_view()
+    return admin
+
+
+def seed(engine, args):
+    params = {
+        "users": args.users,
+        "days": args.days,
+        "dishes": args.dishes_per_day,
+        "games": args.games_per_pair,
+        "opponents": CHESS_OPPONENTS,
+        "feedbacks": args.feedbacks,
+        "slot": DISH_SLOT_SECONDS,
+        "pattern": USER_PATTERN,
+    }
+    with engine.begin() as connection:
+        # Added by eater_user at startup
+        connection.execute(
+            text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS nickname TEXT')
+        )
+        for table_name in create_tables.PARTITIONED_TABLES:
+            if create_tables._relkind(connection, table_name) == "p":
+                connection.execute(
+                    text("""
+                        SELECT public.ensure_monthly_partitions(
+                            :table_name, CURRENT_DATE - :days, CURRENT_DATE
+                        )
+                    """),
+                    {"table_name": table_name, "days": args.days},
+                )
+        for table_name, column in _SYNTHETIC_ROWS:
+            connection.execute(
+                text(f"DELETE FROM {table_name} WHERE {column} LIKE :pattern"),
+                {"pattern": USER_PATTERN},
+            )
+        for statement in _SEED_STATEMENTS:
+            connection.execute(text(statement), params)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table_name, _ in _SYNTHETIC_ROWS:
+            connection.execute(text(f"ANALYZE {table_name}"))
+        connection.execute(text("REFRESH MATERIALIZED VIEW admin_user_statistics"))
+
+
+def dataset_context(engine, args):
+    """Values for the "{name}" placeholders in plan_queries."""
+    with engine.connect() as connection:
+        today, now = connection.execute(text("SELECT CURRENT_DATE, now()")).one()
+    now = now.replace(tzinfo=None)
+    past_day = today - timedelta(days=args.days // 2)
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    epoch = datetime(1970, 1, 1)
+    return {
+        "user": "plan-user-0@example.invalid",
+        "opponent": "plan-user-1@example.invalid",
+        "opponents": [
+            f"plan-user-{i}@example.invalid" for i in range(1, CHESS_OPPONENTS + 1)
+        ],
+        "today": today,
+        "past_day": past_day,
+        "past_ts": int((datetime.combine(past_day, datetime.min.time()) - epoch)
+                       .total_seconds()),
+        "week_ago": today - timedelta(days=7),
+        "month_ago": today - timedelta(days=30),
+        "year_ago": today - timedelta(days=365),
+        "month_start": month_start,
+        "month_end": next_month - timedelta(days=1),
+        # First dish of plan-user-0 today, see the dishes_day seed statement
+        "dish_time": int((datetime.combine(today, datetime.min.time()) - epoch)
+                         .total_seconds()),
+        "chess_cursor_ts": int((now - epoch).total_seconds() * 1000)
+        - args.games_per_pair * args.users * CHESS_OPPONENTS * 30000,
+        "feedback_cursor": now - timedelta(minutes=args.feedbacks // 2),
+    }
+
+
+def _resolve(params, context):
+    resolved = {}
+    for key, value in params.items():
+        if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+            value = context[value[1:-1]]
+        resolved[key] = value
+    return resolved
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _seq_scans(plan):
+    """Relations read by a sequential scan. Empty ones (a default or future
+    partition) cost nothing and are left out."""
+    return sorted(
+        {
+            node.get("Relation Name", "?")
+            for node in _walk(plan)
+            if node["Node Type"] == "Seq Scan"
+            and node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0)
+        }
+    )
+
+
+def _is_allowed(relation, allowed):
+    # Partitions are reported by their own name, e.g. dishes_day_202501
+    return any(relation == name or relation.startswith(f"{name}_") for name in allowed)
+
+
+def explain(engine, query, params, repeat):
+    """EXPLAIN ANALYZE a query `repeat` times; every run is rolled back."""
+    runs = []
+    for _ in range(repeat):
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                result = connection.execute(
+                    text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.sql),
+                    params,
+                ).scalar()
+            finally:
+                transaction.rollback()
+        runs.append(result[0] if isinstance(result, list) else json.loads(result)[0])
+    return runs
+
+
+def check_query(engine, query, context, args, baseline):
+    runs = explain(engine, query, _resolve(query.params, context), args.repeat)
+    execution_ms = statistics.median(run["Execution Time"] for run in runs)
+    plan = runs[-1]["Plan"]
+    seq_scans = _seq_scans(plan)
+    budget_ms = query.budget_ms * args.budget_scale
+
+    failures = [
+        f"sequential scan on {relation}"
+        for relation in seq_scans
+        if not _is_allowed(relation, query.allow_seq_scan)
+    ]
+    if execution_ms > budget_ms:
+        failures.append(f"{execution_ms:.2f} ms over the {budget_ms:.2f} ms budget")
+    previous = baseline.get(query.name)
+    if previous is not None:
+        limit = previous["execution_ms"] * (1 + args.tolerance)
+        if execution_ms > limit and execution_ms - previous["execution_ms"] > 1:
+            failures.append(
+                f"{execution_ms:.2f} ms vs {previous['execution_ms']:.2f} ms in baseline"
+            )
+
+    return {
+        "name": query.name,
+        "source": query.source,
+        "execution_ms": round(execution_ms, 3),
+        "planning_ms": round(statistics.median(r["Planning Time"] for r in runs), 3),
+        "budget_ms": budget_ms,
+        "shared_hit_blocks": plan.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": plan.get("Shared Read Blocks", 0),
+        "node_types": sorted({node["Node Type"] for node in _walk(plan)}),
+        "seq_scans": seq_scans,
+        "failures": failures,
+        "plan": plan,
+    }
+
+
+def _load_baseline(path):
+    if not path:
+        return {}
+    with open(path) as f:
+        return {entry["name"]: entry for entry in json.load(f)["queries"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--dishes-per-day", type=int, default=3)
+    parser.add_argument("--games-per-pair", type=int, default=4)
+    parser.add_argument("--feedbacks", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-scale", type=float, default=1.0,
+        help="multiply every query budget, e.g. for slower CI machines",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5,
+        help="allowed slowdown against --baseline (0.5 = 50%%)",
+    )
+    parser.add_argument("--report", default="plan_report.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--only", help="run only queries whose name starts with this")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the last dataset")
+    parser.add_argument("--force", action="store_true", help="allow a non-local host")
+    args = parser.parse_args()
+
+    if not 0 < args.users < DISH_SLOT_SECONDS:
+        parser.error(f"--users must be between 1 and {DISH_SLOT_SECONDS - 1}")
+    if args.dishes_per_day * DISH_SLOT_SECONDS > 86400:
+        parser.error("--dishes-per-day must be at most 12")
+
+    db_host, database_url = _database_url()
+    if db_host not in LOCAL_HOSTS and not args.force:
+        raise SystemExit(
+            f"Refusing to seed synthetic data on {db_host}; pass --force "
+            "if it is a throwaway database"
+        )
+
+    engine = create_engine(database_url)
+    baseline = _load_baseline(args.baseline)
+    if not args.skip_seed:
+        setup_schema()
+        seed(engine, args)
+    context = dataset_context(engine, args)
+
+    results = []
+    for query in all_queries():
+        if args.only and not query.name.startswith(args.only):
+            continue
+        result = check_query(engine, query, context, args, baseline)
+        results.append(result)
+        status = "FAIL" if result["failures"] else "ok"
+        print(
+            f"{status:4} {query.name:34} {result['execution_ms']:9.2f} ms "
+            f"(budget {result['budget_ms']:.0f}) "
+            f"hit={result['shared_hit_blocks']} read={result['shared_read_blocks']}"
+        )
+        for failure in result["failures"]:
+            print(f"       {failure}")
+
+    with engine.connect() as connection:
+        server_version = connection.execute(text("SHOW server_version")).scalar()
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "server_version": server_version,
+        "dataset": {
+            "users": args.users,
+            "days": args.days,
+            "dishes_per_day": args.dishes_per_day,
+            "games_per_pair": args.games_per_pair,
+            "feedbacks": args.feedbacks,
+        },
+        "queries": results,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    failed = [r["name"] for r in results if r["failures"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} queries passed; report: {args.report}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
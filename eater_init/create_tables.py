@@ -1,6 +1,7 @@
 import logging
 import os
 import time
+from datetime import date
 
 from sqlalchemy import (ARRAY, JSON, BigInteger, Column, Date, Float, ForeignKey, Integer,
                         PrimaryKeyConstraint, String, create_engine, text)
@@ -39,12 +40,13 @@ class Dishes(Base):
 
 class DishesDay(Base):
     __tablename__ = "dishes_day"
+    # Partitioned by month; the key must be part of the primary key
     __table_args__ = (
-        PrimaryKeyConstraint("time"),
-        {"schema": "public"},
+        PrimaryKeyConstraint("time", "date"),
+        {"schema": "public", "postgresql_partition_by": "RANGE (date)"},
     )
 
-    time = Column(BigInteger, primary_key=True)
+    time = Column(BigInteger, nullable=False)
     date = Column(Date, nullable=False)
     dish_name = Column(String, nullable=False)
     estimated_avg_calories = Column(Integer, nullable=False)
@@ -83,9 +85,12 @@ class Weight(Base):
 
 class AlcoholConsumption(Base):
     __tablename__ = "alcohol_consumption"
-    __table_args__ = (PrimaryKeyConstraint("time"), {"schema": "public"})
+    __table_args__ = (
+        PrimaryKeyConstraint("time", "date"),
+        {"schema": "public", "postgresql_partition_by": "RANGE (date)"},
+    )
 
-    time = Column(BigInteger, primary_key=True)
+    time = Column(BigInteger, nullable=False)
     date = Column(Date, nullable=False)
     drink_name = Column(String, nullable=False)
     calories = Column(Integer, nullable=False)
@@ -104,6 +109,205 @@ class AlcoholForDay(Base):
     drinks_of_day = Column(ARRAY(String), nullable=False)
 
 
+class NutritionRollup(Base):
+    """Per-user weekly/monthly totals, kept current by eater on every dish write."""
+
+    __tablename__ = "nutrition_rollup"
+    __table_args__ = (
+        PrimaryKeyConstraint("user_email", "period", "period_start"),
+        {"schema": "public"},
+    )
+
+    user_email = Column(String, nullable=False)
+    period = Column(String, nullable=False)  # "week" (Monday based) or "month"
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    total_calories = Column(Integer, nullable=False, default=0)
+    total_avg_weight = Column(Integer, nullable=False, default=0)
+    proteins = Column(Float, nullable=False, default=0)
+    fats = Column(Float, nullable=False, default=0)
+    carbohydrates = Column(Float, nullable=False, default=0)
+    sugar = Column(Float, nullable=False, default=0)
+    dish_count = Column(Integer, nullable=False, default=0)
+    days_logged = Column(Integer, nullable=False, default=0)
+    alcohol_drinks = Column(Integer, nullable=False, default=0)
+    alcohol_calories = Column(Integer, nullable=False, default=0)
+
+
+# Tables range-partitioned by month on "date"
+PARTITIONED_TABLES = ("dishes_day", "alcohol_consumption")
+PARTITION_MONTHS_AHEAD = int(os.getenv("EATER_PARTITION_MONTHS_AHEAD", "3"))
+# Oldest month that gets its own partition; anything older lands in _default
+PARTITION_MAX_HISTORY_MONTHS = int(os.getenv("EATER_PARTITION_MAX_HISTORY_MONTHS", "120"))
+# Converting an existing plain table locks it while rows are copied, so it
+# only happens when explicitly enabled for a maintenance window
+PARTITION_MIGRATE = os.getenv("EATER_PARTITION_MIGRATE", "false").lower() == "true"
+
+# Creates the DEFAULT partition and one partition per month in
+# [first_month, last_month]. Rows that landed in DEFAULT (a month without a
+# partition at write time) are moved before the new partition is attached.
+# eater calls this periodically, so future months always exist.
+ENSURE_MONTHLY_PARTITIONS_SQL = """
+CREATE OR REPLACE FUNCTION public.ensure_monthly_partitions(
+    parent TEXT, first_month DATE, last_month DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', first_month)::date;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS public.%I PARTITION OF public.%I DEFAULT',
+        parent || '_default', parent
+    );
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := parent || '_' || to_char(month_start, 'YYYYMM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)',
+                partition_name, parent
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.%I WHERE date >= %L AND date < %L RETURNING *) INSERT INTO public.%I SELECT * FROM moved',
+                parent || '_default', month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                parent, partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _relkind(connection, table_name):
+    """'p' for a partitioned table, 'r' for a plain one, None if missing."""
+    return connection.execute(
+        text("""
+            SELECT c.relkind FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = :table_name
+        """),
+        {"table_name": table_name},
+    ).scalar()
+
+
+def _ensure_partitions(connection, table_name, first_month):
+    created = connection.execute(
+        text("""
+            SELECT public.ensure_monthly_partitions(
+                :table_name, CAST(:first_month AS date),
+                (CURRENT_DATE + make_interval(months => :ahead))::date
+            )
+        """),
+        {
+            "table_name": table_name,
+            "first_month": first_month,
+            "ahead": PARTITION_MONTHS_AHEAD,
+        },
+    ).scalar()
+    logger.info(f"{table_name}: {created} monthly partitions created")
+
+
+# Postgres silently truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def _backup_table_name(table_name):
+    return f"{table_name}_unpartitioned"
+
+
+def _backup_index_name(index_name, n):
+    """Short name freeing index_name; n keeps truncated names distinct."""
+    return f"{index_name[:40]}_old_{n}"
+
+
+def _migrate_to_partitioned(engine, table_name):
+    """Swap a plain table for a partitioned copy in one transaction.
+
+    The old table is kept as <table>_unpartitioned (its indexes renamed to
+    <index>_old_<n> to free their names) so it can be checked and dropped by
+    hand afterwards.
+    """
+    backup = _backup_table_name(table_name)
+    with engine.begin() as connection:
+        connection.execute(
+            text(f"LOCK TABLE public.{table_name} IN ACCESS EXCLUSIVE MODE")
+        )
+        # The admin statistics view reads dishes_day; admin_service
+        # recreates it against the new table
+        connection.execute(
+            text("DROP MATERIALIZED VIEW IF EXISTS public.admin_user_statistics")
+        )
+        connection.execute(text(f"ALTER TABLE public.{table_name} RENAME TO {backup}"))
+        index_names = connection.execute(
+            text("""
+                SELECT indexname FROM pg_indexes
+                WHERE schemaname = 'public' AND tablename = :backup
+            """),
+            {"backup": backup},
+        ).scalars().all()
+        for n, index_name in enumerate(index_names, start=1):
+            connection.execute(
+                text(
+                    f'ALTER INDEX public."{index_name}" '
+                    f'RENAME TO "{_backup_index_name(index_name, n)}"'
+                )
+            )
+
+        # LIKE keeps every column, including ones added after the ORM model
+        connection.execute(text(f"""
+            CREATE TABLE public.{table_name} (LIKE public.{backup} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (date)
+        """))
+        connection.execute(
+            text(f"ALTER TABLE public.{table_name} ADD PRIMARY KEY (time, date)")
+        )
+        oldest = connection.execute(
+            text(f"""
+                SELECT GREATEST(
+                    MIN(date),
+                    (CURRENT_DATE - make_interval(months => :history))::date
+                )
+                FROM public.{backup}
+            """),
+            {"history": PARTITION_MAX_HISTORY_MONTHS},
+        ).scalar()
+        _ensure_partitions(connection, table_name, oldest or date.today())
+        copied = connection.execute(
+            text(f"INSERT INTO public.{table_name} SELECT * FROM public.{backup}")
+        ).rowcount
+    logger.info(
+        f"{table_name} converted to monthly partitions ({copied} rows copied); "
+        f"drop public.{backup} once verified"
+    )
+
+
+def setup_partitioning(engine, connection):
+    """Create monthly partitions, converting plain tables when enabled."""
+    connection.execute(text(ENSURE_MONTHLY_PARTITIONS_SQL))
+    for table_name in PARTITIONED_TABLES:
+        relkind = _relkind(connection, table_name)
+        if relkind == "p":
+            # Keep the current month; older months already exist
+            _ensure_partitions(connection, table_name, date.today())
+        elif relkind == "r" and PARTITION_MIGRATE:
+            logger.info(f"Converting {table_name} to a partitioned table...")
+            _migrate_to_partitioned(engine, table_name)
+        elif relkind == "r":
+            logger.warning(
+                f"{table_name} is not partitioned; set EATER_PARTITION_MIGRATE=true "
+                "to convert it during a maintenance window"
+            )
+
+
 def verify_indexes(connection):
     """Verify that all expected indexes were created successfully"""
     try:
@@ -140,6 +344,7 @@ def verify_indexes(connection):
                 "idx_users_email",
                 "idx_users_last_activity",
                 "idx_users_register_date",
+                "idx_users_email_lower",
             ]
             logger.info("Verifying user table indexes...")
             for index_name in user_indexes:
@@ -391,6 +596,98 @@ def create_tables():
             except Exception as e:
                 logger.warning(f"Failed to create chess_games table: {e}")
 
+            # Per-pair chess counters, updated with every recorded game so stats
+            # reads are a primary-key lookup instead of aggregating chess_games
+            logger.info("Creating chess_pair_stats table...")
+            try:
+                connection.execute(text("""
+                    CREATE TABLE IF NOT EXISTS chess_pair_stats (
+                        player_email TEXT NOT NULL,
+                        opponent_email TEXT NOT NULL,
+                        wins INTEGER NOT NULL DEFAULT 0,
+                        losses INTEGER NOT NULL DEFAULT 0,
+                        draws INTEGER NOT NULL DEFAULT 0,
+                        last_game_timestamp BIGINT NOT NULL,
+                        PRIMARY KEY (player_email, opponent_email)
+                    )
+                """))
+                connection.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_chess_pair_last_game ON chess_pair_stats(player_email, last_game_timestamp DESC)"
+                ))
+                # Keyset pagination of a player's history, and recent games per pair
+                connection.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_chess_player_history ON chess_games(player_email, timestamp DESC, id DESC)"
+                ))
+                connection.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_chess_pair_history ON chess_games(player_email, opponent_email, timestamp DESC)"
+                ))
+                # Backfill pairs that have games but no counters yet
+                result = connection.execute(text("""
+                    INSERT INTO chess_pair_stats
+                        (player_email, opponent_email, wins, losses, draws, last_game_timestamp)
+                    SELECT player_email, opponent_email,
+                           COUNT(*) FILTER (WHERE result = 'win'),
+                           COUNT(*) FILTER (WHERE result = 'loss'),
+                           COUNT(*) FILTER (WHERE result = 'draw'),
+                           MAX(timestamp)
+                    FROM chess_games
+                    GROUP BY player_email, opponent_email
+                    ON CONFLICT (player_email, opponent_email) DO NOTHING
+                """))
+                logger.info(
+                    f"chess_pair_stats table ready ({result.rowcount} pairs backfilled)"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create chess_pair_stats table: {e}")
+
+            # Backfill nutrition_rollup from the per-day tables. Only periods
+            # without a row are inserted; eater refreshes them from then on.
+            logger.info("Backfilling nutrition_rollup...")
+            try:
+                result = connection.execute(text("""
+                    WITH periods(period) AS (VALUES ('week'), ('month')),
+                    food AS (
+                        SELECT t.user_email, p.period,
+                               date_trunc(p.period, t.today)::date AS period_start,
+                               SUM(t.total_calories) AS total_calories,
+                               SUM(t.total_avg_weight) AS total_avg_weight,
+                               SUM(COALESCE((t.contains->>'proteins')::float, 0)) AS proteins,
+                               SUM(COALESCE((t.contains->>'fats')::float, 0)) AS fats,
+                               SUM(COALESCE((t.contains->>'carbohydrates')::float, 0)) AS carbohydrates,
+                               SUM(COALESCE((t.contains->>'sugar')::float, 0)) AS sugar,
+                               SUM(COALESCE(cardinality(t.dishes_of_day), 0)) AS dish_count,
+                               COUNT(*) AS days_logged
+                        FROM public.total_for_day t CROSS JOIN periods p
+                        GROUP BY 1, 2, 3
+                    ),
+                    alcohol AS (
+                        SELECT a.user_email, p.period,
+                               date_trunc(p.period, a.date)::date AS period_start,
+                               SUM(a.total_drinks) AS alcohol_drinks,
+                               SUM(a.total_calories) AS alcohol_calories
+                        FROM public.alcohol_for_day a CROSS JOIN periods p
+                        GROUP BY 1, 2, 3
+                    )
+                    INSERT INTO public.nutrition_rollup (
+                        user_email, period, period_start, period_end,
+                        total_calories, total_avg_weight, proteins, fats,
+                        carbohydrates, sugar, dish_count, days_logged,
+                        alcohol_drinks, alcohol_calories
+                    )
+                    SELECT user_email, period, period_start,
+                           (period_start + ('1 ' || period)::interval - interval '1 day')::date,
+                           COALESCE(total_calories, 0), COALESCE(total_avg_weight, 0),
+                           COALESCE(proteins, 0), COALESCE(fats, 0),
+                           COALESCE(carbohydrates, 0), COALESCE(sugar, 0),
+                           COALESCE(dish_count, 0), COALESCE(days_logged, 0),
+                           COALESCE(alcohol_drinks, 0), COALESCE(alcohol_calories, 0)
+                    FROM food FULL JOIN alcohol USING (user_email, period, period_start)
+                    ON CONFLICT (user_email, period, period_start) DO NOTHING
+                """))
+                logger.info(f"nutrition_rollup backfilled ({result.rowcount} rows)")
+            except Exception as e:
+                logger.warning(f"Failed to backfill nutrition_rollup: {e}")
+
             # Ensure all required columns exist in each table
             logger.info("Checking and adding required columns...")
             try:
@@ -451,6 +748,14 @@ def create_tables():
                 logger.error(f"Error during column checks: {str(e)}")
                 raise
 
+            # Monthly partitions for dishes_day and alcohol_consumption
+            logger.info("Setting up table partitions...")
+            try:
+                setup_partitioning(engine, connection)
+            except Exception as e:
+                logger.error(f"Error during partition setup: {str(e)}")
+                raise
+
             # Create indexes after ensuring columns exist
             logger.info("Creating indexes...")
             try:
@@ -509,6 +814,12 @@ def create_tables():
                                 "CREATE INDEX IF NOT EXISTS idx_users_register_date ON public.user USING btree(register_date);"
                             )
                         )
+                        # eater_user looks users up by lower(email)
+                        connection.execute(
+                            text(
+                                "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON public.user USING btree(lower(email));"
+                            )
+                        )
                         logger.info("User table indexes created successfully")
                     except Exception as e:
                         logger.warning(f"Failed to create user table indexes: {e}")
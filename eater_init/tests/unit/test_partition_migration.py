@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+import create_tables  # noqa: E402
+
+
+class MigrationIdentifierTest(unittest.TestCase):
+    """Names generated by the partition migration must fit Postgres's limit."""
+
+    INDEX_NAMES = [
+        "idx_alcohol_consumption_user_email",
+        "idx_alcohol_consumption_user_time",
+        "idx_dishes_day_user_email",
+        "alcohol_consumption_pkey",
+        "x" * create_tables.MAX_IDENTIFIER_LENGTH,
+    ]
+
+    def assertFits(self, name):
+        self.assertLessEqual(
+            len(name), create_tables.MAX_IDENTIFIER_LENGTH, f"{name} is too long"
+        )
+
+    def test_tables_fit(self):
+        for table_name in create_tables.PARTITIONED_TABLES:
+            self.assertFits(create_tables._backup_table_name(table_name))
+            self.assertFits(f"{table_name}_default")
+            self.assertFits(f"{table_name}_209912")
+
+    def test_backup_indexes_fit_and_stay_distinct(self):
+        names = [
+            create_tables._backup_index_name(index_name, n)
+            for n, index_name in enumerate(self.INDEX_NAMES * 200, start=1)
+        ]
+        for name in names:
+            self.assertFits(name)
+        self.assertEqual(len(names), len(set(names)))
+
+
+if __name__ == "__main__":
+    unittest.main()
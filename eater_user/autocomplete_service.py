@@ -6,11 +6,13 @@ import uuid
 import time
 
 
+import chess_leaderboard
 import uvicorn
-from common import token_required, validate_websocket_token
+from common import debug_access, token_required, validate_websocket_token
 from connection_manager import manager, safe_send_websocket_message
-from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import Response
+from fastapi import (Depends, FastAPI, HTTPException, Request, WebSocket,
+                     WebSocketDisconnect)
+from fastapi.responses import FileResponse, Response
 from kafka_producer import produce_message
 from dev_utils import get_topic_name
 from logging_config import setup_logging
@@ -30,7 +32,11 @@ from postgres import (
     get_chess_stats,
     get_all_chess_data,
     get_chess_history,
+    get_nicknames,
+    parse_chess_history_cursor,
 )
+from profiling import (artifact_path, diff_snapshots, list_artifacts, profiler,
+                       stop_tracemalloc, take_snapshot)
 from proto import add_friend_pb2, get_friends_pb2, share_food_pb2
 from starlette.websockets import WebSocketState
 
@@ -80,12 +86,17 @@ async def startup():
         await ensure_nickname_column()
     except Exception:
         logger.warning("Could not ensure nickname column")
+    try:
+        await chess_leaderboard.ensure_leaderboard(database)
+    except Exception as e:
+        logger.warning(f"Could not rebuild chess leaderboard: {e}")
 
 
 @app.on_event("shutdown")
 async def shutdown():
     await database.disconnect()
     neo4j_connection.close()
+    await chess_leaderboard.close()
 
 
 @app.get("/health")
@@ -106,6 +117,56 @@ async def readiness_check():
         raise HTTPException(status_code=503, detail="Service not ready")
 
 
+# Live profiling and leak hunting, see profiling.py
+@app.post("/debug/profile/start", dependencies=[Depends(debug_access)])
+def debug_profile_start(seconds: float = None):
+    if not profiler.start(seconds):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    return {"status": "started"}
+
+
+@app.post("/debug/profile/stop", dependencies=[Depends(debug_access)])
+def debug_profile_stop():
+    path = profiler.stop()
+    if path is None:
+        raise HTTPException(status_code=404, detail="No profile running")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
+
+
+@app.get("/debug/profiles", dependencies=[Depends(debug_access)])
+def debug_profiles():
+    return {"profiling": profiler.running, "files": list_artifacts()}
+
+
+@app.get("/debug/profiles/{name}", dependencies=[Depends(debug_access)])
+def debug_profile_file(name: str):
+    try:
+        return FileResponse(artifact_path(name), filename=name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+
+
+@app.post("/debug/tracemalloc/snapshot", dependencies=[Depends(debug_access)])
+def debug_tracemalloc_snapshot(limit: int = 25):
+    return take_snapshot(limit)
+
+
+@app.get("/debug/tracemalloc/diff", dependencies=[Depends(debug_access)])
+def debug_tracemalloc_diff(first: str = None, second: str = None, limit: int = 25):
+    try:
+        return diff_snapshots(first, second, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+
+@app.post("/debug/tracemalloc/stop", dependencies=[Depends(debug_access)])
+def debug_tracemalloc_stop():
+    stop_tracemalloc()
+    return {"status": "stopped"}
+
+
 @app.post(
     "/autocomplete/addfriend",
     responses={200: {"content": {"application/x-protobuf": {}}}},
@@ -646,20 +707,20 @@ async def record_chess_game_endpoint(request: Request, user_email: str):
                 status_code=400, detail="result must be win, loss, or draw"
             )
 
-        ok = await record_chess_game(player_email, opponent_email, result, timestamp)
-        if not ok:
+        # Updated head-to-head counters come back from the same transaction
+        scores = await record_chess_game(
+            player_email, opponent_email, result, timestamp
+        )
+        if not scores:
             raise HTTPException(status_code=500, detail="Failed to record game")
-
-        # Fetch updated stats for both players against each other
-        player_stats = await get_chess_stats(player_email, opponent_email)
-        opponent_stats = await get_chess_stats(opponent_email, player_email)
+        await chess_leaderboard.record_game(player_email, opponent_email, result)
 
         return {
             "success": True,
-            "player_wins": (player_stats or {}).get("wins", 0),
-            "player_losses": (player_stats or {}).get("losses", 0),
-            "opponent_wins": (opponent_stats or {}).get("wins", 0),
-            "opponent_losses": (opponent_stats or {}).get("losses", 0),
+            "player_wins": scores["player"]["wins"],
+            "player_losses": scores["player"]["losses"],
+            "opponent_wins": scores["opponent"]["wins"],
+            "opponent_losses": scores["opponent"]["losses"],
         }
 
     except HTTPException:
@@ -724,22 +785,75 @@ async def get_all_chess_data_endpoint(request: Request, user_email: str):
 @token_required
 async def get_chess_history_endpoint(request: Request, user_email: str):
     """Get paginated game history for the authenticated user.
-    Query params: limit (default 50), offset (default 0).
-    Returns {games: [{opponent_email, opponent_nickname, result, date, time, timestamp}], total, limit, offset}.
+    Query params: limit (default 50), cursor (next_cursor of the previous page),
+    offset (default 0, only used without a cursor).
+    Returns {games: [{opponent_email, opponent_nickname, result, date, time, timestamp}], total, limit, offset, next_cursor}.
     """
     try:
         limit = int(request.query_params.get("limit", 50))
         offset = int(request.query_params.get("offset", 0))
         limit = min(max(limit, 1), 200)  # clamp to 1-200
         offset = max(offset, 0)
+        cursor = request.query_params.get("cursor") or None
+        if cursor:
+            try:
+                parse_chess_history_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
 
-        data = await get_chess_history(user_email, limit=limit, offset=offset)
+        data = await get_chess_history(
+            user_email, limit=limit, cursor=cursor, offset=offset
+        )
         return data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("get_chess_history_endpoint failed: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.get("/autocomplete/get_chess_leaderboard")
+@token_required
+async def get_chess_leaderboard_endpoint(request: Request, user_email: str):
+    """Chess leaderboard plus the authenticated user's own position.
+    Query params: board (elo | win_rate, default elo), scope (global | friends,
+    default global), limit (default 10, global scope only).
+    Returns {board, scope, entries: [{rank, email, nickname, <board>}], me}.
+    """
+    try:
+        board = request.query_params.get("board", "elo")
+        scope = request.query_params.get("scope", "global")
+        limit = int(request.query_params.get("limit", 10))
+        limit = min(max(limit, 1), 100)  # clamp to 1-100
+        if board not in chess_leaderboard.BOARDS:
+            raise HTTPException(status_code=400, detail="board must be elo or win_rate")
+        if scope not in ("global", "friends"):
+            raise HTTPException(
+                status_code=400, detail="scope must be global or friends"
+            )
+
+        if scope == "friends":
+            friends = neo4j_connection.get_user_friends(user_email)
+            entries = await chess_leaderboard.get_friends_board(
+                user_email, friends, board
+            )
+            me = next((e for e in entries if e["email"] == user_email), None)
+        else:
+            entries = await chess_leaderboard.get_top(board, limit)
+            me = await chess_leaderboard.get_rank(user_email, board)
+
+        nicknames = await get_nicknames([e["email"] for e in entries])
+        for entry in entries:
+            entry["nickname"] = nicknames.get(entry["email"]) or entry["email"]
+
+        return {"board": board, "scope": scope, "entries": entries, "me": me}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("get_chess_leaderboard_endpoint failed: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
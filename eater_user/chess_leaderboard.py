@@ -0,0 +1,154 @@
+"""Chess leaderboard kept in Redis sorted sets.
+
+Every recorded game updates both players' Elo rating and win rate in one
+Lua script, so "top N" and "my rank" are O(log N) sorted-set reads instead
+of a GROUP BY over chess_games. Postgres stays the source of truth: when
+the ratings key is missing (new Redis, eviction) the board is rebuilt by
+replaying chess_games through the same script.
+"""
+
+import logging
+import os
+
+import redis.asyncio as redis
+from chess_ratings import (ELO_KEY, RECORD_GAME_LUA, REBUILD_LOCK_KEY,
+                           WIN_RATE_KEY, script_call, stats_key)
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_ENDPOINT")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+
+CHESS_REBUILD_BATCH = 500
+BOARDS = {"elo": ELO_KEY, "win_rate": WIN_RATE_KEY}
+
+_client = None
+_record_script = None
+
+
+def get_client():
+    global _client, _record_script
+    if _client is None:
+        _client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=5,
+            socket_connect_timeout=2,
+            decode_responses=True,
+        )
+        _record_script = _client.register_script(RECORD_GAME_LUA)
+    return _client
+
+
+async def record_game(player_email: str, opponent_email: str, result: str):
+    """Apply one game to the leaderboard. Errors are logged, not raised:
+    the game is already committed in Postgres and a rebuild will catch up."""
+    if not REDIS_HOST:
+        return
+    try:
+        get_client()
+        await _record_script(**script_call(player_email, opponent_email, result))
+    except Exception as e:
+        logger.warning("Failed to update chess leaderboard: %s", e)
+
+
+def _board_key(board):
+    key = BOARDS.get(board)
+    if key is None:
+        raise ValueError(f"Unknown leaderboard: {board}")
+    return key
+
+
+def _entry(rank, email, score, board):
+    value = round(score) if board == "elo" else round(score, 4)
+    return {"rank": rank, "email": email, board: value}
+
+
+async def get_top(board: str = "elo", limit: int = 10):
+    """Top `limit` players of a board, best first."""
+    key = _board_key(board)
+    rows = await get_client().zrevrange(key, 0, limit - 1, withscores=True)
+    return [
+        _entry(rank, email, score, board)
+        for rank, (email, score) in enumerate(rows, start=1)
+    ]
+
+
+async def get_rank(user_email: str, board: str = "elo"):
+    """1-based global rank of a player, or None if they are not on the board."""
+    key = _board_key(board)
+    pipe = get_client().pipeline(transaction=False)
+    pipe.zrevrank(key, user_email)
+    pipe.zscore(key, user_email)
+    pipe.zcard(key)
+    rank, score, size = await pipe.execute()
+    if rank is None:
+        return None
+    entry = _entry(rank + 1, user_email, score, board)
+    entry["players"] = size
+    return entry
+
+
+async def get_friends_board(user_email: str, friend_emails, board: str = "elo"):
+    """Ranking of a user and their friends, reading only those members."""
+    key = _board_key(board)
+    members = list(dict.fromkeys([user_email, *friend_emails]))
+    scores = await get_client().zmscore(key, members)
+    ranked = sorted(
+        ((email, score) for email, score in zip(members, scores) if score is not None),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return [
+        _entry(rank, email, score, board)
+        for rank, (email, score) in enumerate(ranked, start=1)
+    ]
+
+
+async def ensure_leaderboard(database):
+    """Rebuild the board from chess_games if Redis has no ratings.
+
+    Each game is stored once per side, so only the row whose player sorts
+    first is replayed, in (timestamp, id) order to reproduce the ratings.
+    A short-lived lock keeps replicas from rebuilding at the same time.
+    """
+    client = get_client()
+    if await client.exists(ELO_KEY):
+        return
+    if not await client.set(REBUILD_LOCK_KEY, "1", nx=True, ex=600):
+        return
+    try:
+        rows = await database.fetch_all(
+            """
+            SELECT player_email, opponent_email, result
+            FROM chess_games
+            WHERE player_email < opponent_email
+            ORDER BY timestamp, id
+            """
+        )
+        # Counters that outlived the ratings key would be counted twice
+        players = {row["player_email"] for row in rows}
+        players.update(row["opponent_email"] for row in rows)
+        stale = [stats_key(email) for email in players]
+        if stale:
+            await client.delete(WIN_RATE_KEY, *stale)
+        for start in range(0, len(rows), CHESS_REBUILD_BATCH):
+            pipe = client.pipeline(transaction=False)
+            for row in rows[start : start + CHESS_REBUILD_BATCH]:
+                await _record_script(
+                    **script_call(
+                        row["player_email"], row["opponent_email"], row["result"]
+                    ),
+                    client=pipe,
+                )
+            await pipe.execute()
+        logger.info("Rebuilt chess leaderboard from %d games", len(rows))
+    finally:
+        await client.delete(REBUILD_LOCK_KEY)
+
+
+async def close():
+    if _client is not None:
+        await _client.aclose()
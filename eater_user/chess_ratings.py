@@ -0,0 +1,76 @@
+# Shared module: edit shared/chess_ratings.py and run shared/sync.sh
+"""Chess leaderboard keys and the Lua script that applies one game.
+
+Shared by eater, which records games arriving over Kafka, and eater_user,
+which records games over HTTP, serves the boards and rebuilds them. Keys
+carry the _dev: prefix in dev, since both environments share one Redis.
+"""
+
+import os
+
+from dev_utils import get_redis_key
+
+CHESS_ELO_K = float(os.getenv("CHESS_ELO_K", "32"))
+CHESS_ELO_INITIAL = float(os.getenv("CHESS_ELO_INITIAL", "1200"))
+# Players enter the win-rate board only after this many games
+CHESS_WIN_RATE_MIN_GAMES = int(os.getenv("CHESS_WIN_RATE_MIN_GAMES", "5"))
+
+ELO_KEY = get_redis_key("chess:leaderboard:elo")
+WIN_RATE_KEY = get_redis_key("chess:leaderboard:win_rate")
+REBUILD_LOCK_KEY = get_redis_key("chess:leaderboard:rebuild")
+
+# KEYS: elo zset, win-rate zset, player stats hash, opponent stats hash
+# ARGV: player, opponent, player's score (1 win, 0.5 draw, 0 loss),
+#       K factor, initial rating, min games for the win-rate board
+RECORD_GAME_LUA = """
+local k = tonumber(ARGV[4])
+local initial = tonumber(ARGV[5])
+local min_games = tonumber(ARGV[6])
+local ra = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]) or initial)
+local rb = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[2]) or initial)
+local sa = tonumber(ARGV[3])
+local delta = k * (sa - 1 / (1 + 10 ^ ((rb - ra) / 400)))
+redis.call('ZADD', KEYS[1], ra + delta, ARGV[1])
+redis.call('ZADD', KEYS[1], rb - delta, ARGV[2])
+
+local function bump(stats_key, member, score)
+  local field = 'draws'
+  if score == 1 then field = 'wins' elseif score == 0 then field = 'losses' end
+  redis.call('HINCRBY', stats_key, field, 1)
+  local s = redis.call('HMGET', stats_key, 'wins', 'losses', 'draws')
+  local wins = tonumber(s[1] or 0)
+  local games = wins + tonumber(s[2] or 0) + tonumber(s[3] or 0)
+  if games >= min_games then
+    redis.call('ZADD', KEYS[2], wins / games, member)
+  end
+end
+bump(KEYS[3], ARGV[1], sa)
+bump(KEYS[4], ARGV[2], 1 - sa)
+return {tostring(ra + delta), tostring(rb - delta)}
+"""
+
+RESULT_SCORES = {"win": 1, "draw": 0.5, "loss": 0}
+
+
+def stats_key(email):
+    return get_redis_key(f"chess:stats:{email}")
+
+
+def script_call(player_email, opponent_email, result):
+    """keys and args for RECORD_GAME_LUA applying one game."""
+    return {
+        "keys": [
+            ELO_KEY,
+            WIN_RATE_KEY,
+            stats_key(player_email),
+            stats_key(opponent_email),
+        ],
+        "args": [
+            player_email,
+            opponent_email,
+            RESULT_SCORES[result],
+            CHESS_ELO_K,
+            CHESS_ELO_INITIAL,
+            CHESS_WIN_RATE_MIN_GAMES,
+        ],
+    }
@@ -4,6 +4,7 @@ from functools import wraps
 
 import jwt
 from fastapi import HTTPException, Request
+from profiling import DEBUG_TOKEN_HEADER, debug_token_valid
 
 SECRET_KEY = os.getenv("JWT_SECRET")
 
@@ -67,6 +68,12 @@ def token_required(f):
     return wrapper
 
 
+def debug_access(request: Request) -> None:
+    """Dependency for the debug endpoints: requires the X-Debug-Token header."""
+    if not debug_token_valid(request.headers.get(DEBUG_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
 async def validate_websocket_token(websocket, auth_data: str) -> str:
     try:
         auth_message = json.loads(auth_data)
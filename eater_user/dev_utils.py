@@ -70,3 +70,18 @@ def get_kafka_group_id(base_group_id: str) -> str:
     if is_dev_environment():
         return f"{base_group_id}-dev"
     return base_group_id
+
+
+def get_redis_key(base_key: str) -> str:
+    """
+    Get the Redis key with the _dev: prefix for dev environment.
+
+    Args:
+        base_key: The base key (e.g., "chess:leaderboard:elo")
+
+    Returns:
+        Key prefixed with _dev: if IS_DEV=true, otherwise the base key
+    """
+    if is_dev_environment():
+        return f"_dev:{base_key}"
+    return base_key
@@ -101,14 +101,17 @@ def consume_messages(topics, expected_user_email=None):
 
         try:
             message_data = json.loads(msg.value())
-            logger.debug(f"Received message: {message_data}")
+            logger.debug("Received message: %s", message_data)
             if not validate_user_data(message_data, expected_user_email):
-                logger.warning(f"Skipping message for unexpected user: {message_data}")
+                logger.warning("Skipping message for unexpected user: %s", message_data)
                 continue
 
             user_email = message_data.get("value", {}).get("user_email", "unknown")
             logger.info(
-                f"Consumed message for user {user_email}: {msg.key()} - {msg.value()}"
+                "Consumed message for user %s: %s - %s",
+                user_email,
+                msg.key(),
+                message_data,
             )
             yield msg, consumer
         except json.JSONDecodeError as e:
@@ -277,141 +277,168 @@ async def get_food_record_by_time(time: int, user_email: str):
 
 # MARK: - Chess Games Functions
 
+# Most recent games per opponent in get_all_chess_data; the rest is paged
+# through get_chess_history
+CHESS_GAMES_PER_OPPONENT = int(os.getenv("CHESS_GAMES_PER_OPPONENT", "50"))
+
+
+async def get_nicknames(emails):
+    """Nicknames for several users in one query, keyed by the given email."""
+    if not emails:
+        return {}
+    try:
+        rows = await database.fetch_all(
+            'SELECT lower(email) AS email, nickname FROM "user" '
+            "WHERE lower(email) = ANY(:emails) AND nickname IS NOT NULL",
+            values={"emails": [email.lower() for email in emails]},
+        )
+        by_lower = {row["email"]: row["nickname"] for row in rows}
+        return {
+            email: by_lower[email.lower()]
+            for email in emails
+            if by_lower.get(email.lower())
+        }
+    except Exception:
+        return {}
+
+
+def _format_game_time(timestamp):
+    import datetime as _dt
+
+    dt = _dt.datetime.fromtimestamp(timestamp / 1000, tz=_dt.timezone.utc)
+    return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M")
+
 
 async def record_chess_game(
     player_email: str, opponent_email: str, result: str, timestamp: int
 ):
     """
-    Record a chess game for both players.
+    Record a chess game for both players and bump their chess_pair_stats.
     result: "win", "loss", or "draw"
+    Returns {"player": {...}, "opponent": {...}} with the updated wins, losses
+    and draws of each side against the other, or None on failure.
     """
     try:
-        # Record game for player
-        query_player = """
-        INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
-        VALUES (:player_email, :opponent_email, :result, :timestamp)
-        """
-        await database.execute(
-            query_player,
-            values={
+        opponent_result = (
+            "loss" if result == "win" else ("win" if result == "loss" else "draw")
+        )
+        games = [
+            {
                 "player_email": player_email,
                 "opponent_email": opponent_email,
                 "result": result,
                 "timestamp": timestamp,
             },
-        )
-
-        # Record mirror game for opponent
-        opponent_result = (
-            "loss" if result == "win" else ("win" if result == "loss" else "draw")
-        )
-        query_opponent = """
-        INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
-        VALUES (:player_email, :opponent_email, :result, :timestamp)
-        """
-        await database.execute(
-            query_opponent,
-            values={
+            {
                 "player_email": opponent_email,
                 "opponent_email": player_email,
                 "result": opponent_result,
                 "timestamp": timestamp,
             },
-        )
+        ]
+        scores = {}
+        async with database.transaction():
+            await database.execute_many(
+                """
+                INSERT INTO chess_games (player_email, opponent_email, result, timestamp)
+                VALUES (:player_email, :opponent_email, :result, :timestamp)
+                """,
+                values=games,
+            )
+            # Fixed order so concurrent games between the same two players
+            # can't deadlock on each other's counter rows
+            for game in sorted(games, key=lambda g: g["player_email"]):
+                row = await database.fetch_one(
+                    """
+                    INSERT INTO chess_pair_stats AS s
+                        (player_email, opponent_email, wins, losses, draws, last_game_timestamp)
+                    VALUES (:player_email, :opponent_email, :wins, :losses, :draws, :timestamp)
+                    ON CONFLICT (player_email, opponent_email) DO UPDATE SET
+                        wins = s.wins + EXCLUDED.wins,
+                        losses = s.losses + EXCLUDED.losses,
+                        draws = s.draws + EXCLUDED.draws,
+                        last_game_timestamp = GREATEST(s.last_game_timestamp, EXCLUDED.last_game_timestamp)
+                    RETURNING wins, losses, draws
+                    """,
+                    values={
+                        "player_email": game["player_email"],
+                        "opponent_email": game["opponent_email"],
+                        "wins": int(game["result"] == "win"),
+                        "losses": int(game["result"] == "loss"),
+                        "draws": int(game["result"] == "draw"),
+                        "timestamp": timestamp,
+                    },
+                )
+                scores[game["player_email"]] = {
+                    "wins": row["wins"],
+                    "losses": row["losses"],
+                    "draws": row["draws"],
+                }
 
-        return True
+        return {"player": scores[player_email], "opponent": scores[opponent_email]}
     except Exception as e:
         logger.exception("record_chess_game failed: %s", e)
-        return False
+        return None
 
 
 async def get_chess_stats(user_email: str, opponent_email: str = None):
     """Get chess statistics for a user against specific opponent or last opponent."""
     try:
         if opponent_email:
-            query = """
-            SELECT
-                COUNT(*) FILTER (WHERE result = 'win') as wins,
-                COUNT(*) FILTER (WHERE result = 'loss') as losses,
-                COUNT(*) FILTER (WHERE result = 'draw') as draws,
-                MAX(timestamp) as last_game_timestamp
-            FROM chess_games
-            WHERE player_email = :user_email AND opponent_email = :opponent_email
-            """
             row = await database.fetch_one(
-                query,
+                """
+                SELECT opponent_email, wins, losses, last_game_timestamp
+                FROM chess_pair_stats
+                WHERE player_email = :user_email AND opponent_email = :opponent_email
+                """,
                 values={
                     "user_email": user_email,
                     "opponent_email": opponent_email,
                 },
             )
+            if not row:
+                return {
+                    "score": "0:0",
+                    "opponent_name": opponent_email,
+                    "opponent_email": opponent_email,
+                    "last_game_date": "",
+                    "wins": 0,
+                    "losses": 0,
+                }
         else:
-            # Find last opponent
-            query_last = """
-            SELECT opponent_email, timestamp
-            FROM chess_games
-            WHERE player_email = :user_email
-            ORDER BY timestamp DESC
-            LIMIT 1
-            """
-            last_game = await database.fetch_one(
-                query_last,
-                values={
-                    "user_email": user_email,
-                },
-            )
-
-            if not last_game:
-                return None
-
-            opponent_email = last_game["opponent_email"]
-
-            query = """
-            SELECT
-                COUNT(*) FILTER (WHERE result = 'win') as wins,
-                COUNT(*) FILTER (WHERE result = 'loss') as losses,
-                COUNT(*) FILTER (WHERE result = 'draw') as draws,
-                MAX(timestamp) as last_game_timestamp
-            FROM chess_games
-            WHERE player_email = :user_email AND opponent_email = :opponent_email
-            """
+            # Last opponent
             row = await database.fetch_one(
-                query,
-                values={
-                    "user_email": user_email,
-                    "opponent_email": opponent_email,
-                },
+                """
+                SELECT opponent_email, wins, losses, last_game_timestamp
+                FROM chess_pair_stats
+                WHERE player_email = :user_email
+                ORDER BY last_game_timestamp DESC
+                LIMIT 1
+                """,
+                values={"user_email": user_email},
             )
+            if not row:
+                return None
+            opponent_email = row["opponent_email"]
 
-        if row:
-            wins = row["wins"] or 0
-            losses = row["losses"] or 0
+        wins = row["wins"] or 0
+        losses = row["losses"] or 0
 
-            # Get opponent nickname
-            opponent_nickname = await get_nickname(opponent_email)
-            opponent_name = opponent_nickname if opponent_nickname else opponent_email
+        # Get opponent nickname
+        opponent_nickname = await get_nickname(opponent_email)
+        opponent_name = opponent_nickname if opponent_nickname else opponent_email
 
-            # Format last game date
-            import datetime
+        last_timestamp = row["last_game_timestamp"]
+        last_date = _format_game_time(last_timestamp)[0] if last_timestamp else ""
 
-            last_timestamp = row["last_game_timestamp"]
-            last_date = ""
-            if last_timestamp:
-                dt = datetime.datetime.fromtimestamp(
-                    last_timestamp / 1000, tz=datetime.timezone.utc
-                )
-                last_date = dt.strftime("%Y-%m-%d")
-
-            return {
-                "score": f"{wins}:{losses}",
-                "opponent_name": opponent_name,
-                "opponent_email": opponent_email,
-                "last_game_date": last_date,
-                "wins": wins,
-                "losses": losses,
-            }
-
-        return None
+        return {
+            "score": f"{wins}:{losses}",
+            "opponent_name": opponent_name,
+            "opponent_email": opponent_email,
+            "last_game_date": last_date,
+            "wins": wins,
+            "losses": losses,
+        }
     except Exception as e:
         logger.exception("get_chess_stats failed: %s", e)
         return None
@@ -419,92 +446,79 @@ async def get_chess_stats(user_email: str, opponent_email: str = None):
 
 async def get_all_chess_data(user_email: str):
     """Return total_wins, total_losses, total_draws, and detailed opponents data.
-    Each opponent entry includes score and game history with date/time.
+    Each opponent entry includes score and its most recent games with date/time.
     Returns default structure when no data exists."""
     try:
-        import datetime as _dt
-
-        # Total stats for user
-        total_row = await database.fetch_one(
-            """
-            SELECT
-                COUNT(*) FILTER (WHERE result = 'win') as total_wins,
-                COUNT(*) FILTER (WHERE result = 'loss') as total_losses,
-                COUNT(*) FILTER (WHERE result = 'draw') as total_draws
-            FROM chess_games
-            WHERE player_email = :user_email
-            """,
-            values={"user_email": user_email},
-        )
-        total_wins = int(total_row["total_wins"] or 0) if total_row else 0
-        total_losses = int(total_row["total_losses"] or 0) if total_row else 0
-        total_draws = int(total_row["total_draws"] or 0) if total_row else 0
-
-        # Per-opponent breakdown with score
+        # Per-opponent counters; totals are their sums
         opp_rows = await database.fetch_all(
             """
-            SELECT
-                opponent_email,
-                SUM(CASE WHEN result = 'win' THEN 1 ELSE 0 END) as my_wins,
-                SUM(CASE WHEN result = 'loss' THEN 1 ELSE 0 END) as opponent_wins,
-                SUM(CASE WHEN result = 'draw' THEN 1 ELSE 0 END) as draws,
-                MAX(timestamp) as last_game_timestamp
-            FROM chess_games
+            SELECT opponent_email, wins, losses, draws, last_game_timestamp
+            FROM chess_pair_stats
             WHERE player_email = :user_email
-            GROUP BY opponent_email
-            ORDER BY MAX(timestamp) DESC
+            ORDER BY last_game_timestamp DESC
             """,
             values={"user_email": user_email},
         )
 
-        # Fetch individual game history for each opponent
+        # Recent games against each opponent
         game_rows = await database.fetch_all(
             """
-            SELECT opponent_email, result, timestamp
-            FROM chess_games
-            WHERE player_email = :user_email
-            ORDER BY timestamp DESC
+            SELECT g.opponent_email, g.result, g.timestamp
+            FROM chess_pair_stats AS p
+            CROSS JOIN LATERAL (
+                SELECT opponent_email, result, timestamp
+                FROM chess_games
+                WHERE player_email = p.player_email
+                  AND opponent_email = p.opponent_email
+                ORDER BY timestamp DESC
+                LIMIT :per_opponent
+            ) AS g
+            WHERE p.player_email = :user_email
+            ORDER BY g.timestamp DESC
             """,
-            values={"user_email": user_email},
+            values={
+                "user_email": user_email,
+                "per_opponent": CHESS_GAMES_PER_OPPONENT,
+            },
         )
 
         # Group games by opponent
         games_by_opponent = {}
         for g in game_rows:
-            opp = g["opponent_email"]
             ts = g["timestamp"]
-            dt = _dt.datetime.fromtimestamp(ts / 1000, tz=_dt.timezone.utc)
-            game_entry = {
-                "result": g["result"],
-                "timestamp": ts,
-                "date": dt.strftime("%Y-%m-%d"),
-                "time": dt.strftime("%H:%M"),
-            }
-            games_by_opponent.setdefault(opp, []).append(game_entry)
+            date, time_of_day = _format_game_time(ts)
+            games_by_opponent.setdefault(g["opponent_email"], []).append(
+                {
+                    "result": g["result"],
+                    "timestamp": ts,
+                    "date": date,
+                    "time": time_of_day,
+                }
+            )
+
+        nicknames = await get_nicknames([r["opponent_email"] for r in opp_rows])
 
         # Build opponents dict with score + history
         opponents = {}
+        total_wins = total_losses = total_draws = 0
         for r in opp_rows:
             opp_email = r["opponent_email"]
-            my_wins = int(r["my_wins"] or 0)
-            opp_wins = int(r["opponent_wins"] or 0)
+            my_wins = int(r["wins"] or 0)
+            opp_wins = int(r["losses"] or 0)
             draws = int(r["draws"] or 0)
-
-            # Get opponent nickname
-            opp_nickname = await get_nickname(opp_email)
+            total_wins += my_wins
+            total_losses += opp_wins
+            total_draws += draws
 
             last_ts = r["last_game_timestamp"]
-            last_date = ""
-            if last_ts:
-                dt = _dt.datetime.fromtimestamp(last_ts / 1000, tz=_dt.timezone.utc)
-                last_date = dt.strftime("%Y-%m-%d")
+            last_date = _format_game_time(last_ts)[0] if last_ts else ""
 
             opponents[opp_email] = {
                 "score": f"{my_wins}:{opp_wins}",
                 "wins": my_wins,
                 "losses": opp_wins,
                 "draws": draws,
-                "nickname": opp_nickname or opp_email,
+                "nickname": nicknames.get(opp_email) or opp_email,
                 "last_game_date": last_date,
                 "games": games_by_opponent.get(opp_email, []),
             }
@@ -520,46 +534,92 @@ async def get_all_chess_data(user_email: str):
         return {"total_wins": 0, "total_losses": 0, "total_draws": 0, "opponents": {}}
 
 
-async def get_chess_history(user_email: str, limit: int = 50, offset: int = 0):
-    """Return paginated game history for a user, newest first.
-    Each entry: {opponent_email, opponent_nickname, result, date, time, timestamp}."""
+def parse_chess_history_cursor(cursor):
+    """A history cursor is "<timestamp>:<id>" of the last game already returned."""
+    timestamp, game_id = cursor.split(":", 1)
+    return int(timestamp), int(game_id)
+
+
+async def get_chess_history(
+    user_email: str, limit: int = 50, cursor: str = None, offset: int = 0
+):
+    """Return a page of game history for a user, newest first.
+
+    Pages are keyset-paginated on (timestamp, id): pass the returned
+    next_cursor to get the following page. offset is still honoured for
+    clients that predate cursors, but costs a scan of the skipped rows.
+    Each entry: {opponent_email, opponent_nickname, result, date, time, timestamp}.
+    """
     try:
-        import datetime as _dt
+        values = {"user_email": user_email, "limit": limit + 1}
+        if cursor:
+            before_ts, before_id = parse_chess_history_cursor(cursor)
+            values.update(before_ts=before_ts, before_id=before_id)
+            page_filter = "AND (timestamp, id) < (:before_ts, :before_id)"
+            page_offset = ""
+        else:
+            page_filter = ""
+            page_offset = "OFFSET :offset" if offset else ""
+            if offset:
+                values["offset"] = offset
 
         rows = await database.fetch_all(
-            """
-            SELECT opponent_email, result, timestamp
+            f"""
+            SELECT id, opponent_email, result, timestamp
             FROM chess_games
-            WHERE player_email = :user_email
-            ORDER BY timestamp DESC
-            LIMIT :limit OFFSET :offset
+            WHERE player_email = :user_email {page_filter}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT :limit {page_offset}
             """,
-            values={"user_email": user_email, "limit": limit, "offset": offset},
+            values=values,
         )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
         total_row = await database.fetch_one(
-            "SELECT COUNT(*) as total FROM chess_games WHERE player_email = :user_email",
+            """
+            SELECT COALESCE(SUM(wins + losses + draws), 0) AS total
+            FROM chess_pair_stats
+            WHERE player_email = :user_email
+            """,
             values={"user_email": user_email},
         )
         total = int(total_row["total"] or 0) if total_row else 0
 
+        nicknames = await get_nicknames(list({r["opponent_email"] for r in rows}))
         games = []
         for r in rows:
             ts = r["timestamp"]
-            dt = _dt.datetime.fromtimestamp(ts / 1000, tz=_dt.timezone.utc)
-            opp_nickname = await get_nickname(r["opponent_email"])
+            date, time_of_day = _format_game_time(ts)
             games.append(
                 {
                     "opponent_email": r["opponent_email"],
-                    "opponent_nickname": opp_nickname or r["opponent_email"],
+                    "opponent_nickname": nicknames.get(r["opponent_email"])
+                    or r["opponent_email"],
                     "result": r["result"],
                     "timestamp": ts,
-                    "date": dt.strftime("%Y-%m-%d"),
-                    "time": dt.strftime("%H:%M"),
+                    "date": date,
+                    "time": time_of_day,
                 }
             )
 
-        return {"games": games, "total": total, "limit": limit, "offset": offset}
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = f"{rows[-1]['timestamp']}:{rows[-1]['id']}"
+
+        return {
+            "games": games,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor,
+        }
     except Exception as e:
         logger.exception("get_chess_history failed: %s", e)
-        return {"games": [], "total": 0, "limit": limit, "offset": offset}
+        return {
+            "games": [],
+            "total": 0,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": None,
+        }
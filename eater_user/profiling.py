@@ -0,0 +1,255 @@
+# Shared module: edit shared/profiling.py and run shared/sync.sh
+
+"""Live diagnostics: a sampling profiler and tracemalloc snapshots.
+
+The profiler is a thread that samples the stack of every other thread in the
+process every PROFILE_SAMPLE_INTERVAL_MS and counts them as folded stacks
+("thread;outer;...;inner count"), the input format of flamegraph.pl and
+speedscope. Samples are wall-clock, so threads blocked in I/O show up too.
+
+Profiles and snapshots are written to PROFILE_DIR, named after the process
+that took them, so any worker of a pod can list and serve them.
+"""
+
+import hmac
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger("profiling")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10")) / 1000
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+# Oldest profiles and snapshots are deleted past this many
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# X-Debug-Token is refused unless a token is configured
+DEBUG_ADMIN_TOKEN = os.getenv("DEBUG_ADMIN_TOKEN")
+DEBUG_TOKEN_HEADER = "X-Debug-Token"
+
+
+def debug_token_valid(token):
+    if not DEBUG_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), DEBUG_ADMIN_TOKEN.encode())
+
+
+def _artifact_path(kind, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    for name in list_artifacts()[: -PROFILE_KEEP + 1 or None]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+    millis = int(now * 1000) % 1000
+    return os.path.join(
+        PROFILE_DIR, f"{kind}-{os.getpid()}-{stamp}.{millis:03d}.{extension}"
+    )
+
+
+def _frame_label(code):
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.last_path = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None):
+        """Start sampling for at most `seconds`; False if already running."""
+        with self._lock:
+            if self.running:
+                return False
+            duration = min(seconds or MAX_PROFILE_SECONDS, MAX_PROFILE_SECONDS)
+            self.stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(duration,),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            self._thread.start()
+        logger.info("Sampling profiler started for up to %.0f s", duration)
+        return True
+
+    def stop(self):
+        """Stop sampling and return the folded profile's path, or None."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return None
+            self._stop.set()
+            thread.join()
+            self._thread = None
+        return self.last_path
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self, duration):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample(own_ident)
+        path = _artifact_path("profile", "folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        self.last_path = path
+        logger.info(
+            "Sampling profiler wrote %d samples over %.1f s to %s",
+            self.samples,
+            time.time() - self.started_at,
+            path,
+        )
+
+
+profiler = SamplingProfiler()
+
+
+def take_snapshot(limit=25):
+    """Dump a tracemalloc snapshot, starting tracing on first use."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        logger.info("tracemalloc started with %d frames", TRACEMALLOC_FRAMES)
+    snapshot = tracemalloc.take_snapshot()
+    path = _artifact_path("snapshot", "tracemalloc")
+    snapshot.dump(path)
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "snapshot": os.path.basename(path),
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "top": [_stat(stat) for stat in snapshot.statistics("lineno")[:limit]],
+    }
+
+
+def diff_snapshots(first=None, second=None, limit=25):
+    """Allocation growth between two snapshots, by default this process's last two."""
+    if not (first and second):
+        prefix = f"snapshot-{os.getpid()}-"
+        own = [name for name in list_artifacts() if name.startswith(prefix)]
+        if len(own) < 2:
+            raise ValueError("Need two snapshots from this process to diff")
+        first, second = own[-2], own[-1]
+    old = tracemalloc.Snapshot.load(artifact_path(first))
+    new = tracemalloc.Snapshot.load(artifact_path(second))
+    stats = new.compare_to(old, "traceback")
+    return {
+        "first": first,
+        "second": second,
+        "top": [_stat(stat) for stat in stats[:limit]],
+    }
+
+
+def stop_tracemalloc():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("tracemalloc stopped")
+
+
+def _stat(stat):
+    entry = {
+        "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def list_artifacts():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(
+        (name for name in os.listdir(PROFILE_DIR) if not name.startswith(".")),
+        key=lambda name: os.path.getmtime(os.path.join(PROFILE_DIR, name)),
+    )
+
+
+def artifact_path(name):
+    """Path of a profile or snapshot by name; refuses anything outside PROFILE_DIR."""
+    if os.path.basename(name) != name or name not in list_artifacts():
+        raise FileNotFoundError(name)
+    return os.path.join(PROFILE_DIR, name)
+
+
+def install_signal_handlers():
+    """SIGUSR1 starts/stops the profiler, SIGUSR2 takes a snapshot and diffs it.
+
+    For Kafka workers without an HTTP port: kill -USR1 <pid> twice brackets a
+    profile, kill -USR2 <pid> twice logs the allocation growth in between.
+    Results are logged and left in PROFILE_DIR. Call from the main thread.
+    """
+
+    def toggle_profiler(signum, frame):
+        if profiler.running:
+            threading.Thread(target=profiler.stop, daemon=True).start()
+        else:
+            profiler.start()
+
+    def snapshot(signum, frame):
+        threading.Thread(target=_log_snapshot, daemon=True).start()
+
+    signal.signal(signal.SIGUSR1, toggle_profiler)
+    signal.signal(signal.SIGUSR2, snapshot)
+
+
+def _log_snapshot():
+    try:
+        taken = take_snapshot(limit=10)
+        logger.info(
+            "tracemalloc snapshot %s: %d bytes traced",
+            taken["snapshot"],
+            taken["traced_bytes"],
+        )
+        diff = diff_snapshots(limit=10)
+    except ValueError:
+        return
+    except Exception as e:
+        logger.error(f"tracemalloc snapshot failed: {e}")
+        return
+    for stat in diff["top"]:
+        logger.info(
+            "%+d bytes (%+d blocks) at %s",
+            stat["size_diff_bytes"],
+            stat["count_diff"],
+            " <- ".join(stat["traceback"][:3]),
+        )
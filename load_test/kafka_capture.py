@@ -0,0 +1,218 @@
+"""Record Kafka traffic from selected topics into a compact replay file.
+
+The capture consumer uses its own throwaway group, so it sees every message
+without taking any from the services. The file is gzipped JSON lines: one
+header object, then one [offset_ms, topic, key, headers, value] list per
+message, topics without the _dev suffix. kafka_replay.py plays it back.
+
+Payloads are redacted unless told otherwise:
+  - e-mail addresses anywhere in the value become stable pseudonyms
+    (user-<hash>@replay.invalid, salted per capture) and keys that were a
+    user's routing hash are rehashed from the pseudonym
+  - free-text fields (question, context, feedback) and string fields longer
+    than --max-field-chars (photos) are replaced by filler of the same length,
+    so replayed payload sizes stay realistic
+  - deadline and trace headers are dropped, they would expire or skew every
+    replayed message
+
+Usage: BOOTSTRAP_SERVER=kafka:9092 python kafka_capture.py -o eater.capture.gz
+           --topics get_today_data,photo-analysis-response [--duration 600]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import signal
+import time
+from datetime import datetime, timezone
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("kafka_capture")
+
+FORMAT = "chater-kafka-capture"
+VERSION = 1
+IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
+# A stale deadline would expire every replayed message, stale trace hops
+# would show up as hours-long Kafka hops
+DROPPED_HEADERS = {"x-deadline-ms", "traceparent", "x-trace-request", "x-trace-hops"}
+TEXT_FIELDS = {"question", "context", "feedback"}
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def topic_name(topic):
+    return f"{topic}_dev" if IS_DEV else topic
+
+
+def base_topic(topic):
+    return topic[: -len("_dev")] if IS_DEV and topic.endswith("_dev") else topic
+
+
+def routing_key(user_email):
+    """Same hash the services key messages with (message_routing.routing_key)."""
+    return hashlib.sha256(user_email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+class Redactor:
+    def __init__(self, salt, max_field_chars, keep_text=False):
+        self.salt = salt
+        self.max_field_chars = max_field_chars
+        self.keep_text = keep_text
+        self.pseudonyms = {}
+
+    def pseudonym(self, email):
+        email = email.lower()
+        if email not in self.pseudonyms:
+            digest = hashlib.sha256(self.salt + email.encode("utf-8")).hexdigest()
+            self.pseudonyms[email] = f"user-{digest[:12]}@replay.invalid"
+        return self.pseudonyms[email]
+
+    def _string(self, value, field=None):
+        if len(value) > self.max_field_chars or (
+            field in TEXT_FIELDS and not self.keep_text
+        ):
+            return "x" * len(value)
+        return EMAIL_RE.sub(lambda m: self.pseudonym(m.group(0)), value)
+
+    def _walk(self, value, field=None):
+        if isinstance(value, dict):
+            return {k: self._walk(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._walk(item, field) for item in value]
+        if isinstance(value, str):
+            return self._string(value, field)
+        return value
+
+    def redact(self, key, value):
+        """Redacted (key, value) for one message; value is the raw text."""
+        try:
+            payload = json.loads(value)
+        except ValueError:
+            return key, self._string(value)
+
+        envelope_value = payload.get("value") if isinstance(payload, dict) else None
+        user_email = (
+            envelope_value.get("user_email") if isinstance(envelope_value, dict) else None
+        )
+        if key and user_email and key == routing_key(user_email):
+            key = routing_key(self.pseudonym(user_email))
+        elif key:
+            key = self._string(key)
+        return key, json.dumps(self._walk(payload), separators=(",", ":"))
+
+
+def read_capture(path):
+    """Return (header, records) of a capture file."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} file")
+        records = [json.loads(line) for line in f if line.strip()]
+    return header, records
+
+
+def capture(args):
+    from confluent_kafka import Consumer, KafkaError
+
+    topics = [topic.strip() for topic in args.topics.split(",") if topic.strip()]
+    redactor = None
+    if not args.no_redact:
+        redactor = Redactor(os.urandom(16), args.max_field_chars, args.keep_text)
+
+    consumer = Consumer(
+        {
+            "bootstrap.servers": os.getenv("BOOTSTRAP_SERVER"),
+            "group.id": f"kafka-capture-{os.getpid()}-{int(time.time())}",
+            "auto.offset.reset": "latest",
+            "enable.auto.commit": False,
+        }
+    )
+    consumer.subscribe([topic_name(topic) for topic in topics])
+
+    running = True
+
+    def stop(*_):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    started = time.monotonic()
+    count = 0
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "topics": topics,
+        "redacted": redactor is not None,
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    logger.info("Capturing %s into %s", ", ".join(topics), args.output)
+    try:
+        with gzip.open(args.output, "wt", encoding="utf-8") as out:
+            out.write(json.dumps(header) + "\n")
+            while running:
+                elapsed = time.monotonic() - started
+                if args.duration and elapsed >= args.duration:
+                    break
+                if args.max_messages and count >= args.max_messages:
+                    break
+                msg = consumer.poll(1.0)
+                if msg is None:
+                    continue
+                if msg.error():
+                    if msg.error().code() != KafkaError._PARTITION_EOF:
+                        logger.error("Consumer error: %s", msg.error())
+                    continue
+
+                key = msg.key().decode("utf-8", "replace") if msg.key() else None
+                value = (msg.value() or b"").decode("utf-8", "replace")
+                if redactor is not None:
+                    key, value = redactor.redact(key, value)
+                headers = [
+                    [name, raw.decode("utf-8", "replace") if raw is not None else None]
+                    for name, raw in msg.headers() or ()
+                    if name not in DROPPED_HEADERS
+                ]
+                offset_ms = round((time.monotonic() - started) * 1000, 1)
+                out.write(
+                    json.dumps(
+                        [offset_ms, base_topic(msg.topic()), key, headers or None, value],
+                        separators=(",", ":"),
+                    )
+                    + "\n"
+                )
+                count += 1
+                if count % 1000 == 0:
+                    logger.info("%d messages captured", count)
+    finally:
+        consumer.close()
+    logger.info(
+        "Captured %d messages in %.0f s to %s", count, time.monotonic() - started, args.output
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--topics", required=True, help="comma-separated base topic names")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--max-messages", type=int)
+    parser.add_argument("--max-field-chars", type=int, default=4096)
+    parser.add_argument(
+        "--keep-text", action="store_true", help="keep question/context/feedback text"
+    )
+    parser.add_argument(
+        "--no-redact", action="store_true", help="store payloads verbatim (dev data only)"
+    )
+    capture(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,624 @@
+"""Replay a kafka_capture.py file against eater or chater_gpt and report
+throughput, per-message latency, consumer lag and DB time.
+
+Two targets:
+  --in-process DIR  imports the service from DIR with confluent_kafka replaced
+                    by a paced in-memory consumer/producer and runs its
+                    process_messages() loop; nothing but the service's own
+                    dependencies (e.g. Postgres for eater) is needed
+  --bootstrap HOST  produces the capture to a (local) broker the service is
+                    consuming from and times its replies on the output topics
+
+--speed is 1x (original pacing), 10x, any multiplier, or max (no pacing).
+Latency runs from a message's delivery (in-process) or produce (broker) to
+the first message the service produces with the same correlation id, so
+messages that produce nothing (e.g. manual_weight) are reported as such.
+Lag is how far delivery fell behind the replay schedule.
+
+DB time comes from eater_db_query_seconds: read in-process, or scraped from
+--metrics-url (the service's METRICS_PORT endpoint) before and after.
+
+Captured users are pseudonyms with no data behind them; --seeded-users N
+maps them onto the users eater_init/benchmarks/plan_regression.py seeds
+(plan-user-0..N-1@example.invalid) so the DB does realistic work.
+
+Usage: python kafka_replay.py eater.capture.gz --service eater
+           --in-process ../eater --speed 10x [--seeded-users 1000]
+       python kafka_replay.py gpt.capture.gz --service chater_gpt
+           --in-process ../chater_gpt --canned-llm-ms 800 --speed max
+       python kafka_replay.py eater.capture.gz --service eater
+           --bootstrap localhost:9092 --metrics-url http://localhost:8000/metrics
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import types
+import uuid
+from collections import defaultdict
+
+from kafka_capture import read_capture, topic_name
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("kafka_replay")
+
+CORRELATION_HEADER = "x-correlation-id"
+DB_METRIC = "eater_db_query_seconds"
+PSEUDONYM_RE = re.compile(r"user-[0-9a-f]{12}@replay\.invalid")
+
+CANNED_ANALYSIS = json.dumps(
+    {
+        "type": "food_processing",
+        "dish_name": "Replay dish",
+        "estimated_avg_calories": 450,
+        "ingredients": ["rice", "chicken"],
+        "total_avg_weight": 350,
+        "contains": {"proteins": 30, "fats": 12, "carbohydrates": 55, "sugar": 4},
+        "health_rating": 70,
+    }
+)
+
+SERVICES = {
+    "eater": {
+        "module": "eater",
+        "outputs": [
+            "send_today_data",
+            "send_today_data_custom",
+            "photo-analysis-response-check",
+            "delete_food_response",
+            "modify_food_record_response",
+            "send_alcohol_latest",
+            "send_alcohol_range",
+            "send_food_health_level",
+            "record_chess_game_response",
+            "get_chess_stats_response",
+            "get_all_chess_data_response",
+            "get_nutrition_rollup_response",
+            "gemini-send",
+            "error_response",
+        ],
+        "canned": {},
+    },
+    "chater_gpt": {
+        "module": "gpt",
+        "outputs": ["gpt-response", "photo-analysis-response"],
+        # Stand-ins for the OpenAI calls, enabled by --canned-llm-ms
+        "canned": {
+            "gpt_request": lambda *args, **kwargs: '{"answer": "canned"}',
+            "analyze_photo": lambda *args, **kwargs: CANNED_ANALYSIS,
+        },
+    },
+}
+
+
+class ReplayDrained(Exception):
+    """Raised by the in-process consumer once every message was delivered."""
+
+
+def parse_speed(value):
+    """Speed multiplier, or None for max."""
+    value = value.lower()
+    if value == "max":
+        return None
+    speed = float(value[:-1] if value.endswith("x") else value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def correlation_of(headers, value):
+    for name, raw in headers or ():
+        if name == CORRELATION_HEADER and raw:
+            return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+    try:
+        payload = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return payload.get("key") if isinstance(payload, dict) else None
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+
+
+class Replay:
+    """Replay schedule plus the delivery and reply times recorded against it."""
+
+    def __init__(self, records, speed, seeded_users=None):
+        self.speed = speed
+        self.messages = []
+        mapping = {}
+
+        def seeded(match):
+            if match.group(0) not in mapping:
+                mapping[match.group(0)] = (
+                    f"plan-user-{len(mapping) % seeded_users}@example.invalid"
+                )
+            return mapping[match.group(0)]
+
+        for offset_ms, topic, key, headers, value in records:
+            if seeded_users:
+                value = PSEUDONYM_RE.sub(seeded, value)
+            headers = [
+                (name, raw.encode("utf-8") if raw is not None else None)
+                for name, raw in headers or ()
+            ]
+            # Fresh correlation ids, so replies to a replay can't be confused
+            # with a previous run's (or production's, in broker mode)
+            correlation = str(uuid.uuid4())
+            previous = correlation_of(headers, value)
+            if previous:
+                value = value.replace(previous, correlation)
+                headers = [
+                    (name, correlation.encode() if name == CORRELATION_HEADER else raw)
+                    for name, raw in headers
+                ]
+            self.messages.append(
+                {
+                    "due": offset_ms / 1000.0,
+                    "topic": topic,
+                    "key": key.encode("utf-8") if key else None,
+                    "headers": headers or None,
+                    "value": value.encode("utf-8"),
+                    "correlation": correlation,
+                }
+            )
+        self.index = 0
+        self.started = None
+        self.delivered = {}  # correlation -> (topic, delivered_at, lag)
+        self.replies = {}  # correlation -> first reply time
+        self.last_reply = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def due_at(self, message):
+        if self.speed is None:
+            return self.started
+        return self.started + message["due"] / self.speed
+
+    def next_due(self):
+        """Seconds until the next message is due, or None when drained."""
+        if self.index >= len(self.messages):
+            return None
+        return self.due_at(self.messages[self.index]) - time.perf_counter()
+
+    def take(self):
+        message = self.messages[self.index]
+        self.index += 1
+        now = time.perf_counter()
+        with self.lock:
+            self.delivered[message["correlation"]] = (
+                message["topic"],
+                now,
+                max(0.0, now - self.due_at(message)),
+            )
+        return message
+
+    def reply(self, correlation):
+        now = time.perf_counter()
+        with self.lock:
+            if correlation in self.delivered and correlation not in self.replies:
+                self.replies[correlation] = now
+            self.last_reply = now
+
+    def finished_at(self):
+        """Time of the last delivery or reply, whichever came later."""
+        with self.lock:
+            last_delivery = max(
+                (delivered_at for _, delivered_at, _ in self.delivered.values()),
+                default=self.started,
+            )
+            return max(last_delivery, self.last_reply or self.started)
+
+    def settle(self, timeout, quiet=1.0):
+        """Wait for stragglers until replies stop for `quiet` s or timeout."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                done = len(self.replies) == len(self.delivered)
+                last = self.last_reply or self.started
+            if done or time.perf_counter() - last >= quiet:
+                return
+            time.sleep(0.05)
+
+    def report(self, elapsed, db):
+        latencies = defaultdict(list)
+        lags = []
+        unanswered = defaultdict(int)
+        for correlation, (topic, delivered_at, lag) in self.delivered.items():
+            lags.append(lag)
+            replied = self.replies.get(correlation)
+            if replied is None:
+                unanswered[topic] += 1
+            else:
+                latencies[topic].append(replied - delivered_at)
+        everything = [s for samples in latencies.values() for s in samples]
+
+        def summary(samples):
+            return {
+                "count": len(samples),
+                "p50_ms": _ms(percentile(samples, 0.50)),
+                "p95_ms": _ms(percentile(samples, 0.95)),
+                "p99_ms": _ms(percentile(samples, 0.99)),
+                "max_ms": _ms(max(samples) if samples else None),
+            }
+
+        delivered = len(self.delivered)
+        result = {
+            "messages": delivered,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_msg_s": round(delivered / elapsed, 1) if elapsed else None,
+            "latency": summary(everything),
+            "lag_p50_ms": _ms(percentile(lags, 0.50)),
+            "lag_p99_ms": _ms(percentile(lags, 0.99)),
+            "unanswered": dict(unanswered),
+            "topics": {topic: summary(samples) for topic, samples in latencies.items()},
+        }
+        if db is not None:
+            seconds, queries = db
+            result["db"] = {
+                "seconds": round(seconds, 3),
+                "queries": int(queries),
+                "ms_per_message": round(seconds * 1000 / delivered, 2) if delivered else None,
+                "share_of_elapsed": round(seconds / elapsed, 3) if elapsed else None,
+            }
+        return result
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def db_totals(families):
+    """(seconds, statements) summed over eater_db_query_seconds' labels."""
+    seconds = queries = 0.0
+    for family in families:
+        if family.name != DB_METRIC:
+            continue
+        for sample in family.samples:
+            if sample.name == DB_METRIC + "_sum":
+                seconds += sample.value
+            elif sample.name == DB_METRIC + "_count":
+                queries += sample.value
+    return seconds, queries
+
+
+# In-process target: a paced confluent_kafka stand-in
+
+
+class ReplayMessage:
+    def __init__(self, topic, value, key=None, headers=None, offset=0):
+        self._topic = topic
+        self._value = value
+        self._key = key
+        self._headers = headers
+        self._offset = offset
+
+    def topic(self):
+        return self._topic
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def headers(self):
+        return self._headers
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return self._offset
+
+    def error(self):
+        return None
+
+
+def fake_kafka(replay):
+    """A confluent_kafka module whose consumers play `replay` on its schedule."""
+
+    def deliver():
+        message = replay.take()
+        return ReplayMessage(
+            topic_name(message["topic"]),
+            message["value"],
+            message["key"],
+            message["headers"],
+            replay.index,
+        )
+
+    class Consumer:
+        def __init__(self, conf=None):
+            self.conf = conf
+
+        def subscribe(self, topics, on_assign=None, on_revoke=None):
+            self.topics = topics
+
+        def poll(self, timeout=None):
+            wait = replay.next_due()
+            if wait is None:
+                raise ReplayDrained()
+            if wait > 0:
+                time.sleep(min(wait, timeout or 0))
+                if wait > (timeout or 0):
+                    return None
+            return deliver()
+
+        def consume(self, num_messages=1, timeout=None):
+            first = self.poll(timeout)
+            if first is None:
+                return []
+            batch = [first]
+            while len(batch) < num_messages:
+                wait = replay.next_due()
+                if wait is None or wait > 0:
+                    break
+                batch.append(deliver())
+            return batch
+
+        def commit(self, message=None, offsets=None, asynchronous=True):
+            pass
+
+        def close(self):
+            pass
+
+    class Producer:
+        def __init__(self, conf=None):
+            self.conf = conf
+            self._pending = []
+
+        def produce(self, topic, value=None, key=None, headers=None, callback=None, **kwargs):
+            correlation = correlation_of(headers, value)
+            if correlation:
+                replay.reply(correlation)
+            if callback is not None:
+                self._pending.append(
+                    (callback, ReplayMessage(topic, value, key, headers))
+                )
+
+        def poll(self, timeout=None):
+            pending, self._pending = self._pending, []
+            for callback, message in pending:
+                callback(None, message)
+            return len(pending)
+
+        def flush(self, timeout=None):
+            self.poll(0)
+            return 0
+
+        def __len__(self):
+            return len(self._pending)
+
+    class KafkaError:
+        _PARTITION_EOF = -191
+        BROKER_NOT_AVAILABLE = 8
+        INVALID_MSG_SIZE = 4
+
+    class KafkaException(Exception):
+        pass
+
+    class TopicPartition:
+        def __init__(self, topic, partition=0, offset=-1001):
+            self.topic = topic
+            self.partition = partition
+            self.offset = offset
+
+    module = types.ModuleType("confluent_kafka")
+    module.Consumer = Consumer
+    module.Producer = Producer
+    module.KafkaError = KafkaError
+    module.KafkaException = KafkaException
+    module.TopicPartition = TopicPartition
+    return module
+
+
+def replay_in_process(replay, args):
+    from prometheus_client import REGISTRY
+
+    service = SERVICES[args.service]
+    sys.modules["confluent_kafka"] = fake_kafka(replay)
+    sys.path.insert(0, os.path.abspath(args.in_process))
+    module = importlib.import_module(service["module"])
+    if args.canned_llm_ms is not None:
+        for name, canned in service["canned"].items():
+            setattr(module, name, _delayed(canned, args.canned_llm_ms / 1000.0))
+    logging.getLogger().setLevel(args.log_level)
+
+    db_before = db_totals(REGISTRY.collect())
+    replay.start()
+    try:
+        module.process_messages()
+    except ReplayDrained:
+        pass
+    replay.settle(args.drain_timeout)
+    elapsed = replay.finished_at() - replay.started
+    seconds, queries = db_totals(REGISTRY.collect())
+    return elapsed, (seconds - db_before[0], queries - db_before[1])
+
+
+def _delayed(fn, delay):
+    def wrapper(*args, **kwargs):
+        time.sleep(delay)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+# Broker target
+
+
+def scrape(url):
+    from urllib.request import urlopen
+
+    from prometheus_client.parser import text_string_to_metric_families
+
+    with urlopen(url, timeout=10) as response:
+        return db_totals(text_string_to_metric_families(response.read().decode()))
+
+
+def replay_via_broker(replay, args):
+    from confluent_kafka import Consumer, Producer
+
+    outputs = [topic_name(topic) for topic in SERVICES[args.service]["outputs"]]
+    consumer = Consumer(
+        {
+            "bootstrap.servers": args.bootstrap,
+            "group.id": f"kafka-replay-{os.getpid()}-{int(time.time())}",
+            "auto.offset.reset": "latest",
+            "enable.auto.commit": False,
+        }
+    )
+    assigned = threading.Event()
+    consumer.subscribe(outputs, on_assign=lambda c, partitions: assigned.set())
+    stop = threading.Event()
+
+    def collect():
+        while not stop.is_set():
+            for msg in consumer.consume(500, 0.1):
+                if msg.error():
+                    continue
+                correlation = correlation_of(msg.headers(), msg.value())
+                if correlation:
+                    replay.reply(correlation)
+
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+    if not assigned.wait(30):
+        raise RuntimeError(f"No partitions assigned for {outputs} within 30 s")
+
+    producer = Producer(
+        {"bootstrap.servers": args.bootstrap, "linger.ms": 5, "partitioner": "murmur2_random"}
+    )
+    db_before = scrape(args.metrics_url) if args.metrics_url else None
+    replay.start()
+    while True:
+        wait = replay.next_due()
+        if wait is None:
+            break
+        if wait > 0:
+            time.sleep(wait)
+        message = replay.take()
+        while True:
+            try:
+                producer.produce(
+                    topic_name(message["topic"]),
+                    key=message["key"],
+                    value=message["value"],
+                    headers=message["headers"],
+                )
+                break
+            except BufferError:
+                producer.poll(0.1)
+        producer.poll(0)
+    producer.flush(30)
+    replay.settle(args.drain_timeout)
+    elapsed = replay.finished_at() - replay.started
+    stop.set()
+    collector.join(5)
+    consumer.close()
+
+    db = None
+    if db_before is not None:
+        seconds, queries = scrape(args.metrics_url)
+        db = (seconds - db_before[0], queries - db_before[1])
+    return elapsed, db
+
+
+def print_report(result):
+    latency = result["latency"]
+    print(
+        f"{result['messages']} messages in {result['elapsed_s']:.1f} s "
+        f"({result['throughput_msg_s']} msg/s), lag p99 {result['lag_p99_ms']} ms"
+    )
+    print(
+        f"latency p50 {latency['p50_ms']} ms  p95 {latency['p95_ms']} ms  "
+        f"p99 {latency['p99_ms']} ms  max {latency['max_ms']} ms"
+    )
+    for topic, summary in sorted(result["topics"].items()):
+        print(
+            f"  {topic:32} {summary['count']:7}  p50 {summary['p50_ms']:>9} ms  "
+            f"p99 {summary['p99_ms']:>9} ms"
+        )
+    for topic, count in sorted(result["unanswered"].items()):
+        print(f"  {topic:32} {count:7}  no reply")
+    if "db" in result:
+        db = result["db"]
+        print(
+            f"DB: {db['seconds']} s over {db['queries']} statements, "
+            f"{db['ms_per_message']} ms per message, "
+            f"{db['share_of_elapsed']:.0%} of elapsed"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--service", choices=sorted(SERVICES), required=True)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--in-process", metavar="DIR", help="service source directory")
+    target.add_argument("--bootstrap", metavar="HOST:PORT")
+    parser.add_argument("--speed", type=parse_speed, default=parse_speed("1x"))
+    parser.add_argument("--topics", help="replay only these base topics (comma-separated)")
+    parser.add_argument("--seeded-users", type=int)
+    parser.add_argument(
+        "--canned-llm-ms", type=float,
+        help="in-process chater_gpt: replace OpenAI calls with a canned answer after this delay",
+    )
+    parser.add_argument("--metrics-url", help="broker mode: service /metrics for DB time")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--report", help="write the JSON report here")
+    parser.add_argument(
+        "--log-level", default="WARNING",
+        help="in-process: service log level; INFO adds its per-message logging",
+    )
+    args = parser.parse_args()
+
+    header, records = read_capture(args.capture)
+    if args.topics:
+        wanted = {topic.strip() for topic in args.topics.split(",")}
+        records = [record for record in records if record[1] in wanted]
+    if not records:
+        parser.error("nothing to replay")
+    if not header.get("redacted"):
+        logger.warning("%s holds unredacted payloads", args.capture)
+    elif args.seeded_users is None:
+        logger.info("Captured users are pseudonyms; see --seeded-users for DB realism")
+
+    replay = Replay(records, args.speed, args.seeded_users)
+    speed = "max" if args.speed is None else f"{args.speed:g}x"
+    logger.info(
+        "Replaying %d messages from %s at %s into %s",
+        len(records), args.capture, speed, args.service,
+    )
+    if args.in_process:
+        elapsed, db = replay_in_process(replay, args)
+    else:
+        elapsed, db = replay_via_broker(replay, args)
+
+    result = replay.report(elapsed, db)
+    result.update(service=args.service, speed=speed, capture=args.capture)
+    print_report(result)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Mock eater backend for load-testing chater_ui on its own.
+
+Consumes the request topics chater_ui produces to (eater requests and the
+photo topics normally handled by the model services) and answers on the
+topics chater_ui waits on, with canned payloads after a configurable delay.
+Photos are answered on photo-analysis-response-check, i.e. as eater would
+after the model's photo-analysis-response, so no LLM latency is included.
+
+Replies are scheduled rather than slept on, so one process sustains
+thousands of requests in flight. Run it only where the real eater and model
+services are not consuming the same topics, otherwise users get two answers.
+
+Latency specs: fixed:MS, uniform:MIN_MS:MAX_MS or lognormal:MEDIAN_MS:SIGMA.
+
+Usage: BOOTSTRAP_SERVER=kafka:9092 python mock_eater.py
+           [--latency lognormal:20:0.5] [--photo-latency lognormal:800:0.4]
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import signal
+import time
+from datetime import datetime, timezone
+
+from confluent_kafka import Consumer, KafkaException, Producer
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("mock_eater")
+
+IS_DEV = os.getenv("IS_DEV", "false").lower() == "true"
+# Same contract as the real services: drop requests past it, copy it back
+DEADLINE_HEADER = "x-deadline-ms"
+PHOTO_TOPICS = ["eater-send-photo", "chater-vision"]
+if os.getenv("LOCAL_MODEL_KAFKA_TOPIC"):
+    PHOTO_TOPICS.append(os.getenv("LOCAL_MODEL_KAFKA_TOPIC"))
+
+TODAY = {
+    "total_for_day": {
+        "total_calories": 1850,
+        "total_avg_weight": 1400,
+        "contains": {"proteins": 95, "fats": 60, "carbohydrates": 210, "sugar": 40},
+    },
+    "dishes_today": [
+        {
+            "time": 1760000000 + i * 3600,
+            "dish_name": f"Mock dish {i}",
+            "estimated_avg_calories": 450,
+            "total_avg_weight": 350,
+            "health_rating": 70,
+            "ingredients": ["rice", "chicken", "broccoli"],
+            "image_id": "",
+            "food_health_level": "healthy",
+        }
+        for i in range(4)
+    ],
+    "latest_weight": {"time": 1760000000, "weight": 78.4},
+}
+
+RECOMMENDATION = {
+    "healthier_foods": [{"dish_name": "Grilled fish", "reason": "Lean protein"}],
+    "general_recommendations": {"tip": "Add vegetables to every meal"},
+}
+
+
+def _success(value):
+    return {"status": "Success"}
+
+
+# request topic -> (reply topic, builder(request value) -> reply value)
+REPLIES = {
+    "get_today_data": ("send_today_data", lambda value: {"dishes": TODAY}),
+    "get_today_data_custom": (
+        "send_today_data_custom",
+        lambda value: {"dishes": TODAY},
+    ),
+    "get_alcohol_latest": (
+        "send_alcohol_latest",
+        lambda value: {
+            "alcohol": {"total_drinks": 1, "total_calories": 200, "drinks_of_day": ["Beer"]}
+        },
+    ),
+    "get_alcohol_range": ("send_alcohol_range", lambda value: {"events": []}),
+    "get_food_health_level": (
+        "send_food_health_level",
+        lambda value: {
+            "food_health_level": {
+                "title": value.get("food_name", ""),
+                "description": "Balanced meal",
+                "health_summary": "Good protein, moderate fat",
+            }
+        },
+    ),
+    "get_nutrition_rollup": (
+        "get_nutrition_rollup_response",
+        lambda value: {"period": value.get("period", "week"), "series": []},
+    ),
+    "delete_food": ("delete_food_response", _success),
+    "modify_food_record": ("modify_food_record_response", _success),
+    "get_recommendation": ("gemini-response", lambda value: RECOMMENDATION),
+    **{topic: ("photo-analysis-response-check", _success) for topic in PHOTO_TOPICS},
+}
+
+
+def topic_name(topic):
+    return f"{topic}_dev" if IS_DEV else topic
+
+
+def parse_latency(spec):
+    """Return a function drawing one delay in seconds from a latency spec."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(*values) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+
+
+def is_expired(msg):
+    for name, value in msg.headers() or ():
+        if name == DEADLINE_HEADER and value:
+            try:
+                return int(value) / 1000.0 <= time.time()
+            except (TypeError, ValueError):
+                return False
+    return False
+
+
+def build_reply(topic, payload):
+    """(reply topic, envelope) for a request, or None if it needs no answer."""
+    base_topic = topic[: -len("_dev")] if IS_DEV and topic.endswith("_dev") else topic
+    reply_topic, builder = REPLIES[base_topic]
+    value = payload.get("value") if isinstance(payload, dict) else None
+    if not isinstance(value, dict) or not payload.get("key"):
+        return None
+    reply = builder(value)
+    reply["user_email"] = value.get("user_email")
+    return reply_topic, {"key": payload["key"], "value": reply}
+
+
+class MockEater:
+    def __init__(self, latency, photo_latency):
+        self.latency = latency
+        self.photo_latency = photo_latency
+        self.photo_topics = {topic_name(topic) for topic in PHOTO_TOPICS}
+        self.pending = []  # heap of (due, seq, reply topic, key, value, headers)
+        self.seq = 0
+        self.replied = 0
+        self.shed = 0
+        self.running = True
+        bootstrap = os.getenv("BOOTSTRAP_SERVER")
+        self.consumer = Consumer(
+            {
+                "bootstrap.servers": bootstrap,
+                "group.id": "mock_eater-dev" if IS_DEV else "mock_eater",
+                "auto.offset.reset": "latest",
+                "enable.auto.commit": True,
+            }
+        )
+        self.producer = Producer(
+            {"bootstrap.servers": bootstrap, "linger.ms": 5, "acks": 1}
+        )
+
+    def schedule(self, msg):
+        if is_expired(msg):
+            self.shed += 1
+            return
+        try:
+            payload = json.loads(msg.value())
+            built = build_reply(msg.topic(), payload)
+        except (ValueError, KeyError) as e:
+            logger.warning("Skipping malformed request on %s: %s", msg.topic(), e)
+            return
+        if built is None:
+            return
+        reply_topic, envelope = built
+        delay = (
+            self.photo_latency() if msg.topic() in self.photo_topics else self.latency()
+        )
+        self.seq += 1
+        heapq.heappush(
+            self.pending,
+            (
+                time.monotonic() + delay,
+                self.seq,
+                topic_name(reply_topic),
+                msg.key(),
+                envelope,
+                msg.headers(),
+            ),
+        )
+
+    def send_due(self):
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            _, _, reply_topic, key, envelope, headers = heapq.heappop(self.pending)
+            self.producer.produce(
+                reply_topic, key=key, value=json.dumps(envelope), headers=headers
+            )
+            self.replied += 1
+        self.producer.poll(0)
+
+    def run(self):
+        topics = [topic_name(topic) for topic in REPLIES]
+        self.consumer.subscribe(topics)
+        logger.info("Mock eater answering %s", ", ".join(sorted(topics)))
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                wait = 0.1
+                if self.pending:
+                    wait = min(wait, max(0.0, self.pending[0][0] - time.monotonic()))
+                for msg in self.consumer.consume(500, wait):
+                    if msg.error():
+                        logger.warning("Consumer error: %s", msg.error())
+                        continue
+                    self.schedule(msg)
+                self.send_due()
+                if time.monotonic() - last_report >= 30:
+                    logger.info(
+                        "%s: %d replies sent, %d pending, %d expired requests dropped",
+                        datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        self.replied,
+                        len(self.pending),
+                        self.shed,
+                    )
+                    last_report = time.monotonic()
+        except KafkaException as e:
+            logger.error("Kafka error: %s", e)
+            raise
+        finally:
+            self.consumer.close()
+            self.producer.flush(10)
+
+    def stop(self, *args):
+        self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--latency",
+        type=parse_latency,
+        default=os.getenv("MOCK_EATER_LATENCY", "lognormal:20:0.5"),
+        help="delay of data requests (default lognormal:20:0.5)",
+    )
+    parser.add_argument(
+        "--photo-latency",
+        type=parse_latency,
+        default=os.getenv("MOCK_EATER_PHOTO_LATENCY", "lognormal:800:0.4"),
+        help="delay of photo analysis (default lognormal:800:0.4)",
+    )
+    args = parser.parse_args()
+
+    mock = MockEater(args.latency, args.photo_latency)
+    signal.signal(signal.SIGTERM, mock.stop)
+    signal.signal(signal.SIGINT, mock.stop)
+    mock.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""UI-tier load scenarios, meant to run against chater_ui backed by mock_eater.py.
+
+With eater and the model services replaced by the mock, response times are
+chater_ui's own (auth, Kafka produce, Redis wait, protobuf encoding) plus the
+mock's configured latency, so capacity can be measured without LLM noise.
+
+LOAD_SHAPE selects the scenario:
+  sustained - ramp to SUSTAINED_USERS and hold them for SUSTAINED_SECONDS
+  ramp      - add RAMP_STEP_USERS every RAMP_STEP_SECONDS until a step breaks
+              the SLO (an endpoint's p99 above its limit or failures above
+              SLO_FAIL_RATIO), then stop and report the last step that held
+
+The p99 limit is per endpoint: SLO_P99_MS for every request except the photo
+upload, which waits on the mock's much slower photo latency and is held to
+SLO_PHOTO_P99_MS instead (0 leaves it out of the gate).
+
+A sustained run exits non-zero when an endpoint's whole-run p99 or the failure
+ratio breaks the SLO, so it can gate a pipeline; a ramp run is expected to
+break it and only reports where.
+
+Usage: locust -f ui_tier_locustfile.py --headless --host http://localhost:5000
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from locust import HttpUser, LoadTestShape, between, events, tag, task
+from locustfile import bearer_headers, grpc_headers, proto_headers
+from proto import (alcohol_pb2, custom_date_food_pb2, eater_photo_pb2,
+                   food_health_level_pb2)
+
+logger = logging.getLogger(__name__)
+
+LOAD_SHAPE = os.getenv("LOAD_SHAPE", "sustained").lower()
+SPAWN_RATE = float(os.getenv("SPAWN_RATE", "10"))
+SUSTAINED_USERS = int(os.getenv("SUSTAINED_USERS", "100"))
+SUSTAINED_SECONDS = int(os.getenv("SUSTAINED_SECONDS", "600"))
+RAMP_START_USERS = int(os.getenv("RAMP_START_USERS", "20"))
+RAMP_STEP_USERS = int(os.getenv("RAMP_STEP_USERS", "20"))
+RAMP_STEP_SECONDS = int(os.getenv("RAMP_STEP_SECONDS", "60"))
+RAMP_MAX_USERS = int(os.getenv("RAMP_MAX_USERS", "2000"))
+SLO_P99_MS = float(os.getenv("SLO_P99_MS", "1000"))
+# mock_eater's default photo latency, lognormal:800:0.4, alone has a p99
+# around 2 s
+SLO_PHOTO_P99_MS = float(os.getenv("SLO_PHOTO_P99_MS", "3000"))
+SLO_FAIL_RATIO = float(os.getenv("SLO_FAIL_RATIO", "0.01"))
+PHOTO_ENDPOINT = "POST /eater_receive_photo"
+
+PHOTO_PATH = os.getenv(
+    "TEST_PHOTO_PATH", os.path.join(os.path.dirname(__file__), "image.png")
+)
+with open(PHOTO_PATH, "rb") as f:
+    PHOTO_BYTES = f.read()
+
+
+class UiTierUser(HttpUser):
+    host = os.getenv("TARGET_HOST", "http://localhost:5000")
+    wait_time = between(
+        float(os.getenv("WAIT_MIN_SECONDS", "0.5")),
+        float(os.getenv("WAIT_MAX_SECONDS", "1.5")),
+    )
+
+    @staticmethod
+    def _date_offset(days: int) -> str:
+        return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%d-%m-%Y")
+
+    @tag("today")
+    @task(6)
+    def eater_get_today(self):
+        self.client.get(
+            "/eater_get_today", headers=bearer_headers(), name="GET /eater_get_today"
+        )
+
+    @tag("custom_date")
+    @task(2)
+    def custom_date_query(self):
+        request_proto = custom_date_food_pb2.CustomDateFoodRequest()
+        request_proto.date = self._date_offset(1)
+        self.client.post(
+            "/get_food_custom_date",
+            data=request_proto.SerializeToString(),
+            headers=proto_headers(),
+            name="POST /get_food_custom_date",
+        )
+
+    @tag("alcohol")
+    @task(2)
+    def alcohol_latest(self):
+        self.client.get(
+            "/alcohol_latest", headers=bearer_headers(), name="GET /alcohol_latest"
+        )
+
+    @tag("alcohol")
+    @task(1)
+    def alcohol_range(self):
+        range_request = alcohol_pb2.GetAlcoholRangeRequest()
+        range_request.start_date = self._date_offset(7)
+        range_request.end_date = self._date_offset(0)
+        self.client.post(
+            "/alcohol_range",
+            data=range_request.SerializeToString(),
+            headers=grpc_headers(),
+            name="POST /alcohol_range",
+        )
+
+    @tag("health_level")
+    @task(1)
+    def food_health_level(self):
+        req = food_health_level_pb2.FoodHealthLevelRequest()
+        req.time = int(datetime.now(timezone.utc).timestamp())
+        req.food_name = "Mock dish 0"
+        self.client.post(
+            "/food_health_level",
+            data=req.SerializeToString(),
+            headers=proto_headers(),
+            name="POST /food_health_level",
+        )
+
+    @tag("photo")
+    @task(1)
+    def receive_photo(self):
+        photo_msg = eater_photo_pb2.PhotoMessage()
+        photo_msg.time = datetime.now(timezone.utc).isoformat()
+        photo_msg.photo_data = PHOTO_BYTES
+        photo_msg.photoType = os.getenv("TEST_PHOTO_TYPE", "default_prompt")
+        self.client.post(
+            "/eater_receive_photo",
+            data=photo_msg.SerializeToString(),
+            headers=proto_headers(),
+            name=PHOTO_ENDPOINT,
+        )
+
+
+class UiTierShape(LoadTestShape):
+    """Sustained concurrency or ramp-to-failure, picked by LOAD_SHAPE."""
+
+    def __init__(self):
+        super().__init__()
+        self.users = RAMP_START_USERS
+        self.step_started = 0.0
+        self.step_requests = 0
+        self.step_failures = 0
+        self.last_good_users = None
+
+    def tick(self):
+        run_time = self.get_run_time()
+        if LOAD_SHAPE == "ramp":
+            return self._ramp_tick(run_time)
+        if run_time > SUSTAINED_USERS / SPAWN_RATE + SUSTAINED_SECONDS:
+            return None
+        return SUSTAINED_USERS, SPAWN_RATE
+
+    def _ramp_tick(self, run_time):
+        if run_time - self.step_started < RAMP_STEP_SECONDS:
+            return self.users, SPAWN_RATE
+
+        total = self.runner.stats.total
+        requests = total.num_requests - self.step_requests
+        failures = total.num_failures - self.step_failures
+        fail_ratio = failures / requests if requests else 0.0
+        # p99 over locust's sliding window, i.e. the tail of this step
+        p99 = total.get_current_response_time_percentile(0.99) or 0
+        logger.info(
+            "Step at %d users: %d requests, p99 %.0f ms, failures %.2f%%",
+            self.users, requests, p99, fail_ratio * 100,
+        )
+        breaches = slo_breaches(self.runner.stats, current=True)
+        if breaches or fail_ratio > SLO_FAIL_RATIO:
+            logger.warning(
+                "SLO broken at %d users (%s, failures %.2f%%); "
+                "last step within SLO: %s users",
+                self.users, _describe(breaches), fail_ratio * 100,
+                self.last_good_users,
+            )
+            self.runner.environment.breaking_point = self.users
+            return None
+        if self.users >= RAMP_MAX_USERS:
+            logger.info("Reached RAMP_MAX_USERS=%d within SLO", RAMP_MAX_USERS)
+            return None
+
+        self.last_good_users = self.users
+        self.users = min(self.users + RAMP_STEP_USERS, RAMP_MAX_USERS)
+        self.step_started = run_time
+        self.step_requests = total.num_requests
+        self.step_failures = total.num_failures
+        return self.users, SPAWN_RATE
+
+
+def p99_limit(name):
+    """p99 limit in ms for an endpoint, or None when it is not gated."""
+    if name == PHOTO_ENDPOINT:
+        return SLO_PHOTO_P99_MS or None
+    return SLO_P99_MS
+
+
+def slo_breaches(stats, current=False):
+    """(endpoint, p99, limit) for every endpoint over its p99 limit.
+
+    current=True uses locust's sliding window, i.e. the last few seconds.
+    """
+    breaches = []
+    for entry in stats.entries.values():
+        limit = p99_limit(entry.name)
+        if limit is None or not entry.num_requests:
+            continue
+        if current:
+            p99 = entry.get_current_response_time_percentile(0.99) or 0
+        else:
+            p99 = entry.get_response_time_percentile(0.99)
+        if p99 > limit:
+            breaches.append((entry.name, p99, limit))
+    return breaches
+
+
+def _describe(breaches):
+    if not breaches:
+        return "p99 within limits"
+    return ", ".join(
+        f"{name} p99 {p99:.0f} ms (limit {limit:.0f})" for name, p99, limit in breaches
+    )
+
+
+@events.quitting.add_listener
+def check_slo(environment, **kwargs):
+    """Fail a sustained run when an endpoint p99 or the failure ratio breaks the SLO."""
+    total = environment.stats.total
+    if not total.num_requests:
+        return
+    breaches = slo_breaches(environment.stats)
+    for name, p99, limit in breaches:
+        logger.warning("%s p99 %.0f ms exceeds its %.0f ms limit", name, p99, limit)
+    if LOAD_SHAPE == "ramp":
+        logger.info(
+            "Ramp broke the SLO at %s users",
+            getattr(environment, "breaking_point", None),
+        )
+        return
+    if breaches or total.fail_ratio > SLO_FAIL_RATIO:
+        logger.error(
+            "SLO failed: %s, failures %.2f%% (limit %.2f%%)",
+            _describe(breaches), total.fail_ratio * 100, SLO_FAIL_RATIO * 100,
+        )
+        environment.process_exit_code = 1
+    else:
+        logger.info(
+            "SLO met: every endpoint's p99 within its limit, failures %.2f%%",
+            total.fail_ratio * 100,
+        )
@@ -0,0 +1,148 @@
+"""Batched Kafka offset commits shared by the Kafka consumers.
+
+Edit shared/commit_manager.py only; shared/sync.sh copies it into each
+service, whose Docker build context is its own directory.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from confluent_kafka import KafkaException, TopicPartition
+
+logger = logging.getLogger("commit_manager")
+
+COMMIT_EVERY_MESSAGES = int(os.getenv("KAFKA_COMMIT_EVERY_MESSAGES", "100"))
+COMMIT_INTERVAL_SECONDS = float(os.getenv("KAFKA_COMMIT_INTERVAL_SECONDS", "5"))
+
+
+class OffsetCommitManager:
+    """Batches offset commits instead of committing after every message.
+
+    Processed offsets are tracked per partition and committed asynchronously
+    once COMMIT_EVERY_MESSAGES messages were marked or COMMIT_INTERVAL_SECONDS
+    passed. Pending offsets are committed synchronously when partitions are
+    revoked and on close, so a rebalance or shutdown does not replay work.
+
+    Offsets stay tracked until a commit is known to have gone through: a
+    failed synchronous commit puts them back, and offsets sent asynchronously
+    are sent again with the next synchronous commit, since a failed
+    asynchronous commit is only reported to the consumer's on_commit callback.
+    """
+
+    def __init__(
+        self,
+        consumer,
+        every_messages=COMMIT_EVERY_MESSAGES,
+        interval_seconds=COMMIT_INTERVAL_SECONDS,
+    ):
+        self.consumer = consumer
+        self.every_messages = max(1, every_messages)
+        self.interval_seconds = interval_seconds
+        self._offsets = {}
+        self._counts = {}
+        self._in_flight = {}
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+
+    def mark(self, message):
+        """Record a message as processed and commit if a threshold is reached."""
+        key = (message.topic(), message.partition())
+        with self._lock:
+            self._offsets[key] = message.offset() + 1
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._pending += 1
+        self.maybe_commit()
+
+    def maybe_commit(self):
+        """Commit asynchronously if enough messages or time have accumulated.
+
+        Safe to call on every poll, including polls that returned nothing.
+        """
+        if not self._pending:
+            return
+        if (
+            self._pending >= self.every_messages
+            or time.monotonic() - self._last_commit >= self.interval_seconds
+        ):
+            self.commit(asynchronous=True)
+
+    def commit(self, asynchronous=False, partitions=None):
+        """Commit tracked offsets, optionally only for the given partitions."""
+        with self._lock:
+            selected = dict(self._offsets)
+            if not asynchronous:
+                # Nothing confirms asynchronous commits, so repeat them here
+                for key, offset in self._in_flight.items():
+                    selected.setdefault(key, offset)
+            if partitions is not None:
+                revoked = {(p.topic, p.partition) for p in partitions}
+                selected = {key: o for key, o in selected.items() if key in revoked}
+            if not selected:
+                return
+            for key in selected:
+                if key in self._offsets:
+                    del self._offsets[key]
+                    self._pending -= self._counts.pop(key, 0)
+            self._last_commit = time.monotonic()
+
+        offsets = [
+            TopicPartition(topic, partition, offset)
+            for (topic, partition), offset in selected.items()
+        ]
+        try:
+            self.consumer.commit(offsets=offsets, asynchronous=asynchronous)
+            logger.debug(
+                "Committed %d partition offsets (async=%s)", len(offsets), asynchronous
+            )
+        except KafkaException as e:
+            logger.error(f"Offset commit failed: {str(e)}")
+            self._restore(selected)
+            if not asynchronous:
+                raise
+            return
+
+        with self._lock:
+            for key, offset in selected.items():
+                if asynchronous:
+                    self._in_flight[key] = offset
+                elif self._in_flight.get(key, offset) <= offset:
+                    self._in_flight.pop(key, None)
+
+    def _restore(self, selected):
+        # Offsets marked since the failed commit are newer and win; restored
+        # partitions count once, so they retry on the interval, not every poll
+        with self._lock:
+            for key, offset in selected.items():
+                if key not in self._offsets:
+                    self._offsets[key] = offset
+                    self._counts[key] = 1
+                    self._pending += 1
+
+    def _forget(self, partitions):
+        with self._lock:
+            for p in partitions:
+                key = (p.topic, p.partition)
+                self._offsets.pop(key, None)
+                self._in_flight.pop(key, None)
+                self._pending -= self._counts.pop(key, 0)
+
+    def on_revoke(self, consumer, partitions):
+        """Rebalance callback: flush offsets for partitions we are losing."""
+        logger.info(f"Partitions revoked, committing pending offsets: {partitions}")
+        try:
+            self.commit(asynchronous=False, partitions=partitions)
+        except KafkaException:
+            pass
+        finally:
+            # The new owner resumes from the last commit that went through
+            self._forget(partitions)
+
+    def close(self):
+        """Synchronously commit everything still pending."""
+        try:
+            self.commit(asynchronous=False)
+        except KafkaException:
+            pass
@@ -6,12 +6,15 @@ import os
 import time as time_module
 from dataclasses import dataclass
 from threading import Event
-from typing import Dict, Iterable, Iterator, Optional
+from typing import Callable, Dict, Iterable, Iterator, Optional
 
 
+from commit_manager import OffsetCommitManager
 from confluent_kafka import Consumer, KafkaError
+from deadline import shed_if_expired
 
 from dev_utils import get_kafka_group_id
+from tracing import trace_consumed
 
 logger = logging.getLogger("models_processor.kafka_consumer")
 
@@ -107,6 +110,7 @@ def validate_user_data(
 def consume_messages(
     topics: Iterable[str],
     settings: Optional[KafkaConsumerSettings] = None,
+    on_revoke: Optional[Callable[[Consumer, list], None]] = None,
 ) -> Consumer:
     topics = list(topics)
     if not topics:
@@ -115,7 +119,10 @@ def consume_messages(
     settings = settings or KafkaConsumerSettings.from_env()
     consumer = _create_consumer(settings)
 
-    consumer.subscribe(topics)
+    if on_revoke is not None:
+        consumer.subscribe(topics, on_revoke=on_revoke)
+    else:
+        consumer.subscribe(topics)
     logger.info("Subscribed to topics: %s", topics)
 
     return consumer
@@ -125,6 +132,7 @@ def poll_messages(
     consumer: Consumer,
     timeout: float = 1.0,
     stop_event: Optional[Event] = None,
+    commits: Optional[OffsetCommitManager] = None,
 ) -> Iterator[object]:
     while True:
         if stop_event and stop_event.is_set():
@@ -132,6 +140,8 @@ def poll_messages(
 
         msg = consumer.poll(timeout)
         if msg is None:
+            if commits is not None:
+                commits.maybe_commit()
             continue
         if msg.error():
             if msg.error().code() == KafkaError._PARTITION_EOF:
@@ -148,4 +158,11 @@ def poll_messages(
             logger.error("Consumer error: %s", msg.error())
             continue
 
+        # Drop work nobody is waiting for before the model is called
+        if shed_if_expired(msg):
+            if commits is not None:
+                commits.mark(msg)
+            continue
+        trace_consumed(msg)
+
         yield msg
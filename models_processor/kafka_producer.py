@@ -7,6 +7,10 @@ from functools import lru_cache
 from typing import Any, Dict
 
 from confluent_kafka import KafkaException, Producer
+from deadline import propagation_headers
+from message_routing import (PARTITIONER, message_headers,
+                             message_routing_key)
+from tracing import trace_headers
 
 logger = logging.getLogger("models_processor.kafka_producer")
 
@@ -35,6 +39,7 @@ def _create_producer() -> Producer:
             "bootstrap.servers": bootstrap_servers,
             "client.id": "models-processor-producer",
             "acks": "all",
+            "partitioner": PARTITIONER,
         }
     )
 
@@ -49,8 +54,11 @@ def produce_message(topic: str, message: Dict[str, Any]) -> None:
     try:
         producer.produce(
             topic,
-            key=message.get("key"),
+            key=message_routing_key(message),
             value=json.dumps(message),
+            headers=message_headers(
+                message, propagation_headers() + trace_headers(topic)
+            ),
             callback=_delivery_report,
         )
         producer.poll(0)
@@ -3,12 +3,16 @@ import os
 from logging_config import setup_logging
 
 from models_processor import ModelsProcessor
+from profiling import install_signal_handlers
 
 
 def main() -> None:
     setup_logging("models_processor.log")
     port = int(os.getenv("PORT", "8000"))
 
+    # kill -USR1 / -USR2 for a live profile or tracemalloc diff
+    install_signal_handlers()
+
     processor = ModelsProcessor()
     processor.start()
 
@@ -0,0 +1,53 @@
+# Shared module: edit shared/message_routing.py and run shared/sync.sh
+import hashlib
+
+# Messages are keyed by a hash of the user's email so all of a user's requests
+# land on one partition (ordered, and stable for consumer-local caches). The
+# request/response correlation UUID travels in this header instead.
+CORRELATION_HEADER = "x-correlation-id"
+
+# Same partitioner as the Java clients, so every producer maps a key alike
+PARTITIONER = "murmur2_random"
+
+
+def routing_key(user_email, fallback=None):
+    """Kafka key for a user; falls back (e.g. to the correlation id) if unknown."""
+    if not user_email or user_email == "unknown":
+        return fallback
+    return hashlib.sha256(user_email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def get_header(message, name):
+    for header, value in message.headers() or ():
+        if header == name and value is not None:
+            return value.decode("utf-8") if isinstance(value, bytes) else value
+    return None
+
+
+def correlation_id(message, envelope=None):
+    """Correlation UUID of a message: header first, then the JSON envelope key.
+
+    Messages from producers that predate the header still carry the UUID as
+    their Kafka key, which is used as a last resort.
+    """
+    value = get_header(message, CORRELATION_HEADER)
+    if value:
+        return value
+    if isinstance(envelope, dict) and envelope.get("key"):
+        return envelope["key"]
+    key = message.key()
+    return key.decode("utf-8") if key else None
+
+
+def message_headers(message, extra=None):
+    """Headers for an outgoing {"key", "value"} message."""
+    headers = list(extra or [])
+    if message.get("key"):
+        headers.append((CORRELATION_HEADER, str(message["key"]).encode("utf-8")))
+    return headers
+
+
+def message_routing_key(message):
+    value = message.get("value")
+    user_email = value.get("user_email") if isinstance(value, dict) else None
+    return routing_key(user_email, fallback=message.get("key"))
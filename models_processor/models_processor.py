@@ -9,12 +9,18 @@ from typing import Any, Callable, Optional
 from dev_utils import get_topic_name
 
 
+from commit_manager import OffsetCommitManager
 from common import load_kafka_payload
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, send_file
 from kafka_consumer import (KafkaConsumerSettings, consume_messages,
                             poll_messages, validate_user_data)
 from kafka_producer import produce_message
+from message_routing import correlation_id
 from ollama import ModelNotRunningError, OllamaClient
+from profiling import (DEBUG_TOKEN_HEADER, artifact_path, debug_token_valid,
+                       diff_snapshots, list_artifacts, profiler, stop_tracemalloc,
+                       take_snapshot)
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 
 @dataclass(frozen=True)
@@ -123,113 +129,189 @@ class ModelsProcessor:
         consumer = consume_messages(
             topics,
             settings=self._consumer_settings,
+            # Revocations are only delivered inside poll(), after commits is bound
+            on_revoke=lambda consumer, partitions: commits.on_revoke(
+                consumer, partitions
+            ),
         )
-        for message in poll_messages(consumer, stop_event=self._stop_event):
-            if self._stop_event.is_set():
-                logging.info("Stop flag set; exiting Kafka processing loop")
-                break
-
-            payload = load_kafka_payload(message.value())
-            if payload is None:
-                consumer.commit(message)
-                continue
-
-            logging.info(
-                "Received message from topic '%s': %s", message.topic(), payload
-            )
+        commits = OffsetCommitManager(consumer)
+        try:
+            for message in poll_messages(
+                consumer, stop_event=self._stop_event, commits=commits
+            ):
+                if self._stop_event.is_set():
+                    logging.info("Stop flag set; exiting Kafka processing loop")
+                    break
+
+                payload = load_kafka_payload(message.value())
+                if payload is None:
+                    commits.mark(message)
+                    continue
 
-            if not isinstance(payload, dict):
-                logging.warning(
-                    "Unexpected payload type; expected dict but got %s", type(payload)
+                logging.info(
+                    "Received message from topic '%s': %s", message.topic(), payload
                 )
-                consumer.commit(message)
-                continue
 
-            if not validate_user_data(payload, self.settings.expected_user_email):
-                logging.warning(
-                    "Skipping message due to user validation failure: %s", payload
-                )
-                consumer.commit(message)
-                continue
-
-            value_dict = payload.get("value", {})
-            prompt = value_dict.get("prompt")
-            photo_base64 = value_dict.get("photo")
-            user_email = value_dict.get("user_email")
-            timestamp = value_dict.get("timestamp")
-            date = value_dict.get("date")
-            image_id = value_dict.get("image_id")
-
-            has_photo = bool(photo_base64)
-            target_topic = "photo-analysis-response"
-            analysis_result: Optional[str]
-
-            if has_photo:
-                if not prompt:
+                if not isinstance(payload, dict):
                     logging.warning(
-                        "Photo analysis message missing prompt; skipping processing: %s",
-                        value_dict,
+                        "Unexpected payload type; expected dict but got %s", type(payload)
                     )
-                    consumer.commit(message)
+                    commits.mark(message)
                     continue
 
-                analysis_result = self.client.analyze_photo_with_ollama(
-                    prompt, photo_base64
-                )
-            else:
-                analysis_result = self.client.analyze_text_with_ollama(value_dict)
-                target_topic = "gemini-response"
+                if not validate_user_data(payload, self.settings.expected_user_email):
+                    logging.warning(
+                        "Skipping message due to user validation failure: %s", payload
+                    )
+                    commits.mark(message)
+                    continue
 
-            analysis_result = _sanitize_analysis_result(analysis_result)
+                value_dict = payload.get("value", {})
+                prompt = value_dict.get("prompt")
+                photo_base64 = value_dict.get("photo")
+                user_email = value_dict.get("user_email")
+                timestamp = value_dict.get("timestamp")
+                date = value_dict.get("date")
+                image_id = value_dict.get("image_id")
+
+                has_photo = bool(photo_base64)
+                target_topic = "photo-analysis-response"
+                analysis_result: Optional[str]
+
+                if has_photo:
+                    if not prompt:
+                        logging.warning(
+                            "Photo analysis message missing prompt; skipping processing: %s",
+                            value_dict,
+                        )
+                        commits.mark(message)
+                        continue
+
+                    analysis_result = self.client.analyze_photo_with_ollama(
+                        prompt, photo_base64
+                    )
+                else:
+                    analysis_result = self.client.analyze_text_with_ollama(value_dict)
+                    target_topic = "gemini-response"
 
-            if analysis_result is None:
-                analysis_result = "Analysis failed; check service logs for details."
+                analysis_result = _sanitize_analysis_result(analysis_result)
 
-            key = message.key().decode("utf-8") if message.key() else None
+                if analysis_result is None:
+                    analysis_result = "Analysis failed; check service logs for details."
 
-            message_value: dict[str, Any] = {"user_email": user_email}
+                key = correlation_id(message, payload)
 
-            if target_topic == "gemini-response":
-                parsed_analysis: Any
-                try:
-                    parsed_analysis = json.loads(analysis_result)
-                except json.JSONDecodeError:
-                    message_value["analysis"] = analysis_result
-                else:
-                    if isinstance(parsed_analysis, dict):
-                        message_value.update(parsed_analysis)
-                    else:
+                message_value: dict[str, Any] = {"user_email": user_email}
+
+                if target_topic == "gemini-response":
+                    parsed_analysis: Any
+                    try:
+                        parsed_analysis = json.loads(analysis_result)
+                    except json.JSONDecodeError:
                         message_value["analysis"] = analysis_result
-            else:
-                message_value["analysis"] = analysis_result
+                    else:
+                        if isinstance(parsed_analysis, dict):
+                            message_value.update(parsed_analysis)
+                        else:
+                            message_value["analysis"] = analysis_result
+                else:
+                    message_value["analysis"] = analysis_result
             
-            if timestamp:
-                message_value["timestamp"] = timestamp
-            if date:
-                message_value["date"] = date
-            if image_id:
-                message_value["image_id"] = image_id
-
-            kafka_message = {
-                "key": key,
-                "value": message_value,
-            }
-
-            try:
-                produce_message(target_topic, kafka_message)
-                logging.info(
-                    "Produced analysis result to '%s': %s",
-                    target_topic,
-                    kafka_message,
-                )
-            except Exception as exc:  # Catch-all to avoid crashing the consumer loop
-                logging.error("Failed to produce analysis message: %s", exc)
+                if timestamp:
+                    message_value["timestamp"] = timestamp
+                if date:
+                    message_value["date"] = date
+                if image_id:
+                    message_value["image_id"] = image_id
+
+                kafka_message = {
+                    "key": key,
+                    "value": message_value,
+                }
 
-            consumer.commit(message)
+                try:
+                    produce_message(target_topic, kafka_message)
+                    logging.info(
+                        "Produced analysis result to '%s': %s",
+                        target_topic,
+                        kafka_message,
+                    )
+                except Exception as exc:  # Catch-all to avoid crashing the consumer loop
+                    logging.error("Failed to produce analysis message: %s", exc)
+
+                commits.mark(message)
+        finally:
+            commits.close()
+            consumer.close()
 
     def _register_routes(self) -> None:
         self.app.add_url_rule("/health", "health", self.health_check, methods=["GET"])
         self.app.add_url_rule("/ready", "ready", self.readiness_check, methods=["GET"])
+        self.app.add_url_rule("/metrics", "metrics", self.metrics, methods=["GET"])
+        debug_routes = (
+            ("/debug/profile/start", self.debug_profile_start, "POST"),
+            ("/debug/profile/stop", self.debug_profile_stop, "POST"),
+            ("/debug/profiles", self.debug_profiles, "GET"),
+            ("/debug/profiles/<name>", self.debug_profile_file, "GET"),
+            ("/debug/tracemalloc/snapshot", self.debug_snapshot, "POST"),
+            ("/debug/tracemalloc/diff", self.debug_diff, "GET"),
+            ("/debug/tracemalloc/stop", self.debug_tracemalloc_stop, "POST"),
+        )
+        for rule, view, method in debug_routes:
+            self.app.add_url_rule(rule, view.__name__, view, methods=[method])
+        self.app.before_request(self._check_debug_access)
+
+    def _check_debug_access(self):
+        if not request.path.startswith("/debug/"):
+            return None
+        if debug_token_valid(request.headers.get(DEBUG_TOKEN_HEADER)):
+            return None
+        logging.warning("Unauthorized debug endpoint access to %s", request.path)
+        return jsonify({"detail": "Forbidden"}), 403
+
+    def debug_profile_start(self):
+        if not profiler.start(request.args.get("seconds", type=float)):
+            return jsonify({"detail": "Profiler already running"}), 409
+        return jsonify({"status": "started"})
+
+    def debug_profile_stop(self):
+        path = profiler.stop()
+        if path is None:
+            return jsonify({"detail": "No profile running"}), 404
+        return send_file(path, mimetype="text/plain", as_attachment=True)
+
+    def debug_profiles(self):
+        return jsonify({"profiling": profiler.running, "files": list_artifacts()})
+
+    def debug_profile_file(self, name):
+        try:
+            return send_file(artifact_path(name), as_attachment=True)
+        except FileNotFoundError:
+            return jsonify({"detail": "Not found"}), 404
+
+    def debug_snapshot(self):
+        return jsonify(take_snapshot(request.args.get("limit", 25, type=int)))
+
+    def debug_diff(self):
+        try:
+            return jsonify(
+                diff_snapshots(
+                    request.args.get("first"),
+                    request.args.get("second"),
+                    request.args.get("limit", 25, type=int),
+                )
+            )
+        except ValueError as exc:
+            return jsonify({"detail": str(exc)}), 400
+        except FileNotFoundError:
+            return jsonify({"detail": "Snapshot not found"}), 404
+
+    def debug_tracemalloc_stop(self):
+        stop_tracemalloc()
+        return jsonify({"status": "stopped"})
+
+    def metrics(self):
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
     def health_check(self):  # type: ignore[override]
         if self._client is None:
@@ -0,0 +1,34 @@
+#!/bin/bash
+
+# Copy the shared modules into every service that uses them.
+# With --check, only report copies that differ from the shared source.
+
+set -e
+
+cd "$(dirname "${BASH_SOURCE[0]}")/.."
+
+# module: services that ship a copy of it
+SHARED_MODULES=(
+    "chess_ratings.py: eater eater_user"
+    "commit_manager.py: admin_service chater_dlp chater_gpt chater_ui eater models_processor"
+    "deadline.py: chater_dlp chater_gpt eater models_processor"
+    "message_routing.py: chater_dlp chater_gpt chater_ui eater models_processor"
+    "profiling.py: chater_dlp chater_gpt chater_ui eater eater_user models_processor"
+    "tracing.py: chater_dlp chater_gpt eater models_processor"
+)
+
+status=0
+for entry in "${SHARED_MODULES[@]}"; do
+    module="${entry%%:*}"
+    for svc in ${entry#*:}; do
+        if [ "$1" == "--check" ]; then
+            if ! cmp -s "shared/$module" "$svc/$module"; then
+                echo "$svc/$module differs from shared/$module, run shared/sync.sh"
+                status=1
+            fi
+        else
+            cp "shared/$module" "$svc/$module"
+        fi
+    done
+done
+exit $status